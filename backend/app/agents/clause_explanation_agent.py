@@ -1,5 +1,6 @@
 from langgraph.graph import StateGraph, END
 from app.services import llm_service
+from app.core.tracing import traced
 from typing import TypedDict
 
 # --- State Definition ---
@@ -9,10 +10,11 @@ class ClauseExplanationState(TypedDict):
 
 # --- Agent Steps ---
 
-def explain_clauses(state: ClauseExplanationState):
+@traced("node")
+async def explain_clauses(state: ClauseExplanationState):
     """Uses the LLM to explain the key clause discussion in simple terms."""
     print("--- CLAUSE EXPLANATION AGENT: Explaining clauses... ---")
-    explanation = llm_service.explain_clauses(state["discussion_text"])
+    explanation = await llm_service.aexplain_clauses(state["discussion_text"])
     state["explanation"] = explanation
     return state
 
@@ -1,7 +1,16 @@
+import asyncio
 import json
+import logging
 import re
-from langgraph.graph import StateGraph, END
-from app.services import storage_service, pinecone_service, llm_service
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from app.services import (
+    storage_service, pinecone_service, llm_service, analysis_cache, classification_service, text_store,
+)
+from app.core.config import config
+from app.core.tracing import traced
+from app.services.chunking_service import estimate_tokens
+from app.services.extraction_service import ExtractedText
 from typing import TypedDict, List
 
 # --- State Definition ---
@@ -9,7 +18,9 @@ class DocumentState(TypedDict):
     user_id: str
     file: object
     doc_id: str
+    content_hash: str
     text: str
+    page_offsets: List[int]
     classification: str
     # Fields from the new, detailed analysis
     summary: str
@@ -19,52 +30,168 @@ class DocumentState(TypedDict):
     questions: List[dict]
     highlights: dict
 
+# --- Helpers ---
+
+def _field_writer():
+    """
+    An on_field callback that sends each analysis field to the graph's
+    "custom" stream as soon as it is ready.
+    """
+    writer = get_stream_writer()
+
+    def on_field(path, value):
+        # The classification is not an analysis field; the node's result carries it
+        if path == ("classification",):
+            return
+        event = {"type": "analysis_field", "field": path[0], "value": value}
+        if len(path) > 1:
+            event["key"] = path[1]
+        writer(event)
+
+    return on_field
+
 # --- Agent Steps ---
+# Steps that run side by side return only the fields they set, so their
+# updates can be merged into the state
 
+@traced("node")
 def save_file(state: DocumentState):
     """Saves the uploaded file to cloud storage."""
     print("--- AGENT STEP: Saving file... ---")
-    doc_id = storage_service.save_document(state["user_id"], state["file"])
-    state["doc_id"] = doc_id
-    return state
+    # The doc_id is chosen before the run, so a resumed run saves under the same one
+    doc_id = storage_service.save_document(state["user_id"], state["file"], doc_id=state.get("doc_id"))
+    return {"doc_id": doc_id}
 
-def extract_text_and_classify(state: DocumentState):
-    """Extracts text from the document and classifies its type."""
+@traced("node")
+async def extract_text_and_classify(state: DocumentState):
+    """
+    Extracts text from the document and classifies its type. In fused mode
+    the LLM analyzes it in the same call, and the analysis is returned too.
+    """
     print("--- AGENT STEP: Extracting text and classifying... ---")
     
-    # --- FIX: Read the raw bytes from the re-readable file object ---
-    # The 'fitz' library needs the raw content, not our custom wrapper object.
-    file_content_bytes = state["file"].file.read()
+    # Hash the upload in chunks, and hand the extractor its temp file path
+    # (or in-memory bytes) rather than another copy of the content
+    upload = state["file"]
+    with upload.file as stream:
+        content_hash = await asyncio.to_thread(analysis_cache.content_hash_file, stream)
     
-    text = storage_service.extract_text(file_content_bytes, state["file"].filename)
-    state["text"] = text
-    state["classification"] = llm_service.classify_document(text)
-    return state
+    # Text extraction is CPU-bound, so keep it off the event loop
+    extracted = await asyncio.to_thread(storage_service.extract_document, upload.source, upload.filename)
+    text = extracted.text
+
+    analysis = None
+    cached = analysis_cache.lookup(content_hash)
+    if cached and cached.classification:
+        print("--- AGENT STEP: Reusing cached classification. ---")
+        classification = cached.classification
+    else:
+        # Clear-cut documents are classified locally; the LLM gets the rest
+        prediction = classification_service.classify(text)
+        local = classification_service.confident(prediction)
+        if local:
+            print(f"--- AGENT STEP: Classified locally ({prediction.confidence:.2f}). ---")
+            classification = prediction.label
+        elif config.fused_analysis_enabled and estimate_tokens(text) <= config.long_document_token_threshold:
+            classification, analysis = await _classify_and_analyze(text, content_hash)
+        else:
+            classification = await llm_service.aclassify_document(text)
+        classification_service.record(local)
+        analysis_cache.store(content_hash, classification=classification)
+    return {
+        "content_hash": content_hash,
+        "text": text,
+        "page_offsets": extracted.page_offsets,
+        "classification": classification,
+        **(analysis or {}),
+    }
 
-def get_full_analysis(state: DocumentState):
-    """Gets the full analysis from the LLM service and updates the state."""
+async def _classify_and_analyze(text: str, content_hash: str):
+    """
+    Fused mode: one LLM call classifies the document and analyzes it, so
+    get_full_analysis has nothing left to do. If the reply is unusable the
+    document is classified on its own and analyzed as usual.
+    """
+    print("--- AGENT STEP: Classifying and analyzing in one call... ---")
+    try:
+        classification, analysis = await llm_service.aclassify_and_analyze(text, on_field=_field_writer())
+    except ValueError as e:
+        print(f"--- AGENT STEP: Fused analysis failed ({e}), classifying separately. ---")
+        return await llm_service.aclassify_document(text), None
+    if analysis is not None:
+        analysis_cache.store(content_hash, analysis=analysis)
+    return classification, analysis
+
+@traced("node")
+async def get_full_analysis(state: DocumentState):
+    """
+    Gets the full analysis from the LLM service and updates the state. Each
+    field is also sent to the graph's "custom" stream as soon as it is ready.
+    """
+    if state.get("summary") is not None:
+        # The fused call already analyzed it, and streamed the fields
+        return {}
     print("--- AGENT STEP: Getting full analysis... ---")
-    analysis = llm_service.get_full_analysis(state["text"], state["classification"])
+    on_field = _field_writer()
+
+    cached = analysis_cache.lookup(state["content_hash"])
+    if cached and cached.analysis:
+        print("--- AGENT STEP: Reusing cached analysis. ---")
+        analysis = cached.analysis
+        llm_service.report_fields(analysis, on_field)
+    else:
+        analysis = await llm_service.aget_full_analysis(
+            state["text"], state["classification"], on_field=on_field
+        )
+        analysis_cache.store(state["content_hash"], analysis=analysis)
     
-    # --- FIX: Update the state with the results from the analysis ---
-    state.update(analysis)
-    return state
+    return analysis
 
 
+@traced("node")
 def embed_and_store(state: DocumentState):
     """Creates embeddings for the document text and stores it in Pinecone."""
     print("--- AGENT STEP: Embedding and storing in vector DB... ---")
-    pinecone_service.upsert_document(
-        user_id=state["user_id"], doc_id=state["doc_id"], text=state["text"]
-    )
-    return state
+    cached = analysis_cache.lookup(state["content_hash"])
+    if cached and cached.embeddings:
+        # Same content was embedded before: copy the vectors under the new doc_id
+        print("--- AGENT STEP: Reusing cached embeddings. ---")
+        pinecone_service.upsert_embeddings(state["user_id"], state["doc_id"], cached.embeddings)
+    else:
+        embedded_chunks = pinecone_service.upsert_document(
+            user_id=state["user_id"],
+            doc_id=state["doc_id"],
+            text=state["text"],
+            page_offsets=state.get("page_offsets"),
+        )
+        analysis_cache.store(state["content_hash"], embeddings=embedded_chunks)
+    return {}
+
+@traced("node")
+def store_text(state: DocumentState):
+    """
+    Saves the extracted text, page offsets and sections as an artifact, so
+    later steps load them instead of downloading and re-parsing the file.
+    """
+    print("--- AGENT STEP: Saving extracted text... ---")
+    extracted = ExtractedText(state["text"], state.get("page_offsets") or [])
+    try:
+        text_store.save(state["user_id"], state["doc_id"], extracted)
+    except Exception as e:
+        # Readers fall back to extracting the original
+        logging.warning(f"Could not save the extracted text of {state['doc_id']}: {e}")
+    return {}
 
 def decide_to_continue(state: DocumentState):
-    """Determines whether to continue processing based on classification."""
+    """
+    Determines whether to continue processing based on classification.
+    Supported documents are analyzed, embedded and their text saved side by
+    side; unsupported ones end here, so nothing is embedded for them.
+    """
     if state["classification"] == "Unsupported Document Type":
         return "end"
     else:
-        return "continue"
+        return ["get_full_analysis", "embed", "store_text"]
 
 # --- Graph Definition ---
 graph = StateGraph(DocumentState)
@@ -72,18 +199,27 @@ graph.add_node("save", save_file)
 graph.add_node("classify", extract_text_and_classify)
 graph.add_node("get_full_analysis", get_full_analysis)
 graph.add_node("embed", embed_and_store)
+graph.add_node("store_text", store_text)
+
+# 1. The upload to Storage runs alongside text extraction and classification
+graph.add_edge(START, "save")
+graph.add_edge(START, "classify")
 
-graph.set_entry_point("save")
-graph.add_edge("save", "classify")
+# 2. Once both are done, the analysis, the embedding and the text artifact
+# run side by side. The last two need the doc_id, which they have by then:
+# a step only starts when every step of the one before has finished.
 graph.add_conditional_edges(
     "classify",
     decide_to_continue,
     {
-        "continue": "get_full_analysis",
+        "get_full_analysis": "get_full_analysis",
+        "embed": "embed",
+        "store_text": "store_text",
         "end": END,
     },
 )
-graph.add_edge("get_full_analysis", "embed")
+graph.add_edge("get_full_analysis", END)
 graph.add_edge("embed", END)
+graph.add_edge("store_text", END)
 
 document_agent = graph.compile()
@@ -1,7 +1,8 @@
 import json
 import re
 from langgraph.graph import StateGraph, END
-from app.services import llm_service, storage_service, highlight_service
+from app.services import llm_service, storage_service, highlight_service, text_store
+from app.core.tracing import traced
 from typing import TypedDict, List
 import os
 import tempfile
@@ -16,6 +17,7 @@ class HighlightState(TypedDict):
 
 # --- Agent Steps ---
 
+@traced("node")
 def apply_highlights(state: HighlightState):
     """Applies the highlights to the document and uploads the new version."""
     print("--- HIGHLIGHT AGENT: Applying highlights to the document... ---")
@@ -29,9 +31,16 @@ def apply_highlights(state: HighlightState):
     # Define the output path
     output_path = os.path.join(tempfile.gettempdir(), f"highlighted_{filename}")
 
+    # The saved text tells which pages hold a highlight, so only those are laid out again
+    artifact = text_store.load(user_id, doc_id)
+    page_texts = None
+    if artifact is not None and artifact.page_offsets:
+        page_texts = [artifact.page_text(i) for i in range(len(artifact.page_offsets))]
     
     # Apply highlights
-    highlighted_path = highlight_service.highlight_text(original_path, output_path, [str(v) for v in highlights.values()])
+    highlighted_path = highlight_service.highlight_text(
+        original_path, output_path, [str(v) for v in highlights.values()], page_texts=page_texts
+    )
     
     # Upload the highlighted file
     highlighted_doc_url = storage_service.upload_highlighted_document(user_id, doc_id, highlighted_path)
@@ -1,12 +1,22 @@
+import asyncio
+import glob
+import logging
+import os
+import time
+import uuid
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any
+from typing import TypedDict, List, Dict, Any, AsyncIterator, Optional, Tuple
 
 from app.agents.document_agent import document_agent, DocumentState
 from app.agents.highlighting_agent import highlighting_agent, HighlightState
 from app.agents.qa_agent import qa_agent, QAState
 from app.agents.risk_analysis_agent import risk_analysis_agent, RiskAnalysisState
 from app.agents.clause_explanation_agent import clause_explanation_agent, ClauseExplanationState
-from app.services import storage_service
+from app.core.checkpoint import SQLiteSaver
+from app.core.config import config
+from app.core import tracing
+from app.core.tracing import traced
+from app.services import storage_service, analysis_cache
 
 
 # --- Global State Definition ---
@@ -15,6 +25,7 @@ class MainState(TypedDict):
     file: Any
     file_size_bytes: int
     doc_id: str
+    content_hash: str
     text: str
     # Outputs from all agents
     document_analysis: Dict[str, Any]
@@ -29,6 +40,7 @@ class MainState(TypedDict):
 
 # --- Agent Runner Nodes ---
 
+@traced("node")
 async def run_document_agent(state: MainState):
     """
     Runs the document processing agent and correctly structures its output
@@ -36,35 +48,47 @@ async def run_document_agent(state: MainState):
     """
     print("--- MAIN AGENT: Running Document Agent ---")
     # Initial state for the sub-agent
-    doc_state = DocumentState(user_id=state["user_id"], file=state["file"])
+    doc_state = DocumentState(user_id=state["user_id"], file=state["file"], doc_id=state.get("doc_id"))
     
-    # Stream the sub-agent's execution
+    # Stream the sub-agent's execution. Its steps only return what they set,
+    # so the final result is the sub-agent's whole state after the last step
     final_result = {}
-    async for chunk in document_agent.astream(doc_state):
+    async for mode, chunk in document_agent.astream(doc_state, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_result = chunk
+            continue
         node_name = list(chunk.keys())[0]
         if node_name != "__end__":
             yield {node_name: chunk[node_name]}
-            final_result = chunk[node_name]
 
     # After the stream is done, yield the final structured state
     yield {
         "doc_id": final_result.get("doc_id"),
+        "content_hash": final_result.get("content_hash"),
         "text": final_result.get("text"),
         "document_analysis": final_result,
         "risks": final_result.get("risks", []),
     }
 
 
-def run_clause_explanation_agent(state: MainState):
+@traced("node")
+async def run_clause_explanation_agent(state: MainState):
     """Runs the clause explanation agent."""
     print("--- MAIN AGENT: Running Clause Explanation Agent ---")
+    cached = analysis_cache.lookup(state.get("content_hash"))
+    if cached and cached.clause_explanation:
+        print("--- MAIN AGENT: Reusing cached clause explanation ---")
+        return {"clause_explanation": cached.clause_explanation}
+
     discussion_text = state["document_analysis"].get("key_clause_discussion", "")
     explanation_state = ClauseExplanationState(discussion_text=discussion_text)
-    result = clause_explanation_agent.invoke(explanation_state)
+    result = await clause_explanation_agent.ainvoke(explanation_state)
     # print(f"--- CLAUSE EXPLANATION AGENT OUTPUT: {result} ---")
+    analysis_cache.store(state.get("content_hash"), clause_explanation=result["explanation"])
     return {"clause_explanation": result["explanation"]}
 
-def run_highlighting_agent(state: MainState):
+@traced("node")
+async def run_highlighting_agent(state: MainState):
     """Runs the highlighting agent and returns only the updated state."""
     print("--- MAIN AGENT: Running Highlighting Agent ---")
     
@@ -81,13 +105,14 @@ def run_highlighting_agent(state: MainState):
         doc_id=state["doc_id"],
         highlights=highlights
     )
-    result = highlighting_agent.invoke(highlight_state)
+    result = await highlighting_agent.ainvoke(highlight_state)
     # print(f"--- HIGHLIGHTING AGENT OUTPUT: {result} ---")
     return {
         "highlights": result.get("highlighted_sections", []),
         "highlighted_doc_url": result.get("highlighted_doc_url"),
     }
 
+@traced("node")
 def run_qa_agent(state: MainState):
     """Runs the Q&A agent and returns only the updated state."""
     print("--- MAIN AGENT: Running QA Agent ---")
@@ -113,16 +138,19 @@ def decide_to_continue(state: MainState):
         print("--- MAIN AGENT: Document supported. Starting parallel analysis. ---")
         return "continue"
 
+@traced("node")
 def start_parallel_analysis(state: MainState):
     """A dummy node to serve as the entry point for parallel branches."""
     return {}
 
+@traced("node")
 def consolidate_results(state: MainState):
     """A dummy node to consolidate results from parallel branches."""
     print("--- MAIN AGENT: Consolidating all results ---")
     # No longer need to calculate risk score here, it's in document_analysis
     return {}
 
+@traced("node")
 def save_to_firestore(state: MainState):
     """Saves the final, consolidated analysis to Firestore."""
     print("--- MAIN AGENT: Saving analysis to Firestore ---")
@@ -191,4 +219,162 @@ graph.add_edge("consolidate", "save_to_firestore")
 # 5. End the workflow
 graph.add_edge("save_to_firestore", END)
 
-main_agent = graph.compile()
+# Every step is checkpointed under the run's doc_id, including the steps of the
+# sub-graphs the nodes run, so a failed run can be resumed where it stopped
+checkpointer = SQLiteSaver(config.checkpoint_path) if config.checkpoint_enabled else None
+main_agent = graph.compile(checkpointer=checkpointer)
+
+# --- Checkpointed Runs ---
+
+def run_config(doc_id: str) -> dict:
+    """The config that runs (or resumes) the analysis of `doc_id`."""
+    return {"configurable": {"thread_id": doc_id}}
+
+async def get_unfinished_run(doc_id: str) -> Optional[dict]:
+    """The saved state of a run of `doc_id` that stopped before the end, or None."""
+    if checkpointer is None:
+        return None
+    snapshot = await main_agent.aget_state(run_config(doc_id))
+    return dict(snapshot.values) if snapshot.next else None
+
+async def forget_run(doc_id: str):
+    """Deletes the checkpoints of a run that has completed."""
+    if checkpointer is not None:
+        await checkpointer.adelete_thread(doc_id)
+
+async def _run_input(input_dict: Optional[dict], doc_id: str) -> Optional[dict]:
+    """The input to start a run with, or None to resume the unfinished run of `doc_id`."""
+    if await get_unfinished_run(doc_id) is not None:
+        print(f"--- MAIN AGENT: Resuming the analysis of {doc_id} from its last checkpoint ---")
+        return None
+    if input_dict is None:
+        raise ValueError(f"There is no unfinished analysis of {doc_id} to resume.")
+    return {**input_dict, "doc_id": doc_id}
+
+async def run_analysis(input_dict: Optional[dict], doc_id: Optional[str] = None) -> dict:
+    """
+    Runs main_agent on `input_dict` and returns the final state. When a run
+    of `doc_id` stopped part-way before, it is resumed instead: only the
+    steps that had not completed are run again. Pass no input to require a
+    resume. The checkpoints are deleted once the run completes.
+    """
+    doc_id = doc_id or (input_dict or {}).get("doc_id") or str(uuid.uuid4())
+    with tracing.span("main_agent", "analysis", doc_id=doc_id) as root:
+        result = await main_agent.ainvoke(await _run_input(input_dict, doc_id), config=run_config(doc_id))
+    await forget_run(doc_id)
+    return await _attach_trace(result, root, result.get("user_id"))
+
+async def _attach_trace(state: dict, root: tracing.Span, user_id: Optional[str]) -> dict:
+    """Adds the span tree of a completed run to its final state and saves it with the analysis."""
+    if not config.tracing_enabled:
+        return state
+    trace = root.to_dict()
+    if config.tracing_save_traces and user_id and state.get("doc_id"):
+        try:
+            await asyncio.to_thread(storage_service.save_analysis_trace, user_id, state["doc_id"], trace)
+        except Exception as e:
+            # The analysis itself is saved; losing its trace is not worth failing the run
+            logging.warning(f"Could not save the trace of {state['doc_id']}: {e}")
+    return {**state, "trace": trace}
+
+def purge_runs() -> int:
+    """
+    Deletes the checkpoints and kept uploads of runs that stopped more than
+    `checkpoint_retention_seconds` ago, and returns how many runs were purged.
+    """
+    if checkpointer is None:
+        return 0
+    older_than = time.time() - config.checkpoint_retention_seconds
+    for path in glob.glob(os.path.join(config.checkpoint_upload_dir, "*")):
+        if os.path.getmtime(path) < older_than:
+            os.remove(path)
+    return checkpointer.purge(older_than)
+
+# --- Progress Reporting ---
+
+# This map defines the progress percentage for each step in your main_agent
+progress_map = {
+    "__entry__": {"percentage": 0, "message": "Initializing..."},
+    # The document agent saves the file while it extracts and classifies,
+    # then analyzes and embeds side by side; whichever finishes first reports
+    "save": {"percentage": 10, "message": "Saving file..."},
+    "classify": {"percentage": 20, "message": "Extracting text and classifying..."},
+    "get_full_analysis": {"percentage": 30, "message": "Getting full analysis..."},
+    "embed": {"percentage": 40, "message": "Embedding and storing in vector DB..."},
+    "start_parallel": {"percentage": 50, "message": "Starting parallel analysis..."},
+    "explain_clauses": {"percentage": 60, "message": "Explaining clauses..."},
+    "find_highlights": {"percentage": 70, "message": "Finding highlights..."},
+    "generate_qa": {"percentage": 80, "message": "Generating Q&A..."},
+    "consolidate": {"percentage": 90, "message": "Consolidating results..."},
+    "save_to_firestore": {"percentage": 95, "message": "Saving analysis to Firestore..."},
+    "__end__": {"percentage": 100, "message": "Done!"}
+}
+
+async def stream_progress(
+    input_dict: Optional[dict], doc_id: Optional[str] = None
+) -> AsyncIterator[Tuple[Optional[str], dict]]:
+    """
+    Runs main_agent and yields (event, data) pairs as it goes: progress
+    messages with no event, typed partial results (e.g. "analysis_field")
+    written by the nodes, and finally {"percentage": 100, "message":
+    "Analysis complete!", "data": final_state}. Errors are raised. Like
+    run_analysis, an unfinished run of `doc_id` is resumed rather than
+    started over.
+    """
+    doc_id = doc_id or (input_dict or {}).get("doc_id") or str(uuid.uuid4())
+    agent_config = run_config(doc_id)
+    run_input = await _run_input(input_dict, doc_id)
+    final_state = {}
+    current_percentage = -1 # Start at -1 to ensure first message (0%) is sent
+
+    # Stream the agent's execution, including the sub-graphs and the
+    # partial results their nodes write to the "custom" stream
+    with tracing.span("main_agent", "analysis", doc_id=doc_id) as root:
+        async for namespace, mode, chunk in main_agent.astream(
+            run_input, config=agent_config, stream_mode=["updates", "custom"], subgraphs=True
+        ):
+            if mode == "custom":
+                yield chunk.get("type"), chunk
+                continue
+
+            # Updates come from the main graph and, with a namespace, from its sub-graphs
+            progress_node_name = list(chunk.keys())[0]
+
+            if progress_node_name in progress_map:
+                progress_info = progress_map[progress_node_name]
+            
+                if progress_info["percentage"] > current_percentage:
+                    current_percentage = progress_info["percentage"]
+                    yield None, progress_info
+
+            # Only the main graph's updates make up the final state
+            if namespace:
+                continue
+            main_node_name = progress_node_name
+        
+            # Store the latest state from the nodes as they run
+            if main_node_name != "__end__" and chunk[main_node_name]:
+                # If the sub-chunk is the final result, it won't have a node name key
+                if main_node_name == "process_document" and "doc_id" in chunk[main_node_name]:
+                    final_state.update(chunk[main_node_name])
+                elif main_node_name != "process_document":
+                    final_state.update(chunk[main_node_name])
+
+    if run_input is None:
+        # A resumed run only streams the steps it ran; the checkpoint has them all
+        final_state = dict((await main_agent.aget_state(agent_config)).values)
+    await forget_run(doc_id)
+    
+    # Clean up the state to remove non-serializable objects
+    final_state.pop("file", None)
+    final_state.pop("text", None)
+    if "document_analysis" in final_state and "file" in final_state.get("document_analysis", {}):
+        final_state["document_analysis"].pop("file", None)
+    user_id = (input_dict or {}).get("user_id") or final_state.get("user_id")
+    final_state = await _attach_trace(final_state, root, user_id)
+    
+    yield None, {
+        "percentage": 100,
+        "message": "Analysis complete!",
+        "data": final_state # Send the whole final, clean state
+    }
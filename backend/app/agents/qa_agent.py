@@ -1,7 +1,6 @@
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.services import pinecone_service
-from app.core.config import config
+from app.services import pinecone_service, llm_service
+from app.core.tracing import traced
 from typing import List, TypedDict
 
 # --- 1. Updated State Definition ---
@@ -11,12 +10,14 @@ class QAState(TypedDict):
     doc_id: str
     question: str
     chat_history: List[tuple[str, str]] # List of (human_question, ai_answer)
+    chat_summary: str # Summary of the turns older than chat_history
     context: str
     answer: str
     sources: List[dict] # Will hold the retrieved chunks with their metadata
 
 # --- Agent Steps ---
 
+@traced("node")
 def retrieve_context(state: QAState):
     """
     Retrieves relevant text chunks from Pinecone and stores them.
@@ -32,16 +33,18 @@ def retrieve_context(state: QAState):
     state["sources"] = chunks # Save the full source objects
     return state
 
-def generate_answer(state: QAState):
+@traced("node")
+async def generate_answer(state: QAState):
     """
     Generates an answer using the LLM, now including chat history for context.
     """
     print("--- AGENT STEP: Generating answer... ---")
-    llm = ChatGoogleGenerativeAI(model=config.model_name, google_api_key=config.google_api_key)
-
     # --- 3. Format chat history for the prompt ---
     history = state.get("chat_history", [])
     history_str = "\n".join([f"Human: {q}\nAI: {a}" for q, a in history])
+    summary = state.get("chat_summary")
+    if summary:
+        history_str = f"Summary of the earlier conversation: {summary}\n{history_str}"
 
     prompt = (
         "You are a helpful assistant. Answer the user's question based on the"
@@ -51,8 +54,7 @@ def generate_answer(state: QAState):
         f"Question: {state['question']}"
     )
 
-    response = llm.invoke(prompt)
-    state["answer"] = response.content
+    state["answer"] = await llm_service.agenerate(prompt)
     return state
 
 # --- Graph Definition ---
@@ -2,6 +2,7 @@ import json
 import re
 from langgraph.graph import StateGraph, END
 from app.services import llm_service, storage_service
+from app.core.tracing import traced
 from typing import TypedDict, List
 
 # --- State Definition ---
@@ -13,6 +14,7 @@ class RiskAnalysisState(TypedDict):
 
 # --- Agent Steps ---
 
+@traced("node")
 def get_document_text(state: RiskAnalysisState):
     """
     Retrieves the full text of the document from storage.
@@ -22,6 +24,7 @@ def get_document_text(state: RiskAnalysisState):
     state["text"] = text
     return state
 
+@traced("node")
 def analyze_risks(state: RiskAnalysisState):
     """
     Analyzes the document text for risks and obligations, now with
@@ -1,7 +1,7 @@
 # app/api/v1/dependencies.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from firebase_admin import auth
+from app.services import token_cache
 
 # This is still needed for the real dependency
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -10,7 +10,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 # This is now only for real authentication. No more development checks here.
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        decoded_token = auth.verify_id_token(token)
+        # Served from memory after the first request with this token
+        decoded_token = token_cache.verify_id_token(token)
         return decoded_token
     except Exception:
         # Catch all firebase-admin auth errors
@@ -1,46 +1,150 @@
 import io
 import logging
 import json
-from fastapi import APIRouter, Depends, UploadFile, Form, HTTPException, Response
+import os
+import shutil
+import tempfile
+import uuid
+from fastapi import APIRouter, Depends, UploadFile, Form, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
-from app.agents.main_agent import main_agent
+from app.agents.main_agent import get_unfinished_run, run_analysis, stream_progress
 from app.agents.qa_agent import qa_agent
 from .dependencies import get_current_user
-from typing import Dict, List, Tuple
-from app.services import storage_service
-
-
-# --- In-Memory Chat Session Storage ---
-# This simple dictionary will store chat histories.
-# The key will be a tuple of (user_id, doc_id)
-# The value will be a list of (question, answer) tuples.
-chat_sessions: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+from app.services import job_queue, session_store, storage_service
+from app.core.config import config
+from typing import Optional
 
 
 # A helper class to handle file streams safely across multiple agent steps
 class ReReadableUploadFile:
+    """
+    Holds an upload so several agent steps can read it. The upload is read in
+    chunks: small files stay in memory, larger ones are spooled to a temp
+    file, and reading stops with a 413 once `max_upload_bytes` is exceeded.
+    Call close() when done to remove the temp file.
+    """
     def __init__(self, file: UploadFile):
         self.filename = file.filename
         self.content_type = file.content_type
         self._content = None
+        self._path = None
         self._size_bytes: int = 0
 
     async def read_content(self, file: UploadFile):
-        self._content = await file.read()
-        self._size_bytes = len(self._content)
+        buffer = bytearray()
+        spool = None
+        try:
+            while chunk := await file.read(config.upload_chunk_bytes):
+                self._size_bytes += len(chunk)
+                if self._size_bytes > config.max_upload_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File is larger than the {config.max_upload_bytes // (1024 * 1024)} MB limit.",
+                    )
+                if spool is None and len(buffer) + len(chunk) > config.upload_spool_threshold_bytes:
+                    suffix = os.path.splitext(self.filename or "")[1]
+                    spool = tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False)
+                    self._path = spool.name
+                    spool.write(buffer)
+                    buffer = bytearray()
+                if spool is not None:
+                    spool.write(chunk)
+                else:
+                    buffer += chunk
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            self.close()
+            raise
+        if spool is not None:
+            spool.close()
+        else:
+            self._content = bytes(buffer)
 
     @property
     def file(self):
+        # Provide a new, fresh stream every time .file is accessed
+        if self._path is not None:
+            return open(self._path, "rb")
         if self._content is None:
             return None
-        # Provide a new, fresh stream every time .file is accessed
         return io.BytesIO(self._content)
 
+    @property
+    def source(self):
+        """The temp file's path when spooled, otherwise the bytes. Both can be opened by PyMuPDF without a copy."""
+        return self._path if self._path is not None else self._content
+
+    def save_to(self, path: str):
+        """Moves the upload to `path`, e.g. to keep it for a background job. Nothing is left to close afterwards."""
+        if self._path is not None:
+            shutil.move(self._path, path)
+            self._path = None
+        else:
+            with open(path, "wb") as f:
+                f.write(self._content or b"")
+            self._content = None
+
+    def close(self):
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+        self._content = None
+
     @property # <-- NEW
     def size_bytes(self) -> int: # <-- NEW
         """Returns the size of the file in bytes.""" # <-- NEW
         return self._size_bytes # <-- NEW
 
+def _keep_upload(readable_file: ReReadableUploadFile, doc_id: str):
+    """
+    With checkpoints on, moves the upload to `checkpoint_upload_dir` and
+    returns it as a StoredUpload, so an analysis that fails can be retried
+    after the request is over. Otherwise the upload is returned as it is.
+    """
+    if not config.checkpoint_enabled:
+        return readable_file
+    os.makedirs(config.checkpoint_upload_dir, exist_ok=True)
+    suffix = os.path.splitext(readable_file.filename or "")[1]
+    path = os.path.join(config.checkpoint_upload_dir, f"{doc_id}{suffix}")
+    size_bytes = readable_file.size_bytes
+    readable_file.save_to(path)
+    return job_queue.StoredUpload(path, readable_file.filename, readable_file.content_type, size_bytes)
+
+def _discard_upload(upload):
+    """Removes an upload kept by _keep_upload once its analysis has completed."""
+    if isinstance(upload, job_queue.StoredUpload):
+        try:
+            os.remove(upload.path)
+        except FileNotFoundError:
+            pass
+
+def _analysis_response(result: dict) -> dict:
+    """The fields of main_agent's final state that /analyze returns."""
+    # --- FIX: The 'file' object in the state is not JSON serializable ---
+    # We need to remove it before returning the response.
+    if "document_analysis" in result and "file" in result["document_analysis"]:
+        del result["document_analysis"]["file"]
+
+    return {
+        "doc_id": result.get("doc_id"),
+        "document_analysis": result.get("document_analysis"),
+        "risks": result.get("risks"),
+        "highlights": result.get("highlights"),
+        "highlighted_doc_url": result.get("highlighted_doc_url"),
+        "qa_response": result.get("qa_response"),
+        "clause_explanation": result.get("clause_explanation"),
+        "trace": result.get("trace"),
+    }
+
+def _retry_hint(doc_id: str) -> str:
+    if not config.checkpoint_enabled:
+        return ""
+    return f" (retry with POST /analyses/{doc_id}/retry to resume where it stopped)"
+
 router = APIRouter()
 
 @router.post("/analyze")
@@ -53,45 +157,60 @@ async def analyze_document(
     """
     A single endpoint to upload and fully analyze a document.
     """
+    readable_file = ReReadableUploadFile(file)
+    doc_id = str(uuid.uuid4())
     try:
         user_id = current_user['uid']
         
         # Create a re-readable file object to pass to the agent
-        readable_file = ReReadableUploadFile(file)
         await readable_file.read_content(file)
 
         file_size_bytes = readable_file.size_bytes
+        upload = _keep_upload(readable_file, doc_id)
         # Invoke the main agent with all the necessary inputs
-        result = main_agent.invoke({
+        result = await run_analysis({
             "user_id": user_id,
-            "file": readable_file,
+            "file": upload,
             "file_size_bytes": file_size_bytes,
             "qa_question": qa_question,
             "highlight_criteria": highlight_criteria
-        })
+        }, doc_id)
+        _discard_upload(upload)
         
         # The result from the main_agent is the final state
         # print(f"--- MAIN AGENT FINAL OUTPUT: {result} ---")
-        
-        # --- FIX: The 'file' object in the state is not JSON serializable ---
-        # We need to remove it before returning the response.
-        if "document_analysis" in result and "file" in result["document_analysis"]:
-            del result["document_analysis"]["file"]
-
-        return {
-            "doc_id": result.get("doc_id"),
-            "document_analysis": result.get("document_analysis"),
-            "risks": result.get("risks"),
-            "highlights": result.get("highlights"),
-            "highlighted_doc_url": result.get("highlighted_doc_url"),
-            "qa_response": result.get("qa_response"),
-            "clause_explanation": result.get("clause_explanation"),
-        }
+        return _analysis_response(result)
 
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"CRITICAL ERROR in /analyze endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}{_retry_hint(doc_id)}")
+    finally:
+        readable_file.close()
+
+
+@router.post("/analyses/{doc_id}/retry")
+async def retry_analysis(doc_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Resumes an analysis from /analyze or /analyze-stream that failed part-way.
+    The steps that completed are not run again: their results come from the
+    run's checkpoints. Answers like /analyze.
+    """
+    if await job_queue.aget_job(doc_id) is not None:
+        raise HTTPException(status_code=409, detail=f"This is a background job; retry it with POST /jobs/{doc_id}/retry.")
+    state = await get_unfinished_run(doc_id)
+    # Other users' analyses are reported as missing
+    if state is None or state.get("user_id") != current_user['uid']:
+        raise HTTPException(status_code=404, detail="No failed analysis to retry.")
+    try:
+        result = await run_analysis(None, doc_id)
+        _discard_upload(state.get("file"))
+        return _analysis_response(result)
+    except Exception as e:
+        logging.error(f"CRITICAL ERROR in /analyses/{{doc_id}}/retry endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}{_retry_hint(doc_id)}")
 
 
 @router.post("/ask")
@@ -102,23 +221,23 @@ async def ask_question(doc_id: str = Form(...), question: str = Form(...), curre
     try:
         user_id = current_user['uid']
         
-        # --- 1. Manage Session History ---
-        session_key = (user_id, doc_id)
-        chat_history = chat_sessions.get(session_key, [])
-        print(f"--- history for session {session_key}: {len(chat_history)} previous exchanges. ---")
+        # --- 1. Load Session History ---
+        # Recent turns plus a summary of older ones, kept within the history caps
+        session = await session_store.aget_session(user_id, doc_id)
+        print(f"--- history for session {(user_id, doc_id)}: {len(session.turns)} recent exchanges. ---")
 
         # --- 2. Invoke Agent with History ---
-        result = qa_agent.invoke({
+        result = await qa_agent.ainvoke({
             "user_id": user_id,
             "doc_id": doc_id,
             "question": question,
-            "chat_history": chat_history # Pass the history to the agent
+            "chat_history": session.turns, # Pass the history to the agent
+            "chat_summary": session.summary
         })
 
-        # --- 3. Update History and Store It ---
+        # --- 3. Record the Exchange ---
         new_answer = result.get("answer", "No answer found.")
-        chat_history.append((question, new_answer))
-        chat_sessions[session_key] = chat_history
+        await session_store.append_turn(user_id, doc_id, question, new_answer)
         
         return {"answer": new_answer, "sources": result.get("sources", [])}
 
@@ -127,40 +246,54 @@ async def ask_question(doc_id: str = Form(...), question: str = Form(...), curre
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
 
 @router.get("/history")
-async def get_history(response: Response, current_user: dict = Depends(get_current_user)):
-    """Retrieves the analysis history for the current user."""
+async def get_history(
+    response: Response,
+    limit: int = Query(config.history_page_size, ge=1, le=config.history_max_page_size),
+    after: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Retrieves one page of the current user's analysis history, with only the
+    fields the list view needs. Pass the returned `next_cursor` as `after` to
+    get the next page; the full analysis is at /history/{doc_id}.
+    """
     try:
         user_id = current_user['uid']
-        history = storage_service.get_analysis_history(user_id)
+        history, next_cursor = storage_service.get_analysis_history(user_id, limit=limit, after=after)
 
         # 3. Set the cache header before returning
         # This tells the browser to cache this specific user's
         # data for 300 seconds (5 minutes).
         response.headers["Cache-Control"] = "private, max-age=60"
 
-        return {"history": history}
+        return {"history": history, "next_cursor": next_cursor}
+    except ValueError as e:
+        # A malformed cursor
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
     except Exception as e:
         logging.error(f"CRITICAL ERROR in /history endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
 
-# This map defines the progress percentage for each step in your main_agent
-progress_map = {
-    "__entry__": {"percentage": 0, "message": "Initializing..."},
-    "save_file": {"percentage": 10, "message": "Saving file..."},
-    "extract_text_and_classify": {"percentage": 20, "message": "Extracting text and classifying..."},
-    "get_full_analysis": {"percentage": 30, "message": "Getting full analysis..."},
-    "embed_and_store": {"percentage": 40, "message": "Embedding and storing in vector DB..."},
-    "start_parallel": {"percentage": 50, "message": "Starting parallel analysis..."},
-    "explain_clauses": {"percentage": 60, "message": "Explaining clauses..."},
-    "find_highlights": {"percentage": 70, "message": "Finding highlights..."},
-    "generate_qa": {"percentage": 80, "message": "Generating Q&A..."},
-    "consolidate": {"percentage": 90, "message": "Consolidating results..."},
-    "save_to_firestore": {"percentage": 95, "message": "Saving analysis to Firestore..."},
-    "__end__": {"percentage": 100, "message": "Done!"}
-}
-
-def format_sse_message(data: dict) -> str:
-    """Formats a dictionary into a Server-Sent Event message string."""
+@router.get("/history/{doc_id}")
+async def get_history_item(doc_id: str, response: Response, current_user: dict = Depends(get_current_user)):
+    """Retrieves the complete analysis of one of the current user's documents."""
+    try:
+        analysis = storage_service.get_analysis(current_user['uid'], doc_id)
+    except Exception as e:
+        logging.error(f"CRITICAL ERROR in /history/{{doc_id}} endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found.")
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return analysis
+
+def format_sse_message(data: dict, event: str | None = None) -> str:
+    """
+    Formats a dictionary into a Server-Sent Event message string. Typed
+    events carry an `event:` line; untyped ones are progress messages.
+    """
+    if event:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
     return f"data: {json.dumps(data)}\n\n"
 
 async def stream_analysis(
@@ -171,78 +304,48 @@ async def stream_analysis(
 ):
     """
     An async generator that streams the agent's progress.
+
+    Besides the progress messages, every analysis field is sent as an
+    `analysis_field` event as soon as the LLM has written it, e.g.
+    {"type": "analysis_field", "field": "summary", "value": "..."} or, for a
+    single highlight, {"type": "analysis_field", "field": "highlights",
+    "key": "governing_law", "value": "..."}.
     """
+    readable_file = ReReadableUploadFile(file)
+    doc_id = str(uuid.uuid4())
     try:
         # 1. Prepare file
-        readable_file = ReReadableUploadFile(file)
         await readable_file.read_content(file)
         file_size_bytes = readable_file.size_bytes
+        upload = _keep_upload(readable_file, doc_id)
 
         # 2. Prepare agent input
         input_dict = {
             "user_id": user_id,
-            "file": readable_file,
+            "file": upload,
             "file_size_bytes": file_size_bytes,
             "qa_question": qa_question,
             "highlight_criteria": highlight_criteria
         }
 
-        final_state = {}
-        current_percentage = -1 # Start at -1 to ensure first message (0%) is sent
-
-        # 3. Stream the agent's execution
-        async for chunk in main_agent.astream(input_dict):
-            # The stream now yields chunks from the main graph and the sub-graph
-            main_node_name = list(chunk.keys())[0]
-            
-            # Default to the main node name
-            progress_node_name = main_node_name
-            
-            # If the chunk is from the document agent, unwrap the sub-graph's node name
-            if main_node_name == "process_document":
-                sub_chunk = chunk["process_document"]
-                if sub_chunk:
-                    progress_node_name = list(sub_chunk.keys())[0]
-
-            if progress_node_name in progress_map:
-                progress_info = progress_map[progress_node_name]
-                
-                if progress_info["percentage"] > current_percentage:
-                    current_percentage = progress_info["percentage"]
-                    yield format_sse_message(progress_info)
-            
-            # Store the latest state from the nodes as they run
-            if main_node_name != "__end__" and chunk[main_node_name]:
-                # If the sub-chunk is the final result, it won't have a node name key
-                if main_node_name == "process_document" and "doc_id" in chunk[main_node_name]:
-                    final_state.update(chunk[main_node_name])
-                elif main_node_name != "process_document":
-                    final_state.update(chunk[main_node_name])
-        
-        # 4. After the loop, send the final complete result
-        
-        # Clean up the state to remove non-serializable objects
-        final_state.pop("file", None)
-        final_state.pop("text", None)
-        if "document_analysis" in final_state and "file" in final_state.get("document_analysis", {}):
-            final_state["document_analysis"].pop("file", None)
-        
-        final_result = {
-            "percentage": 100,
-            "message": "Analysis complete!",
-            "data": final_state # Send the whole final, clean state
-        }
-        yield format_sse_message(final_result)
+        # 3. Stream the agent's progress, partial results and final result
+        async for event, data in stream_progress(input_dict, doc_id):
+            yield format_sse_message(data, event=event)
+        _discard_upload(upload)
 
     except Exception as e:
         # Send an error message over the stream
         logging.error(f"Error during analysis stream: {e}", exc_info=True)
         error_message = {
             "percentage": -1,
-            "message": f"An error occurred: {e}",
+            "message": f"An error occurred: {e}{_retry_hint(doc_id)}",
             "error": True
         }
+        if config.checkpoint_enabled:
+            error_message["doc_id"] = doc_id
         yield format_sse_message(error_message)
+    finally:
+        readable_file.close()
 
 
 @router.post("/analyze-stream")
@@ -269,3 +372,73 @@ async def analyze_document_stream(
     
     # Return it as a streaming response
     return StreamingResponse(generator, media_type="text/event-stream")
+
+
+# --- Background Analysis Jobs ---
+
+@router.post("/jobs", status_code=202)
+async def submit_analysis_job(
+    file: UploadFile,
+    qa_question: str = Form("Summarize the key points of this document."),
+    highlight_criteria: str = Form("Identify all clauses related to termination and liability."),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queues a document for analysis and returns its job ID right away. Follow
+    the job with GET /jobs/{job_id} or the /jobs/{job_id}/events stream.
+    """
+    readable_file = ReReadableUploadFile(file)
+    try:
+        await readable_file.read_content(file)
+        job = await job_queue.submit(current_user['uid'], readable_file, qa_question, highlight_criteria)
+        return {"job_id": job.id, "status": job.status}
+    except job_queue.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"CRITICAL ERROR in /jobs endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+    finally:
+        readable_file.close()
+
+async def _get_user_job(job_id: str, user_id: str) -> job_queue.Job:
+    job = await job_queue.aget_job(job_id)
+    # Other users' jobs are reported as missing
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Returns a job's status and progress, and its result once it has completed."""
+    return (await _get_user_job(job_id, current_user['uid'])).to_dict()
+
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Queues a failed job again. It resumes from the last step that completed,
+    so only the failed steps are run again.
+    """
+    await _get_user_job(job_id, current_user['uid'])
+    try:
+        job = await job_queue.retry(job_id)
+    except job_queue.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Streams a job's progress as Server-Sent Events, in the same format as
+    /analyze-stream, ending with the result or an error message.
+    """
+    await _get_user_job(job_id, current_user['uid'])
+
+    async def generator():
+        async for event, data in job_queue.subscribe(job_id):
+            yield format_sse_message(data, event=event)
+
+    return StreamingResponse(generator(), media_type="text/event-stream")
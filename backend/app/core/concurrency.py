@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+_GLOBAL_KEY = "__global__"
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of in-flight async calls with a process-wide limit plus
+    a per-key limit (e.g. one per model name).
+
+    asyncio semaphores belong to the event loop that first waits on them, so
+    one set is kept per running loop. A uvicorn worker runs a single loop,
+    which makes the limits effectively process-wide.
+    """
+
+    def __init__(self, global_limit: int, per_key_limit: int, key_limits: Optional[Dict[str, int]] = None):
+        if global_limit < 1 or per_key_limit < 1:
+            raise ValueError("Concurrency limits must be at least 1.")
+        self.global_limit = global_limit
+        self.per_key_limit = per_key_limit
+        self.key_limits = dict(key_limits or {})
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _semaphore(self, key: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._loops.setdefault(loop, {})
+            if key not in semaphores:
+                if key == _GLOBAL_KEY:
+                    size = self.global_limit
+                else:
+                    size = self.key_limits.get(key, self.per_key_limit)
+                semaphores[key] = asyncio.Semaphore(size)
+            return semaphores[key]
+
+    @asynccontextmanager
+    async def limit(self, key: str):
+        """Holds one per-key slot and one global slot for the duration of the block."""
+        # Take the per-key slot first so a caller waiting on a saturated model
+        # does not sit on a global slot other models could be using.
+        async with self._semaphore(key):
+            async with self._semaphore(_GLOBAL_KEY):
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    yield
+                finally:
+                    self.in_flight -= 1
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs a coroutine to completion from synchronous code.
+
+    If the caller is already inside a running event loop the coroutine is run
+    on a helper thread with its own loop instead of failing.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
@@ -13,14 +13,119 @@ class Config(BaseSettings):
     model_name: str = "gemini-2.5-flash"
     embedding_model_name: str = "models/gemini-embedding-001"
     google_api_key: str 
+    # Max in-flight LLM calls per process, and per model name
+    llm_max_concurrency: int = 32
+    llm_per_model_concurrency: int = 16
+    llm_model_concurrency: dict[str, int] = {}
+    # Documents longer than this (approximate tokens) are analyzed section by section
+    long_document_token_threshold: int = 30_000
+    long_document_section_tokens: int = 8_000
 
-    # Pinecone
-    pinecone_api_key: str 
-    pinecone_environment: str 
-    pinecone_index_name: str
+    # Documents are classified locally when the keyword model is at least this confident and the text long
+    # enough to judge; otherwise the LLM classifies them. Off until it has been measured on more real uploads
+    local_classifier_enabled: bool = False
+    local_classifier_min_confidence: float = 0.9
+    local_classifier_min_words: int = 50
+    local_classifier_chars: int = 5000
+    # Documents the local classifier is unsure of are classified and analyzed in one LLM call, with a prompt
+    # holding every workflow; off, they get a classification call and then an analysis call. Fused saves a
+    # round trip, but the prompt is about twice as long and the embedding waits for the reply
+    fused_analysis_enabled: bool = False
+
+    # Whole-document analysis cache, keyed by content hash
+    analysis_cache_enabled: bool = True
+    analysis_cache_max_entries: int = 256
+    analysis_cache_ttl_seconds: int = 7 * 24 * 3600
+    # Replies to the classification, analysis and clause explanation prompts, keyed by model, prompt hash
+    # and generation parameters; in memory, then in SQLite (off when the path is empty) trimmed to a size
+    llm_cache_enabled: bool = True
+    llm_cache_size: int = 512
+    llm_cache_path: str = ""
+    llm_cache_disk_max_bytes: int = 256 * 1024 * 1024
+
+    # Extracted text, page offsets and sections of each analyzed document, saved once as a compressed artifact
+    # so later steps skip the download and re-parse: "local" (files under text_store_dir) or "storage"
+    # (Firebase Storage, next to the upload), with the most recently used kept in memory
+    text_store_backend: str = "local"
+    text_store_dir: str = "./text_store"
+    text_store_cache_size: int = 64
+    text_store_compression_level: int = 6
+
+    # Vector store: "pinecone", or "local" for the in-process NumPy store
+    vector_store_backend: str = "pinecone"
+    local_vector_store_path: str = "./vector_store"
+
+    # Pinecone (only needed when vector_store_backend is "pinecone")
+    pinecone_api_key: str = ""
+    pinecone_environment: str = ""
+    pinecone_index_name: str = ""
+    # Chunk sizes are in (approximate) tokens
+    chunk_target_tokens: int = 200
+    chunk_overlap_tokens: int = 30
+    retrieval_top_k: int = 3
+    # Query embeddings for /ask are cached; the SQLite disk tier is off when the path is empty
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl_seconds: int = 24 * 3600
+    query_embedding_cache_path: str = ""
+    query_embedding_cache_disk_max_entries: int = 50_000
+    # Embedding requests and upserts are batched and run concurrently
+    embedding_batch_size: int = 100
+    embedding_max_concurrent_batches: int = 4
+    pinecone_upsert_batch_size: int = 100
+    pinecone_upsert_max_bytes: int = 1_500_000  # Pinecone rejects requests over 2 MB
+    pinecone_upsert_concurrency: int = 2
+
+    # Chat sessions for /ask: "memory" (per process) or "sqlite" (shared by workers, kept across restarts)
+    chat_session_backend: str = "memory"
+    chat_session_path: str = "./chat_sessions.db"
+    chat_session_max_sessions: int = 10_000
+    chat_session_ttl_seconds: int = 7 * 24 * 3600
+    # Recent turns sent with each question; older ones are summarized (or dropped when summarization is off)
+    chat_history_max_turns: int = 20
+    chat_history_token_budget: int = 2_000
+    chat_history_summarize: bool = True
+    chat_summary_max_words: int = 250
+
+    # Verified Firebase ID tokens are cached until `exp` minus the margin
+    auth_token_cache_enabled: bool = True
+    auth_token_cache_size: int = 10_000
+    auth_token_expiry_margin_seconds: int = 60
+    # With revocation checks on, cached tokens are re-verified (and checked) at least this often
+    auth_check_revoked: bool = False
+    auth_revocation_check_interval_seconds: int = 300
 
     # Storage  
     firebase_storage_bucket: str 
+    # Background analysis jobs (POST /jobs); jobs and their uploads are kept on local disk
+    job_workers: int = 2
+    job_queue_max_size: int = 100
+    job_store_path: str = "./jobs.db"
+    job_upload_dir: str = "./job_uploads"
+    job_retention_seconds: int = 7 * 24 * 3600
+    job_poll_interval_seconds: float = 1.0
+    # main_agent checkpoints every step, keyed by doc_id, so a failed analysis can be retried from
+    # where it stopped; the uploads of analyses run within the request are kept until then
+    checkpoint_enabled: bool = True
+    checkpoint_path: str = "./checkpoints.db"
+    checkpoint_upload_dir: str = "./checkpoint_uploads"
+    checkpoint_retention_seconds: int = 7 * 24 * 3600
+    # Every graph node and external call is timed into the Prometheus histograms at /metrics, and each
+    # analysis returns its span tree, which is also saved with the analysis when tracing_save_traces is on
+    tracing_enabled: bool = True
+    tracing_save_traces: bool = True
+    # Firebase, the LLM, the embedding model and the vector store are created on first use; with warm-up
+    # on they are all created side by side at startup instead, so the first request does not wait
+    warm_up_clients: bool = False
+    # /history page sizes
+    history_page_size: int = 50
+    history_max_page_size: int = 200
+    # Uploads over the spool threshold go to a temp file while being read; larger than the maximum is rejected
+    max_upload_bytes: int = 100 * 1024 * 1024
+    upload_spool_threshold_bytes: int = 2 * 1024 * 1024
+    upload_chunk_bytes: int = 1024 * 1024  # also the Storage upload chunk size, a multiple of 256 KB
+    # PDFs with at least this many pages are extracted in a process pool (0 workers = one per CPU)
+    pdf_parallel_min_pages: int = 64
+    pdf_extraction_workers: int = 0
 
     model_config = SettingsConfigDict(
         env_file=".env",
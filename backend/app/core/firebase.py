@@ -1,50 +1,71 @@
 import os
-import firebase_admin
-from firebase_admin import credentials, auth, storage, firestore
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# The Admin SDK is imported and initialized on first use, so importing the app stays cheap
+_initialized = False
+_init_lock = threading.Lock()
+
+
 # --- Robust Firebase Admin SDK Initialization ---
-try:
-    # Construct credentials from environment variables
-    creds_json = {
-        "type": os.getenv("TYPE"),
-        "project_id": os.getenv("PROJECT_ID"),
-        "private_key_id": os.getenv("PRIVATE_KEY_ID"),
-        "private_key": os.getenv("PRIVATE_KEY").replace('\\n', '\n'),
-        "client_email": os.getenv("CLIENT_EMAIL"),
-        "client_id": os.getenv("CLIENT_ID"),
-        "auth_uri": os.getenv("AUTH_URI"),
-        "token_uri": os.getenv("TOKEN_URI"),
-        "auth_provider_x509_cert_url": os.getenv("AUTH_PROVIDER_X509_CERT_URL"),
-        "client_x509_cert_url": os.getenv("CLIENT_X509_CERT_URL"),
-        "universe_domain": os.getenv("UNIVERSE_DOMAIN"),
-    }
-
-    bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET")
-    if not bucket_name:
-        raise ValueError("FIREBASE_STORAGE_BUCKET environment variable not set.")
-
-    cred = credentials.Certificate(creds_json)
-    firebase_admin.initialize_app(cred, {
-        'storageBucket': bucket_name
-    })
-    print("--- Firebase Admin SDK initialized successfully from environment variables. ---")
-
-except Exception as e:
-    # This will print a very clear error message if initialization fails.
-    print(f"--- CRITICAL ERROR: Firebase Admin SDK failed to initialize: {e} ---")
-    # You might want to exit the application if Firebase is essential
-    # import sys
-    # sys.exit(1)
+def initialize():
+    """Initializes the Firebase Admin SDK once, from environment variables. Thread-safe."""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        import firebase_admin
+        from firebase_admin import credentials
+
+        try:
+            # Construct credentials from environment variables
+            creds_json = {
+                "type": os.getenv("TYPE"),
+                "project_id": os.getenv("PROJECT_ID"),
+                "private_key_id": os.getenv("PRIVATE_KEY_ID"),
+                "private_key": os.getenv("PRIVATE_KEY").replace('\\n', '\n'),
+                "client_email": os.getenv("CLIENT_EMAIL"),
+                "client_id": os.getenv("CLIENT_ID"),
+                "auth_uri": os.getenv("AUTH_URI"),
+                "token_uri": os.getenv("TOKEN_URI"),
+                "auth_provider_x509_cert_url": os.getenv("AUTH_PROVIDER_X509_CERT_URL"),
+                "client_x509_cert_url": os.getenv("CLIENT_X509_CERT_URL"),
+                "universe_domain": os.getenv("UNIVERSE_DOMAIN"),
+            }
+
+            bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET")
+            if not bucket_name:
+                raise ValueError("FIREBASE_STORAGE_BUCKET environment variable not set.")
+
+            cred = credentials.Certificate(creds_json)
+            firebase_admin.initialize_app(cred, {
+                'storageBucket': bucket_name
+            })
+            print("--- Firebase Admin SDK initialized successfully from environment variables. ---")
+
+        except Exception as e:
+            # This will print a very clear error message if initialization fails.
+            # The caller gets the error; the next call tries again.
+            print(f"--- CRITICAL ERROR: Firebase Admin SDK failed to initialize: {e} ---")
+            raise
+        _initialized = True
 
 
 def get_firebase_auth():
+    initialize()
+    from firebase_admin import auth
     return auth
 
 def get_firebase_storage():
+    initialize()
+    from firebase_admin import storage
     return storage.bucket()
 
 def get_firestore_client():
+    initialize()
+    from firebase_admin import firestore
     return firestore.client()
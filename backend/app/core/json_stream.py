@@ -0,0 +1,118 @@
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class _Container:
+    """An object or array the parser is currently inside."""
+    kind: str  # "{" or "["
+    path: Tuple[str, ...]
+    emit: bool
+    key: Optional[str] = None
+    expect: str = "key"  # for objects: "key", "colon", "value" or "comma"
+    value_start: Optional[int] = None
+
+
+class JSONFieldStream:
+    """
+    Incrementally parses a JSON object that arrives in pieces (e.g. streamed
+    LLM tokens) and reports each member as soon as its value is complete.
+
+    `feed` returns (path, value) pairs, where path is the tuple of keys
+    leading to the member: ("summary",) for a top-level field, or
+    ("highlights", "governing_law") for an entry of a nested object. Members
+    of objects nested deeper than `max_depth`, or inside arrays, are only
+    reported as part of their enclosing value. Text before the first "{"
+    (such as a ```json fence) is skipped.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._done = False
+
+    def feed(self, text: str) -> List[Tuple[Tuple[str, ...], Any]]:
+        self._buffer += text
+        fields = []
+        while self._pos < len(self._buffer) and not self._done:
+            self._step(self._buffer[self._pos], self._pos, fields)
+            self._pos += 1
+        return fields
+
+    # --- Scanner ---
+
+    def _step(self, ch: str, i: int, fields: list):
+        top = self._stack[-1] if self._stack else None
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if top.kind == "{" and top.expect == "key":
+                    top.key = json.loads(self._buffer[self._string_start:i + 1])
+                    top.expect = "colon"
+                elif top.kind == "{" and top.value_start is not None:
+                    self._finish(top, i + 1, fields)
+            return
+
+        if top is None:
+            # Skip anything before the outermost object
+            if ch == "{":
+                self._stack.append(_Container("{", (), emit=True))
+            return
+
+        if ch == '"':
+            self._in_string = True
+            self._string_start = i
+            self._begin_value(top, i)
+        elif ch in "{[":
+            self._begin_value(top, i)
+            nested = top.kind == "{" and top.emit and len(top.path) + 1 < self.max_depth
+            path = top.path + (top.key,) if top.kind == "{" else top.path
+            self._stack.append(_Container(ch, path, emit=nested and ch == "{"))
+        elif ch in "}]":
+            if top.kind == "{" and top.value_start is not None:
+                self._finish(top, i, fields)
+            self._stack.pop()
+            if not self._stack:
+                self._done = True
+                return
+            parent = self._stack[-1]
+            if parent.kind == "{" and parent.value_start is not None:
+                self._finish(parent, i + 1, fields)
+        elif top.kind == "{" and ch == ":":
+            top.expect = "value"
+        elif top.kind == "{" and ch == ",":
+            if top.value_start is not None:
+                self._finish(top, i, fields)
+            top.expect = "key"
+        elif ch not in _WHITESPACE:
+            # Start of a number, true, false or null
+            self._begin_value(top, i)
+
+    def _begin_value(self, top: _Container, i: int):
+        if top.kind == "{" and top.expect == "value" and top.value_start is None:
+            top.value_start = i
+
+    def _finish(self, container: _Container, end: int, fields: list):
+        raw = self._buffer[container.value_start:end]
+        container.value_start = None
+        container.expect = "comma"
+        if not container.emit:
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        fields.append((container.path + (container.key,), value))
@@ -0,0 +1,12 @@
+from urllib.parse import quote
+
+
+def safe_path_component(name: str) -> str:
+    """
+    Quotes a user or document ID for use as one directory name, so that `/`
+    and `..` in an ID cannot reach outside the directory it is joined to.
+    """
+    safe = quote(name, safe="")
+    if safe in ("", ".", ".."):
+        raise ValueError(f"Invalid path component: {name!r}")
+    return safe
@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 MAIN_SYSTEM_PROMPT = """
 You are an advanced AI assistant designed exclusively for legal and business document analysis. Your name is Docu-Analyzer.
 
@@ -257,3 +260,107 @@ Discussion:
 ---
 {discussion_text}
 """
+
+SECTION_ANALYSIS_PROMPT = """
+{system_prompt}
+
+{instructions}
+The document is too long to analyze at once. Below is section {index} of {total}. Analyze ONLY this section.
+
+Section Text:
+---
+{section_text}
+---
+
+Instructions: Generate a JSON response with the following structure: {{"section_summary": "", "key_clauses": [], "risks": [], "answers": {{}}, "highlights": {{}}}}
+
+1. Section Summary (section_summary): Summarize what this section covers in 1-2 neutral sentences.
+2. Key Clauses (key_clauses): {key_clause_discussion_prompt} Only list clauses that appear in this section.
+3. Risks (risks): {risks_prompt}
+Only include risks found in this section.
+4. Answers (answers): Answer each question below based only on this section, using the question text as the key. If this section does not answer it, use "Not specified."
+{questions}
+5. Highlights (highlights): For each key below, extract the exact, verbatim text if it appears in this section. If it does not, use "Not Found."
+{highlights}
+"""
+
+ANALYSIS_REDUCE_PROMPT = """
+{system_prompt}
+
+{instructions}
+The document was analyzed section by section. Combine the section results below into an analysis of the whole document.
+
+Section Summaries:
+{section_summaries}
+
+Risks identified across the whole document:
+{risks}
+
+Instructions: Generate a JSON response with the following structure: {{"summary": "", "risk_score": 0}}
+
+1. Summary (summary): {summary_prompt}
+2. Risk Score (risk_score): {risk_score_prompt}
+"""
+
+FUSED_ANALYSIS_PROMPT = """
+{system_prompt}
+
+Classify the document below into one of the following categories, then analyze it with the workflow for that category and provide a JSON response.
+{categories}
+
+- If the document is a legal document but does not fit into any of the specific categories above, classify it as "General Legal Document".
+- If the document is not a legal document, classify it as "Unsupported Document Type" and return only {{"classification": "Unsupported Document Type"}}.
+
+Document Text:
+---
+{text}
+---
+
+Instructions: Generate a JSON response with the following structure, writing the classification first: {{"classification": "", "summary": "", "key_clause_discussion": "", "risks": [], "risk_score": 0, "questions": [], "highlights": {{}}}}
+
+Fill in the fields with the workflow of the category you chose:
+- Risk Score (risk_score): {risk_score_prompt}
+- Questions (questions): Answer the workflow's questions based only on the text. If not found, state "Not specified."
+- Highlights (highlights): Extract the exact, verbatim text for each of the workflow's keys. If not found, state "Not Found."
+{workflows}
+"""
+
+FUSED_WORKFLOW_PROMPT = """
+## {classification}
+Summary (summary): {summary_prompt}
+Key Clause Discussion (key_clause_discussion): {key_clause_discussion_prompt}
+Risks (risks): {risks_prompt}
+Questions (questions): {questions}
+Highlights (highlights): {highlights}
+"""
+
+
+CHAT_SUMMARY_PROMPT = """
+Condense the conversation below between a user and an assistant about a legal document into a short summary that a later answer can rely on. Keep the questions asked, the facts and figures given in the answers, and any conclusions reached. Leave out pleasantries and repetition. Use at most {max_words} words and reply with the summary only.
+
+Summary of the conversation so far:
+{previous_summary}
+
+Newer exchanges:
+{exchanges}
+"""
+
+
+def prompt_version() -> str:
+    """
+    A short fingerprint of the prompts above. It changes whenever any of them
+    is edited, so caches keyed by it stop serving results from old prompts.
+    """
+    payload = json.dumps(
+        [
+            MAIN_SYSTEM_PROMPT,
+            WORKFLOW_PROMPTS,
+            CLAUSE_EXPLANATION_PROMPT,
+            SECTION_ANALYSIS_PROMPT,
+            ANALYSIS_REDUCE_PROMPT,
+            FUSED_ANALYSIS_PROMPT,
+            FUSED_WORKFLOW_PROMPT,
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,320 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import config
+
+_PREFIX = "legalmind"
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+# --- Metrics ---
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A Prometheus counter with labels."""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """A Prometheus histogram with labels: cumulative bucket counts, a sum and a count per label set."""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [count per bucket..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            values = self._values.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, values in sorted(self._values.items()):
+                bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+                for bound, count in zip(bounds, values[:-2] + [values[-1]]):
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, bound)} {count}")
+                label_text = _labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{label_text} {values[-2]}")
+                lines.append(f"{self.name}_count{label_text} {values[-1]}")
+        return lines
+
+
+span_duration = Histogram(
+    f"{_PREFIX}_span_duration_seconds", "Duration of graph nodes and external calls.",
+    ("kind", "name"), _DURATION_BUCKETS,
+)
+span_input_bytes = Histogram(
+    f"{_PREFIX}_span_input_bytes", "Approximate size of the arguments of graph nodes and external calls.",
+    ("kind", "name"), _SIZE_BUCKETS,
+)
+span_output_bytes = Histogram(
+    f"{_PREFIX}_span_output_bytes", "Approximate size of the results of graph nodes and external calls.",
+    ("kind", "name"), _SIZE_BUCKETS,
+)
+span_errors = Counter(
+    f"{_PREFIX}_span_errors_total", "Graph nodes and external calls that raised, by exception type.",
+    ("kind", "name", "error"),
+)
+llm_tokens = Counter(
+    f"{_PREFIX}_llm_tokens_total", "Tokens sent to and received from the LLM.", ("model", "direction"),
+)
+
+_METRICS = [span_duration, span_input_bytes, span_output_bytes, span_errors, llm_tokens]
+# name -> function returning {key: number}, rendered as gauges
+_stats_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+# --- Spans ---
+
+@dataclass
+class Span:
+    """One timed operation; spans started while it is current become its children."""
+    name: str
+    kind: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    children: List["Span"] = field(default_factory=list)
+
+    def add(self, **values: float):
+        """Adds to numeric attributes, e.g. the token counts of several LLM calls."""
+        for key, value in values.items():
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        span = {
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            **self.attributes,
+        }
+        if self.error:
+            span["error"] = self.error
+        if self.children:
+            span["children"] = [child.to_dict() for child in list(self.children)]
+        return span
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+# --- HELPERS ---
+
+def _size(value: Any, depth: int = 0) -> int:
+    """Approximate size in bytes of a value: the length of its text and bytes, walked a few levels deep."""
+    if value is None or depth > 4:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_size(k, depth + 1) + _size(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_size(item, depth + 1) for item in value)
+    if isinstance(value, (int, float, bool)):
+        return 8
+    # Uploads and extraction results
+    size_bytes = getattr(value, "size_bytes", None)
+    if isinstance(size_bytes, int):
+        return size_bytes
+    text = getattr(value, "text", None)
+    return len(text) if isinstance(text, str) else 0
+
+def _finish(span: Span, input_size: Optional[int], output_size: Optional[int]):
+    labels = (span.kind, span.name)
+    span_duration.observe(labels, span.duration)
+    if input_size is not None:
+        span.attributes["input_bytes"] = input_size
+        span_input_bytes.observe(labels, input_size)
+    if output_size is not None:
+        span.attributes["output_bytes"] = output_size
+        span_output_bytes.observe(labels, output_size)
+    if span.error:
+        span_errors.inc((span.kind, span.name, span.error))
+
+# --- FUNCTIONS ---
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+@contextmanager
+def span(name: str, kind: str, **attributes) -> Iterator[Span]:
+    """
+    Times the block as a child of the current span, records an exception
+    (which is re-raised) and observes the span's metrics. Set
+    `input_bytes`/`output_bytes` on the span to have sizes recorded too.
+    """
+    parent = _current.get()
+    current = Span(name=name, kind=kind, attributes=attributes)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # The consumer stopped iterating early
+        raise
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. an abandoned async generator
+            _current.set(parent)
+        input_size = current.attributes.pop("input_bytes", None)
+        output_size = current.attributes.pop("output_bytes", None)
+        _finish(current, input_size, output_size)
+
+def traced(kind: str, name: Optional[str] = None):
+    """
+    Decorates a function, coroutine function or async generator function so
+    each call is a span named `module.function` (or `name`), with the size
+    of its arguments and of its result (or everything it yielded).
+    """
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        def arguments_size(args, kwargs) -> int:
+            return _size(args) + _size(kwargs)
+
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def async_gen_wrapper(*args, **kwargs):
+                if not config.tracing_enabled:
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                    return
+                # The span is current, and timed, only while the generator runs: not while
+                # the consumer handles what it yielded
+                parent = _current.get()
+                current = Span(name=span_name, kind=kind)
+                if parent is not None:
+                    parent.children.append(current)
+                input_size = arguments_size(args, kwargs)
+                output_size = 0
+                current.duration = 0.0
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current.set(current)
+                        started = time.perf_counter()
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            current.duration += time.perf_counter() - started
+                            _current.reset(token)
+                        output_size += _size(item)
+                        yield item
+                except GeneratorExit:
+                    # The consumer stopped iterating early
+                    raise
+                except BaseException as e:
+                    current.error = type(e).__name__
+                    raise
+                finally:
+                    await generator.aclose()
+                    _finish(current, input_size, output_size)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not config.tracing_enabled:
+                    return await fn(*args, **kwargs)
+                with span(span_name, kind) as current:
+                    current.attributes["input_bytes"] = arguments_size(args, kwargs)
+                    result = await fn(*args, **kwargs)
+                    current.attributes["output_bytes"] = _size(result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config.tracing_enabled:
+                return fn(*args, **kwargs)
+            with span(span_name, kind) as current:
+                current.attributes["input_bytes"] = arguments_size(args, kwargs)
+                result = fn(*args, **kwargs)
+                current.attributes["output_bytes"] = _size(result)
+                return result
+        return wrapper
+    return decorator
+
+def record_tokens(model: str, input_tokens: int, output_tokens: int):
+    """Counts an LLM call's tokens, on the current span and in the token counter."""
+    llm_tokens.inc((model, "input"), input_tokens)
+    llm_tokens.inc((model, "output"), output_tokens)
+    current = _current.get()
+    if current is not None:
+        current.add(input_tokens=input_tokens, output_tokens=output_tokens)
+
+def register_stats(name: str, source: Callable[[], Dict[str, Any]]):
+    """Exports the numbers a `stats()` function returns as `legalmind_<name>_<key>` gauges."""
+    _stats_sources[name] = source
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for source_name, source in _stats_sources.items():
+        try:
+            stats = source()
+        except Exception:
+            continue
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric_name = f"{_PREFIX}_{source_name}_{key}"
+            lines.append(f"# TYPE {metric_name} gauge")
+            lines.append(f"{metric_name} {value}")
+    return "\n".join(lines) + "\n"
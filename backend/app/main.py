@@ -1,14 +1,61 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from app.api.v1 import routes
 from app.core.config import config
 from app.core.logging import setup_logging
-from app.core import firebase
+from app.core import firebase, tracing
+from app.agents.main_agent import purge_runs
+from app.services import (
+    analysis_cache,
+    classification_service,
+    embedding_cache,
+    extraction_service,
+    job_queue,
+    llm_cache,
+    llm_service,
+    pinecone_service,
+    session_store,
+    text_store,
+    token_cache,
+)
 
 setup_logging()
 # 1. Import CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+async def warm_up_clients():
+    """Creates the external service clients at the same time, each in a worker thread."""
+    providers = [
+        firebase.get_firestore_client,
+        firebase.get_firebase_storage,
+        llm_service.get_llm,
+        pinecone_service.get_embeddings_model,
+        pinecone_service.get_store,
+    ]
+    results = await asyncio.gather(*(asyncio.to_thread(p) for p in providers), return_exceptions=True)
+    for provider, result in zip(providers, results):
+        if isinstance(result, Exception):
+            # The client is created again on first use; startup goes on
+            logging.warning(f"Could not warm up {provider.__name__}: {result}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.warm_up_clients:
+        await warm_up_clients()
+    # Drop the checkpoints of failed analyses that were never retried
+    purge_runs()
+    # Start the analysis job workers and pick up jobs left over from the last run
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    # Let the chat summaries being written finish
+    await session_store.wait_for_compactions()
+    # Stop the PDF extraction workers, if any were started
+    extraction_service.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # 2. Add the CORS middleware to your app
 origins = [
@@ -34,6 +81,24 @@ app.add_middleware(
 # Register routes
 app.include_router(routes.router, prefix="/api/v1")
 
+# Gauges exported at /metrics alongside the span and token metrics
+tracing.register_stats("jobs", job_queue.stats)
+tracing.register_stats("analysis_cache", analysis_cache.stats)
+tracing.register_stats("embedding_cache", embedding_cache.stats)
+tracing.register_stats("token_cache", token_cache.stats)
+tracing.register_stats("llm_cache", llm_cache.stats)
+tracing.register_stats("classifier", classification_service.stats)
+tracing.register_stats("text_store", text_store.stats)
+tracing.register_stats("llm", lambda: {
+    "in_flight": llm_service.limiter.in_flight,
+    "peak_in_flight": llm_service.limiter.peak_in_flight,
+})
+
 @app.get("/")
 def root():
-    return {"message": "Contract AI Assistant is running 🚀"}
\ No newline at end of file
+    return {"message": "Contract AI Assistant is running 🚀"}
+
+@app.get("/metrics")
+def metrics():
+    """Latency, size, error and token metrics in the Prometheus text format."""
+    return Response(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
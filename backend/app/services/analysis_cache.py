@@ -0,0 +1,91 @@
+import copy
+import hashlib
+import threading
+from dataclasses import dataclass, fields
+from typing import BinaryIO, List, Optional, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import config
+from app.core.prompts import prompt_version
+from app.services.chunking_service import Chunk
+
+# --- Cached Entry Definition ---
+@dataclass
+class CachedAnalysis:
+    """Everything computed for one document's content. Fields fill in as the pipeline runs."""
+    classification: Optional[str] = None
+    analysis: Optional[dict] = None
+    clause_explanation: Optional[str] = None
+    # (chunk, embedding) pairs, re-upserted under each new doc_id
+    embeddings: Optional[List[Tuple[Chunk, List[float]]]] = None
+
+_cache = LRUCache(
+    max_entries=config.analysis_cache_max_entries,
+    ttl_seconds=config.analysis_cache_ttl_seconds,
+)
+
+# Hashed once rather than per lookup; `invalidate` hashes the prompts again
+_PROMPT_VERSION = prompt_version()
+# Steps running in parallel store different fields of the same entry
+_store_lock = threading.Lock()
+
+# --- FUNCTIONS ---
+
+def content_hash(file_bytes: bytes) -> str:
+    """SHA-256 of the uploaded file's bytes."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def content_hash_file(stream: BinaryIO) -> str:
+    """SHA-256 of a binary stream, read in chunks."""
+    return hashlib.file_digest(stream, "sha256").hexdigest()
+
+def _key(digest: str) -> tuple:
+    # Results depend on the content, the model and the prompts that produced them
+    return (digest, config.model_name, _PROMPT_VERSION)
+
+def lookup(digest: str) -> Optional[CachedAnalysis]:
+    """
+    Returns a copy of the cached entry for this content, or None. The copy
+    can be modified freely without touching what other uploads will see.
+    """
+    if not config.analysis_cache_enabled or not digest:
+        return None
+    entry = _cache.get(_key(digest))
+    return copy.deepcopy(entry) if entry is not None else None
+
+def store(digest: str, **values) -> None:
+    """Merges the given CachedAnalysis fields into the entry for this content."""
+    if not config.analysis_cache_enabled or not digest:
+        return
+    unknown = set(values) - {f.name for f in fields(CachedAnalysis)}
+    if unknown:
+        raise ValueError(f"Unknown cache fields: {sorted(unknown)}")
+    values = {name: copy.deepcopy(value) for name, value in values.items()}
+    key = _key(digest)
+    with _store_lock:
+        # Merging is not a lookup, so it must not count as a hit or a miss. The
+        # entry is replaced rather than changed, so a lookup copying it is unaffected
+        entry = copy.copy(_cache.peek(key) or CachedAnalysis())
+        for name, value in values.items():
+            setattr(entry, name, value)
+        _cache.set(key, entry)
+
+def invalidate(stale_only: bool = True) -> int:
+    """
+    Drops cached analyses and returns how many were removed. By default only
+    entries produced with a different model or an older version of
+    WORKFLOW_PROMPTS are dropped; pass stale_only=False to clear everything.
+    The prompts are hashed again, so later lookups use their current version.
+    """
+    global _PROMPT_VERSION
+    _PROMPT_VERSION = prompt_version()
+    current = (config.model_name, _PROMPT_VERSION)
+    removed = 0
+    for key in _cache.keys():
+        if not stale_only or key[1:] != current:
+            _cache.pop(key)
+            removed += 1
+    return removed
+
+def stats() -> dict:
+    return _cache.stats()
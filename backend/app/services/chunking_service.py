@@ -0,0 +1,256 @@
+import bisect
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.core.config import config
+
+# Word pieces and punctuation, a close stand-in for model tokens
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# "1.", "1.2", "12.3.4", "(a)", "(iv)", "a)", "Section 5", "ARTICLE IV", "Clause 3"
+_CLAUSE_RE = re.compile(
+    r"^\s*(?:"
+    r"\d+(?:\.\d+)*[.)]\s+\S"
+    r"|\d+\.\d+(?:\.\d+)*\s+\S"
+    r"|\(?[a-z]\)\s+\S"
+    r"|\([ivxlc]+\)\s+\S"
+    r"|(?:section|article|clause|schedule|exhibit|annex)\s+[\dIVXLC]+\b"
+    r")",
+    re.IGNORECASE,
+)
+
+# Sentence ends followed by whitespace and something that can start a sentence
+_SENTENCE_END_RE = re.compile(r"(?<=[.;!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+# A bare clause label such as "2." or "(iv)", which ends in a period but is not a sentence
+_CLAUSE_LABEL_RE = re.compile(r"\(?(?:\d+(?:\.\d+)*|[a-z]|[ivxlc]+)[.)]", re.IGNORECASE)
+
+# Longest heading line, in characters
+_MAX_HEADING_CHARS = 80
+
+
+# --- Chunk Definition ---
+@dataclass
+class Chunk:
+    """A span of the document text plus where it came from."""
+    text: str
+    index: int
+    char_start: int
+    char_end: int
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    section: Optional[str] = None
+
+    @property
+    def chunk_id(self) -> str:
+        """Stable id: the same text at the same offset always gets the same id."""
+        digest = hashlib.sha1(f"{self.char_start}:{self.text}".encode("utf-8")).hexdigest()
+        return digest[:16]
+
+    def metadata(self) -> dict:
+        """Vector store metadata. Unknown values are left out because Pinecone rejects nulls."""
+        data = {
+            "chunk_id": self.chunk_id,
+            "chunk_index": self.index,
+            "char_start": self.char_start,
+            "char_end": self.char_end,
+            "page_start": self.page_start,
+            "page_end": self.page_end,
+            "section": self.section,
+        }
+        return {k: v for k, v in data.items() if v is not None}
+
+
+@dataclass
+class _Unit:
+    """The smallest piece the packer moves around: a sentence or part of one."""
+    start: int
+    end: int
+    tokens: int
+    starts_block: bool
+    section: Optional[str]
+
+
+# --- HELPERS ---
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without loading a tokenizer."""
+    return len(_TOKEN_RE.findall(text))
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > _MAX_HEADING_CHARS:
+        return False
+    letters = [c for c in stripped if c.isalpha()]
+    if letters and all(c.isupper() for c in letters) and len(letters) > 2:
+        return True
+    # "Governing Law:" style headings
+    return stripped.endswith(":") and len(stripped.split()) <= 8
+
+def _blocks(text: str) -> List[tuple[int, int, Optional[str]]]:
+    """
+    Splits text into structural blocks (start, end, heading). A new block starts
+    at a blank line, a numbered clause, or a heading. A heading stays in the
+    same block as the text under it.
+    """
+    blocks = []
+    block_start = None
+    block_end = 0
+    section = None
+    previous_was_heading = False
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        line_start, pos = pos, pos + len(line)
+        content = line.strip()
+        if not content:
+            if block_start is not None and not previous_was_heading:
+                blocks.append((block_start, block_end, section))
+                block_start = None
+            continue
+
+        clause = bool(_CLAUSE_RE.match(line))
+        # A short numbered line such as "3. Term and Termination" is a heading too
+        heading = _is_heading(line) or (
+            clause and len(content) <= _MAX_HEADING_CHARS and not content.endswith(".")
+        )
+        if (heading or clause) and block_start is not None and not previous_was_heading:
+            blocks.append((block_start, block_end, section))
+            block_start = None
+        if heading:
+            section = content
+        if block_start is None:
+            block_start = line_start + (len(line) - len(line.lstrip()))
+        block_end = line_start + len(line.rstrip())
+        previous_was_heading = heading
+
+    if block_start is not None:
+        blocks.append((block_start, block_end, section))
+    return blocks
+
+def _word_windows(text: str, start: int, end: int, max_tokens: int) -> List[tuple[int, int]]:
+    """Splits an over-long sentence at word boundaries."""
+    spans = []
+    window_start = None
+    window_tokens = 0
+    for match in re.finditer(r"\S+", text[start:end]):
+        tokens = estimate_tokens(match.group(0))
+        if window_start is not None and window_tokens + tokens > max_tokens:
+            spans.append((window_start, window_end))
+            window_start, window_tokens = None, 0
+        if window_start is None:
+            window_start = start + match.start()
+        window_end = start + match.end()
+        window_tokens += tokens
+    if window_start is not None:
+        spans.append((window_start, window_end))
+    return spans
+
+def _units(text: str, max_tokens: int) -> List[_Unit]:
+    units = []
+    for block_start, block_end, section in _blocks(text):
+        first = True
+        sentence_start = block_start
+        boundaries = []
+        for match in _SENTENCE_END_RE.finditer(text, block_start, block_end):
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            if not _CLAUSE_LABEL_RE.fullmatch(text[line_start:match.start()].strip()):
+                boundaries.append(match.start())
+        for boundary in boundaries + [block_end]:
+            sentence = text[sentence_start:boundary]
+            stripped_end = sentence_start + len(sentence.rstrip())
+            tokens = estimate_tokens(sentence)
+            spans = (
+                _word_windows(text, sentence_start, stripped_end, max_tokens)
+                if tokens > max_tokens
+                else [(sentence_start, stripped_end)]
+            )
+            for span_start, span_end in spans:
+                if span_end <= span_start:
+                    continue
+                units.append(_Unit(
+                    start=span_start,
+                    end=span_end,
+                    tokens=estimate_tokens(text[span_start:span_end]),
+                    starts_block=first,
+                    section=section,
+                ))
+                first = False
+            # Skip the whitespace that ended the sentence
+            rest = text[boundary:block_end]
+            sentence_start = boundary + (len(rest) - len(rest.lstrip()))
+    return units
+
+# --- FUNCTIONS ---
+
+def detect_sections(text: str) -> List[tuple[int, str]]:
+    """The document's headings, as (character offset of the section, heading), in order."""
+    sections = []
+    for start, _, heading in _blocks(text):
+        if heading and (not sections or sections[-1][1] != heading):
+            sections.append((start, heading))
+    return sections
+
+def chunk_text(
+    text: str,
+    page_offsets: Optional[List[int]] = None,
+    target_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> List[Chunk]:
+    """
+    Splits document text into chunks that follow its structure.
+
+    Sentences are packed into chunks of up to `target_tokens`. A chunk is closed
+    early at a clause, heading or paragraph boundary once it is at least half
+    full, so clauses are not cut in the middle. When a chunk has to end inside
+    a block, the next one repeats up to `overlap_tokens` of its last sentences.
+
+    `page_offsets` holds the character offset where each page starts; when
+    given, every chunk records the pages it spans (1-based).
+    """
+    target_tokens = target_tokens or config.chunk_target_tokens
+    overlap_tokens = config.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    min_tokens = target_tokens // 2
+
+    units = _units(text, target_tokens)
+    groups: List[List[_Unit]] = []
+    current: List[_Unit] = []
+    current_tokens = 0
+    for unit in units:
+        full = current and current_tokens + unit.tokens > target_tokens
+        at_boundary = current and unit.starts_block and current_tokens >= min_tokens
+        if full or at_boundary:
+            groups.append(current)
+            carry: List[_Unit] = []
+            if not unit.starts_block and overlap_tokens > 0:
+                carry_tokens = 0
+                for previous in reversed(current):
+                    if (
+                        carry_tokens + previous.tokens > overlap_tokens
+                        or carry_tokens + previous.tokens + unit.tokens > target_tokens
+                    ):
+                        break
+                    carry.insert(0, previous)
+                    carry_tokens += previous.tokens
+            current, current_tokens = carry, sum(u.tokens for u in carry)
+        current.append(unit)
+        current_tokens += unit.tokens
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for index, group in enumerate(groups):
+        start, end = group[0].start, group[-1].end
+        chunk = Chunk(
+            text=text[start:end],
+            index=index,
+            char_start=start,
+            char_end=end,
+            section=group[0].section,
+        )
+        if page_offsets:
+            chunk.page_start = bisect.bisect_right(page_offsets, start)
+            chunk.page_end = bisect.bisect_right(page_offsets, max(start, end - 1))
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,173 @@
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from app.core.config import config
+from app.core.prompts import WORKFLOW_PROMPTS
+from app.core.tracing import traced
+
+UNSUPPORTED = "Unsupported Document Type"
+GENERAL = "General Legal Document"
+
+# --- Model ---
+# A small linear model over keyword and phrase features. Each feature counts
+# its matches in the opening of the document, damped with log(1 + count), and
+# adds its weight to its document type's score. A softmax over the scores
+# gives the confidence. The weights were tuned on
+# benchmarks/data/classification.jsonl; classification_holdout.jsonl is kept
+# out of tuning to measure accuracy (see benchmarks/bench_classifier.py).
+
+_FEATURES: Dict[str, List[Tuple[str, float]]] = {
+    "Non-Disclosure Agreements (NDAs)": [
+        (r"non-?disclosure agreement|\bnda\b|confidentiality agreement", 4.0),
+        (r"confidential information", 2.0),
+        (r"disclosing party|receiving party|\bdiscloser\b|\brecipient\b", 2.5),
+        (r"trade secrets?|proprietary information|need to know", 1.5),
+        (r"return or destroy", 1.5),
+    ],
+    "Employment Contracts": [
+        (r"employment (agreement|contract)|offer of employment|terms of employment", 4.0),
+        (r"\bemployer\b|\bthe employee\b|\bthe executive\b", 2.5),
+        (r"\bsalary\b|base compensation|hourly wage|\bbonus\b|severance", 2.0),
+        (r"probation(ary)? period|annual leave|paid time off|sick leave|working hours|hours of work", 2.0),
+        (r"job title|\bposition\b|report to", 1.0),
+    ],
+    "Rental & Lease Agreements": [
+        (r"\blease\b|rental agreement|tenancy", 3.0),
+        (r"\blandlord\b|\btenant\b|\blessor\b|\blessee\b", 2.5),
+        (r"\bpremises\b|security deposit|\brent\b", 1.5),
+        (r"sublet|month-to-month|lease term", 2.0),
+    ],
+    "Terms of Service": [
+        (r"terms of (service|use)|user agreement|subscription terms", 4.0),
+        (r"by (accessing|using) (the|our|this)", 3.0),
+        (r"your account|create an account|account settings|account credentials", 2.0),
+        (r"acceptable use|we may (suspend|terminate|change)|continued use", 2.0),
+        (r"\bthe service\b|\bthe app\b|\bwebsite\b|\bplatform\b|marketplace", 1.0),
+    ],
+    "Privacy Policies": [
+        (r"privacy (policy|notice)|data protection notice|cookie policy", 4.0),
+        (r"personal (data|information)", 2.5),
+        (r"\bcookies?\b|tracking technologies", 2.0),
+        (r"data (controller|processor|subject)|\bgdpr\b|\bccpa\b|opt out", 2.5),
+        (r"we (collect|process|retain|share)|right to (access|delete|erasure)", 1.5),
+    ],
+    "General Business Contracts": [
+        (r"partnership agreement|joint venture|shareholders'? agreement|distribution agreement|licen[cs]e agreement"
+         r"|memorandum of understanding|franchise agreement", 4.0),
+        (r"\bpartners?\b|\bshareholders?\b|\bdistributor\b|\bfranchisee\b|\blicensee\b", 2.0),
+        (r"profits and losses|capital contribution|contribute|right of first refusal|drag-along|\bterritory\b", 2.0),
+        (r"board of directors|\bdirectors\b|reserved matters|\bdeadlock\b", 1.5),
+    ],
+    "Sales Agreements": [
+        (r"sales agreement|purchase agreement|bill of sale|sale of goods|purchase order", 4.0),
+        (r"\bbuyer\b|\bseller\b", 2.5),
+        (r"purchase price|earnest money|\bescrow\b|\bclosing\b", 2.0),
+        (r"title (and risk of loss )?(shall )?pass|risk of loss|\bgoods\b|\bdelivery\b|\bship\b", 1.5),
+        (r"as is|merchantab|nonconforming", 1.0),
+    ],
+    "Service Contracts": [
+        (r"services? agreement|consulting agreement|master services|statement of work|service contract", 4.0),
+        (r"service provider|\bconsultant\b|\bcontractor\b|\bdeveloper\b", 2.5),
+        (r"scope of (services|work)|service levels?|deliverables?|milestones?", 2.0),
+        (r"\bthe client\b|\bcustomer\b|independent contractor|acceptance", 1.0),
+        (r"\bfees?\b|per hour|invoiced", 1.0),
+    ],
+    GENERAL: [
+        (r"power of attorney|attorney-in-fact|last will|testament|\bexecutor\b|affidavit|settlement agreement"
+         r"|\brelease[sd]?\b.{0,40}claims|\bdeed\b|\bwaiver\b|sworn|penalty of perjury", 3.5),
+        (r"notary|in witness whereof|hereby|being of sound mind|depose", 1.5),
+    ],
+}
+
+# Language that makes a text a legal document at all
+_LEGAL_MARKERS: List[Tuple[str, float]] = [
+    (r"\bshall\b|\bhereby\b|\bherein\b|\bhereto\b|\bwhereas\b", 1.0),
+    (r"\bagreement\b|\bcontract\b|\bterms\b|\bpolicy\b|\bnotice\b", 1.0),
+    (r"\bpart(y|ies)\b|governing law|jurisdiction|\bliabilit(y|ies)\b|\bterminat(e|ion)\b", 1.0),
+    (r"\bdeclare\b|\bsworn\b|\brevoke\b|\bexecutor\b|\bappoint\b|affidavit|testament", 1.0),
+    (r"\bagree(s|d)? to\b|\bentitled\b|\brights?\b|in accordance with|\bwarrant(s|y|ies)?\b", 0.5),
+]
+
+# A legal text with no type-specific features is a General Legal Document,
+# and any text without legal language is unsupported
+_BIASES = {GENERAL: 1.0, UNSUPPORTED: 3.0}
+_GENERAL_MARKER_WEIGHT = 0.3
+_UNSUPPORTED_MARKER_WEIGHT = -1.5
+_LEGAL_GATE = 1.0
+# Sharpens the softmax over the scores
+_SCALE = 1.5
+
+_COMPILED = {
+    label: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in features]
+    for label, features in _FEATURES.items()
+}
+_COMPILED_MARKERS = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in _LEGAL_MARKERS]
+
+_counters = {"local": 0, "llm_fallbacks": 0}
+_counters_lock = threading.Lock()
+
+
+@dataclass
+class Prediction:
+    """The most likely document type, its probability, and the score of every type."""
+    label: str
+    confidence: float
+    scores: Dict[str, float] = field(default_factory=dict)
+    words: int = 0
+
+
+# --- HELPERS ---
+
+def _feature_score(text: str, features: List[Tuple[re.Pattern, float]]) -> float:
+    return sum(weight * math.log1p(len(pattern.findall(text))) for pattern, weight in features)
+
+def _softmax(scores: Dict[str, float]) -> Dict[str, float]:
+    top = max(scores.values())
+    exps = {label: math.exp(_SCALE * (score - top)) for label, score in scores.items()}
+    total = sum(exps.values())
+    return {label: value / total for label, value in exps.items()}
+
+# --- FUNCTIONS ---
+
+@traced("classifier")
+def classify(text: str) -> Prediction:
+    """Scores the opening `local_classifier_chars` of a text against every document type."""
+    sample = text[:config.local_classifier_chars]
+    legal = _feature_score(sample, _COMPILED_MARKERS)
+    # Type features only count as far as the text reads like a legal document
+    gate = legal / (legal + _LEGAL_GATE)
+    scores = {
+        label: gate * _feature_score(sample, features) if label in WORKFLOW_PROMPTS else float("-inf")
+        for label, features in _COMPILED.items()
+    }
+    scores[GENERAL] += _BIASES[GENERAL] + _GENERAL_MARKER_WEIGHT * legal
+    scores[UNSUPPORTED] = _BIASES[UNSUPPORTED] + _UNSUPPORTED_MARKER_WEIGHT * legal
+    probabilities = _softmax(scores)
+    label = max(probabilities, key=probabilities.get)
+    return Prediction(label, probabilities[label], scores, words=len(sample.split()))
+
+def confident(prediction: Prediction) -> bool:
+    """
+    True when a prediction can be used instead of asking the LLM: it is at
+    least `local_classifier_min_confidence` likely and the text is long enough
+    to judge.
+    """
+    return (
+        config.local_classifier_enabled
+        and prediction.words >= config.local_classifier_min_words
+        and prediction.confidence >= config.local_classifier_min_confidence
+    )
+
+def record(used_local: bool):
+    """Counts a classification made locally or by the LLM, for /metrics."""
+    with _counters_lock:
+        _counters["local" if used_local else "llm_fallbacks"] += 1
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    total = counters["local"] + counters["llm_fallbacks"]
+    return {**counters, "local_rate": counters["local"] / total if total else 0.0}
@@ -0,0 +1,132 @@
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import config
+
+# In-memory tier
+_memory = LRUCache(
+    max_entries=config.query_embedding_cache_size,
+    ttl_seconds=config.query_embedding_cache_ttl_seconds,
+)
+
+# Optional disk tier, opened on first use
+_disk: Optional[sqlite3.Connection] = None
+_disk_lock = threading.Lock()
+_disk_writes = 0
+
+_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_counters_lock = threading.Lock()
+
+# --- HELPERS ---
+
+def normalize_query(text: str) -> str:
+    """Lowercases and collapses whitespace and trailing punctuation, so trivial variants share an entry."""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?.!").strip().lower()
+
+def _key(text: str) -> tuple[str, str]:
+    return (config.embedding_model_name, normalize_query(text))
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+def _connection() -> Optional[sqlite3.Connection]:
+    global _disk
+    if not config.query_embedding_cache_path:
+        return None
+    if _disk is None:
+        _disk = sqlite3.connect(config.query_embedding_cache_path, check_same_thread=False)
+        _disk.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL, query TEXT NOT NULL, embedding BLOB NOT NULL,"
+            " created_at REAL NOT NULL, PRIMARY KEY (model, query))"
+        )
+        _disk.commit()
+    return _disk
+
+def _disk_get(key: tuple[str, str]) -> Optional[List[float]]:
+    with _disk_lock:
+        conn = _connection()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT embedding, created_at FROM query_embeddings WHERE model = ? AND query = ?", key
+        ).fetchone()
+    if row is None or time.time() - row[1] > config.query_embedding_cache_ttl_seconds:
+        return None
+    return array("d", row[0]).tolist()
+
+def _disk_put(key: tuple[str, str], embedding: List[float]):
+    global _disk_writes
+    with _disk_lock:
+        conn = _connection()
+        if conn is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO query_embeddings (model, query, embedding, created_at) VALUES (?, ?, ?, ?)",
+            (*key, array("d", embedding).tobytes(), time.time()),
+        )
+        _disk_writes += 1
+        # Trim expired and excess rows every so often rather than on every write
+        if _disk_writes % 100 == 0:
+            conn.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?",
+                (time.time() - config.query_embedding_cache_ttl_seconds,),
+            )
+            conn.execute(
+                "DELETE FROM query_embeddings WHERE rowid NOT IN ("
+                " SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT ?)",
+                (config.query_embedding_cache_disk_max_entries,),
+            )
+        conn.commit()
+
+# --- FUNCTIONS ---
+
+def get(text: str) -> Optional[List[float]]:
+    """Returns the cached embedding for a query, checking memory then disk."""
+    key = _key(text)
+    embedding = _memory.get(key)
+    if embedding is not None:
+        _count("memory_hits")
+        return embedding
+    embedding = _disk_get(key)
+    if embedding is not None:
+        _count("disk_hits")
+        _memory.set(key, embedding)
+        return embedding
+    _count("misses")
+    return None
+
+def put(text: str, embedding: List[float]):
+    """Caches a query embedding in memory and, if configured, on disk."""
+    key = _key(text)
+    _memory.set(key, embedding)
+    _disk_put(key, embedding)
+
+def clear():
+    """Empties both tiers and resets the counters."""
+    _memory.clear()
+    with _disk_lock:
+        conn = _connection()
+        if conn is not None:
+            conn.execute("DELETE FROM query_embeddings")
+            conn.commit()
+    with _counters_lock:
+        for name in _counters:
+            _counters[name] = 0
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = sum(counters.values())
+    hits = counters["memory_hits"] + counters["disk_hits"]
+    return {
+        **counters,
+        "entries": len(_memory),
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Optional, Union
+
+import docx
+import fitz  # PyMuPDF
+
+from app.core.config import config
+
+# Control characters other than tab, newline, carriage return and form feed,
+# plus soft hyphens, zero-width spaces and byte order marks
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f-\x9f\u00ad\u200b-\u200d\ufeff]")
+
+# Above this many bytes per page a PDF is mostly images (e.g. a scan)
+_IMAGE_HEAVY_PAGE_BYTES = 256 * 1024
+
+# Worker processes for large PDFs, started on first use
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# --- Result Definition ---
+@dataclass
+class ExtractedText:
+    """Document text plus the character offset where each page starts."""
+    text: str
+    page_offsets: List[int]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+
+# --- HELPERS ---
+
+def normalize_text(text: str) -> str:
+    """
+    NFKC-normalizes text and drops invisible control characters. Ligatures,
+    non-breaking spaces and full-width forms become their plain equivalents,
+    while accented letters, currency signs and other non-ASCII text survive.
+    """
+    return _CONTROL_RE.sub("", unicodedata.normalize("NFKC", text))
+
+def _open_pdf(source: Union[bytes, str]) -> fitz.Document:
+    # A path is opened (and paged in) by MuPDF itself, without copying it into Python
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def _source_size(source: Union[bytes, str]) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+def _pages_text(doc: fitz.Document, start: int, stop: int, image_heavy: bool) -> List[str]:
+    pages = []
+    for i in range(start, stop):
+        pages.append(normalize_text(doc[i].get_text("text")))
+        if image_heavy:
+            # MuPDF caches each page's images (up to 256 MB); drop them so a
+            # scan is not held in memory page after page
+            fitz.TOOLS.store_shrink(100)
+    return pages
+
+def _extract_pdf_pages(source: Union[bytes, str], start: int, stop: int, image_heavy: bool) -> List[str]:
+    """Extracts and normalizes pages [start, stop). Runs in a worker process for large PDFs."""
+    with _open_pdf(source) as doc:
+        return _pages_text(doc, start, stop, image_heavy)
+
+def _worker_count() -> int:
+    return config.pdf_extraction_workers or os.cpu_count() or 1
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn" avoids forking a process that already runs gRPC and event loop threads
+            _pool = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def _page_ranges(page_count: int, parts: int) -> List[tuple[int, int]]:
+    """Splits pages into `parts` contiguous, nearly equal ranges."""
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def _join_pages(pages: List[str]) -> ExtractedText:
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page)
+    return ExtractedText(text="".join(pages), page_offsets=offsets)
+
+# --- FUNCTIONS ---
+
+def extract_pdf(source: Union[bytes, str], parallel: Optional[bool] = None) -> ExtractedText:
+    """
+    Extracts the text of a PDF, given as bytes or a local path, page by page.
+    PDFs with at least `pdf_parallel_min_pages` pages are split into page
+    ranges that are extracted in a process pool; `parallel` forces either
+    path. Workers receive the path when there is one, not the bytes.
+    """
+    with _open_pdf(source) as doc:
+        page_count = doc.page_count
+        image_heavy = page_count > 0 and _source_size(source) / page_count > _IMAGE_HEAVY_PAGE_BYTES
+        if parallel is None:
+            parallel = page_count >= config.pdf_parallel_min_pages
+        if not parallel or page_count < 2:
+            return _join_pages(_pages_text(doc, 0, page_count, image_heavy))
+
+    pool = _get_pool()
+    ranges = _page_ranges(page_count, min(page_count, _worker_count()))
+    futures = [pool.submit(_extract_pdf_pages, source, start, stop, image_heavy) for start, stop in ranges]
+    pages = [page for future in futures for page in future.result()]
+    return _join_pages(pages)
+
+def extract_document(source: Union[bytes, str], filename: str) -> ExtractedText:
+    """
+    Extracts normalized text from a PDF, DOCX or TXT file, given as bytes or
+    a local path. DOCX and TXT files have no pages, so they are reported as a
+    single page.
+    """
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        return extract_pdf(source)
+    if name.endswith(".docx"):
+        doc = docx.Document(source if isinstance(source, str) else BytesIO(source))
+        text = "".join(para.text + "\n" for para in doc.paragraphs)
+        return ExtractedText(text=normalize_text(text), page_offsets=[0])
+    if name.endswith(".txt"):
+        if isinstance(source, str):
+            with open(source, encoding="utf-8") as f:
+                return ExtractedText(text=normalize_text(f.read()), page_offsets=[0])
+        return ExtractedText(text=normalize_text(source.decode("utf-8")), page_offsets=[0])
+    return ExtractedText(text="", page_offsets=[])
+
+def shutdown():
+    """Stops the worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -1,11 +1,346 @@
 import fitz  # PyMuPDF for PDF
 from docx import Document  # python-docx
-from docx.shared import RGBColor
+from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+import copy
+import html
 import os
 import re
-import subprocess
+import unicodedata
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-def highlight_text(input_path: str, output_path: str, highlights: list[str]) -> str:
+from app.core.tracing import traced
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a set of phrases: `find_all` reports every
+    occurrence of every phrase in a single pass over the text, however many
+    phrases there are.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]  # lengths of the phrases ending in each state
+        for phrase in set(phrases):
+            if phrase:
+                self._add(phrase)
+        self._link()
+
+    def _add(self, phrase: str):
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(len(phrase))
+
+    def _link(self):
+        # Breadth-first, so every fail target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """Returns (start, end) of every match, overlapping ones included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length in out[state]:
+                matches.append((i + 1 - length, i + 1))
+        return matches
+
+
+# Values the analysis uses for highlights it could not find
+_PLACEHOLDERS = {"not found", "not specified"}
+
+# Runs made of nothing but these can be split and rewritten without losing content
+_SPLITTABLE_RUN_TAGS = {qn("w:rPr"), qn("w:t"), qn("w:tab")}
+
+# Page layout and styles for rendering highlighted DOCX files
+_DOCX_PAGE = fitz.paper_rect("a4")
+_DOCX_MARGIN = 54
+_DOCX_CSS = """
+body { font-family: sans-serif; font-size: 11pt; }
+p { margin: 0 0 6pt 0; }
+table { border-collapse: collapse; margin: 0 0 6pt 0; }
+td { border: 1px solid #999; padding: 2pt 4pt; vertical-align: top; }
+"""
+
+# --- HELPERS ---
+
+def _normalize_phrase(text: str) -> str:
+    """Case- and whitespace-insensitive form used on both sides of the match."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+def _highlight_phrases(highlights: list[str]) -> list[str]:
+    """Splits each highlight into sentences, so a partly reworded highlight still matches."""
+    phrases = []
+    for text_block in highlights:
+        if _normalize_phrase(text_block).rstrip(".") in _PLACEHOLDERS:
+            continue
+        clean_text_block = re.sub(r'\s+', ' ', text_block).strip()
+        for sentence in re.split(r'(?<=[.?!])\s+', clean_text_block):
+            phrase = _normalize_phrase(sentence)
+            if len(phrase) > 2:  # Avoid searching for tiny fragments
+                phrases.append(phrase)
+    return phrases
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def _page_text_map(page: fitz.Page) -> Tuple[str, List[Optional[tuple]]]:
+    """
+    Extracts a page's text once, normalized like the phrases, together with
+    where every character sits: (x0, y0, x1, y1, line number), or None for
+    the spaces that stand in for whitespace and line breaks.
+    """
+    chars: List[str] = []
+    boxes: List[Optional[tuple]] = []
+    line_no = 0
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", ()):
+            line_no += 1
+            for span in line["spans"]:
+                for char in span["chars"]:
+                    c = char["c"]
+                    if c.isspace():
+                        if chars and chars[-1] != " ":
+                            chars.append(" ")
+                            boxes.append(None)
+                        continue
+                    box = (*char["bbox"], line_no)
+                    if c.isascii():
+                        chars.append(c.lower())
+                        boxes.append(box)
+                        continue
+                    for folded in unicodedata.normalize("NFKC", c).casefold():
+                        chars.append(folded)
+                        boxes.append(box)
+            if chars and chars[-1] != " ":
+                chars.append(" ")
+                boxes.append(None)
+    return "".join(chars), boxes
+
+def _span_rects(boxes: List[Optional[tuple]], start: int, end: int) -> List[fitz.Rect]:
+    """One rectangle per text line covered by the span."""
+    lines: dict = {}
+    for box in boxes[start:end]:
+        if box is None:
+            continue
+        x0, y0, x1, y1, line_no = box
+        bounds = lines.get(line_no)
+        if bounds is None:
+            lines[line_no] = [x0, y0, x1, y1]
+        else:
+            bounds[0], bounds[1] = min(bounds[0], x0), min(bounds[1], y0)
+            bounds[2], bounds[3] = max(bounds[2], x1), max(bounds[3], y1)
+    return [fitz.Rect(bounds) for bounds in lines.values()]
+
+def _highlight_pdf(
+    input_path: str, output_path: str, highlights: list[str], page_texts: Optional[List[str]] = None
+) -> str:
+    """
+    Builds one matcher for all highlight phrases, then makes a single pass
+    over each page's text and annotates every matched span. With the pages'
+    extracted text, pages that contain no phrase are skipped without
+    building their character map.
+    """
+    matcher = PhraseMatcher(_highlight_phrases(highlights))
+    doc = fitz.open(input_path)
+    candidates = None
+    if page_texts is not None and len(page_texts) == doc.page_count:
+        candidates = {i for i, text in enumerate(page_texts) if matcher.find_all(_normalize_phrase(text))}
+    for page in doc:
+        if candidates is not None and page.number not in candidates:
+            continue
+        text, boxes = _page_text_map(page)
+        for start, end in _merge_spans(matcher.find_all(text)):
+            rects = _span_rects(boxes, start, end)
+            if rects:
+                # add_highlight_annot already builds the appearance stream
+                page.add_highlight_annot(rects)
+    doc.save(output_path, garbage=4, deflate=True, clean=True)
+    return output_path
+
+def _iter_paragraphs(container) -> Iterator[Paragraph]:
+    """Every paragraph of a document or table cell, including those inside tables."""
+    for item in container.iter_inner_content():
+        if isinstance(item, Paragraph):
+            yield item
+        else:
+            for row in item.rows:
+                for cell in row.cells:
+                    yield from _iter_paragraphs(cell)
+
+def _paragraph_runs(para: Paragraph) -> List[Run]:
+    runs: List[Run] = []
+    for item in para.iter_inner_content():
+        runs.extend(item.runs if isinstance(item, Hyperlink) else [item])
+    return runs
+
+def _paragraph_text_map(runs: List[Run]) -> Tuple[str, List[Optional[Tuple[int, int]]]]:
+    """
+    A paragraph's text normalized like the phrases, with the (run index,
+    offset in the run's text) each character came from, or None for the
+    spaces that stand in for whitespace.
+    """
+    chars: List[str] = []
+    positions: List[Optional[Tuple[int, int]]] = []
+    for run_index, run in enumerate(runs):
+        for offset, c in enumerate(run.text):
+            if c.isspace():
+                if chars and chars[-1] != " ":
+                    chars.append(" ")
+                    positions.append(None)
+                continue
+            folded = c.lower() if c.isascii() else unicodedata.normalize("NFKC", c).casefold()
+            for f in folded:
+                chars.append(f)
+                positions.append((run_index, offset))
+    return "".join(chars), positions
+
+def _highlight_run(run: Run, mask: List[bool]):
+    """
+    Highlights the characters of a run flagged in `mask`, splitting the run
+    into consecutive highlighted and plain pieces with the same formatting.
+    Runs holding more than text (fields, drawings, breaks) are highlighted whole.
+    """
+    text = run.text
+    pieces: List[Tuple[bool, int, int]] = []
+    for offset, flag in enumerate(mask):
+        if pieces and pieces[-1][0] == flag:
+            pieces[-1] = (flag, pieces[-1][1], offset + 1)
+        else:
+            pieces.append((flag, offset, offset + 1))
+    if len(pieces) == 1 or any(child.tag not in _SPLITTABLE_RUN_TAGS for child in run._r):
+        run.font.highlight_color = WD_COLOR_INDEX.YELLOW
+        return
+    for flag, start, end in pieces:
+        r = copy.deepcopy(run._r)
+        run._r.addprevious(r)
+        piece = Run(r, run._parent)
+        piece.text = text[start:end]
+        if flag:
+            piece.font.highlight_color = WD_COLOR_INDEX.YELLOW
+    run._r.getparent().remove(run._r)
+
+def _highlight_paragraph(para: Paragraph, matcher: PhraseMatcher):
+    runs = _paragraph_runs(para)
+    text, positions = _paragraph_text_map(runs)
+    spans = _merge_spans(matcher.find_all(text))
+    if not spans:
+        return
+    masks = [[False] * len(run.text) for run in runs]
+    for start, end in spans:
+        # Phrases never start or end with a space, so both ends map to a run
+        (first_run, first_offset), (last_run, last_offset) = positions[start], positions[end - 1]
+        for run_index in range(first_run, last_run + 1):
+            lo = first_offset if run_index == first_run else 0
+            hi = last_offset + 1 if run_index == last_run else len(masks[run_index])
+            masks[run_index][lo:hi] = [True] * (hi - lo)
+    for run, mask in zip(runs, masks):
+        if any(mask):
+            _highlight_run(run, mask)
+
+def _run_html(run: Run) -> str:
+    content = html.escape(run.text).replace("\t", "&#160;&#160;&#160;&#160;").replace("\n", "<br/>")
+    if not content:
+        return ""
+    if run.bold:
+        content = f"<b>{content}</b>"
+    if run.italic:
+        content = f"<i>{content}</i>"
+    if run.underline:
+        content = f"<u>{content}</u>"
+    if run.font.highlight_color is not None:
+        content = f'<span style="background-color: yellow">{content}</span>'
+    return content
+
+def _paragraph_html(para: Paragraph) -> str:
+    style = para.style.name if para.style is not None else ""
+    tag = "p"
+    if style == "Title":
+        tag = "h1"
+    elif style.startswith("Heading ") and style[8:].isdigit():
+        tag = f"h{min(int(style[8:]), 6)}"
+    content = "".join(_run_html(run) for run in _paragraph_runs(para))
+    return f"<{tag}>{content or '&#160;'}</{tag}>"
+
+def _blocks_html(container) -> str:
+    parts = []
+    for item in container.iter_inner_content():
+        if isinstance(item, Table):
+            rows = (
+                "<tr>" + "".join(f"<td>{_blocks_html(cell)}</td>" for cell in row.cells) + "</tr>"
+                for row in item.rows
+            )
+            parts.append("<table>" + "".join(rows) + "</table>")
+        else:
+            parts.append(_paragraph_html(item))
+    return "".join(parts)
+
+def _render_html_pdf(body: str, pdf_path: str):
+    """Lays out HTML onto as many A4 pages as it needs, in-process with MuPDF."""
+    story = fitz.Story(html=f"<body>{body}</body>", user_css=_DOCX_CSS)
+    writer = fitz.DocumentWriter(pdf_path)
+    where = _DOCX_PAGE + (_DOCX_MARGIN, _DOCX_MARGIN, -_DOCX_MARGIN, -_DOCX_MARGIN)
+    more = True
+    while more:
+        device = writer.begin_page(_DOCX_PAGE)
+        more, _ = story.place(where)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+def _highlight_docx(input_path: str, output_path: str, highlights: list[str]) -> str:
+    """
+    Highlights only the matched text of each paragraph (tables included),
+    splitting runs at the match boundaries, and renders the result to PDF
+    without leaving the process.
+    """
+    matcher = PhraseMatcher(_highlight_phrases(highlights))
+    doc = Document(input_path)
+    for para in _iter_paragraphs(doc):
+        _highlight_paragraph(para, matcher)
+    pdf_output_path = output_path.replace(".docx", ".pdf")
+    _render_html_pdf(_blocks_html(doc), pdf_output_path)
+    return pdf_output_path
+
+# --- FUNCTIONS ---
+
+@traced("highlight")
+def highlight_text(
+    input_path: str, output_path: str, highlights: list[str], page_texts: Optional[List[str]] = None
+) -> str:
     """
     Highlight given texts in PDF, DOCX, or TXT files.
 
@@ -13,6 +348,8 @@ def highlight_text(input_path: str, output_path: str, highlights: list[str]) ->
         input_path: Path to the uploaded file.
         output_path: Path to save highlighted file (for PDF/DOCX).
         highlights: List of phrases to highlight.
+        page_texts: The extracted text of each page, if known. PDF pages
+            whose text contains no phrase are skipped.
 
     Returns:
         str: Path to highlighted file (PDF/DOCX) OR HTML string (for TXT).
@@ -21,57 +358,11 @@ def highlight_text(input_path: str, output_path: str, highlights: list[str]) ->
     
     # ---- PDF ----
     if ext == ".pdf":
-        doc = fitz.open(input_path)
-        for page in doc:
-            for text_block in highlights:
-                # Normalize the text block to handle newlines and extra spaces
-                clean_text_block = re.sub(r'\s+', ' ', text_block).strip()
-                # Split into sentences for more robust searching
-                sentences = re.split(r'(?<=[.?!])\s+', clean_text_block)
-                
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if len(sentence) > 2:  # Avoid searching for tiny fragments
-                        areas = page.search_for(sentence, flags=1)  # Case-insensitive search
-                        for area in areas:
-                            highlight = page.add_highlight_annot(area)
-                            highlight.update()
-                            
-        doc.save(output_path, garbage=4, deflate=True, clean=True)
-        return output_path
+        return _highlight_pdf(input_path, output_path, highlights, page_texts)
 
     # ---- DOCX ----
     elif ext == ".docx":
-        doc = Document(input_path)
-        for para in doc.paragraphs:
-            for text_block in highlights:
-                clean_text_block = re.sub(r'\s+', ' ', text_block).strip()
-                sentences = re.split(r'(?<=[.?!])\s+', clean_text_block)
-                
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    # Check if the cleaned sentence exists in the paragraph (case-insensitive)
-                    if len(sentence) > 2 and sentence.lower() in para.text.lower():
-                        # This is a simplified approach: highlight the entire paragraph
-                        # if a sentence matches. A perfect solution requires complex
-                        # run-level manipulation.
-                        for run in para.runs:
-                            run.font.highlight_color = 7  # WD_COLOR_INDEX.YELLOW
-        doc.save(output_path)
-        
-        # Convert DOCX to PDF using pandoc
-        pdf_output_path = output_path.replace(".docx", ".pdf")
-        try:
-            subprocess.run(
-                ["pandoc", output_path, "-o", pdf_output_path],
-                check=True,
-                timeout=60  # Add a timeout for safety
-            )
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-            # Handle cases where pandoc is not installed or fails
-            raise RuntimeError(f"Failed to convert DOCX to PDF using pandoc: {e}")
-            
-        return pdf_output_path
+        return _highlight_docx(input_path, output_path, highlights)
 
     # ---- TXT ----
     elif ext == ".txt":
@@ -0,0 +1,426 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.agents.main_agent import stream_progress
+from app.core.config import config
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+_TERMINAL = {COMPLETED, FAILED}
+
+# Identifies this process in the `owner` column of the jobs it runs
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Marks the end of a job's event stream
+_END = object()
+
+
+class QueueFullError(Exception):
+    """Raised when `job_queue_max_size` jobs are already waiting."""
+
+
+# --- Job Definitions ---
+@dataclass
+class Job:
+    """An analysis job and everything needed to run (or re-run) it."""
+    id: str
+    user_id: str
+    filename: str
+    content_type: Optional[str]
+    size_bytes: int
+    upload_path: str
+    qa_question: str
+    highlight_criteria: str
+    status: str = QUEUED
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    owner: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        """The job as returned by the API, without its inputs."""
+        view = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.status == COMPLETED:
+            view["result"] = self.result
+        if self.status == FAILED:
+            view["error"] = self.error
+        return view
+
+
+@dataclass
+class StoredUpload:
+    """
+    An upload kept on disk until its analysis is done: a job's, or one kept
+    so a failed analysis can be retried. It offers what the agents use of an
+    upload (`file`, `source`, `filename`), like ReReadableUploadFile does for
+    uploads analyzed within the request, and can be saved in checkpoints.
+    """
+    path: str
+    filename: str
+    content_type: Optional[str]
+    size_bytes: int
+
+    @property
+    def file(self):
+        return open(self.path, "rb")
+
+    @property
+    def source(self):
+        return self.path
+
+    def close(self):
+        pass
+
+
+class JobStore:
+    """
+    Jobs in a SQLite file, so queued jobs survive a restart and every worker
+    process on the host can report on any job. A process claims a job before
+    running it, so each job runs once.
+    """
+
+    _JSON_FIELDS = ("progress", "result")
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets other workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, user_id TEXT NOT NULL, filename TEXT NOT NULL, content_type TEXT,"
+            " size_bytes INTEGER NOT NULL, upload_path TEXT NOT NULL, qa_question TEXT NOT NULL,"
+            " highlight_criteria TEXT NOT NULL, status TEXT NOT NULL, progress TEXT, result TEXT,"
+            " error TEXT, owner TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        values = dict(row)
+        for name in self._JSON_FIELDS:
+            if values[name] is not None:
+                values[name] = json.loads(values[name])
+        return Job(**values)
+
+    def create(self, job: Job) -> None:
+        values = asdict(job)
+        for name in self._JSON_FIELDS:
+            values[name] = json.dumps(values[name]) if values[name] is not None else None
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        with self._lock:
+            self._conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", tuple(values.values()))
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def update(self, job_id: str, **values) -> None:
+        for name in self._JSON_FIELDS:
+            if name in values and values[name] is not None:
+                values[name] = json.dumps(values[name])
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+            self._conn.commit()
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Marks a queued job as running for `owner`. False if it is not queued (anymore)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, owner, time.time(), job_id, QUEUED),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def unfinished(self) -> List[Job]:
+        """Queued and running jobs, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def purge(self, older_than: float) -> List[str]:
+        """Deletes finished jobs last updated before `older_than` and returns their upload paths."""
+        condition = "status IN (?, ?) AND updated_at < ?"
+        params = (COMPLETED, FAILED, older_than)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT upload_path FROM jobs WHERE {condition}", params).fetchall()
+            self._conn.execute(f"DELETE FROM jobs WHERE {condition}", params)
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+
+# Opened on first use, with the worker tasks
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# Jobs queued or running in this process, and the live event queues of their subscribers
+_local_jobs: set = set()
+_subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+# --- HELPERS ---
+
+def _get_store() -> JobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            os.makedirs(config.job_upload_dir, exist_ok=True)
+            _store = JobStore(config.job_store_path)
+        return _store
+
+def _process_alive(owner: Optional[str]) -> bool:
+    """Whether the process that claimed a job is still running. Owners on other hosts are assumed alive."""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _publish(job_id: str, item):
+    for queue in _subscribers.get(job_id, ()):
+        queue.put_nowait(item)
+
+def _final_message(job: Job) -> dict:
+    if job.status == COMPLETED:
+        return {"percentage": 100, "message": "Analysis complete!", "data": job.result}
+    return {"percentage": -1, "message": f"An error occurred: {job.error}", "error": True}
+
+def _remove_upload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def _run_job(job_id: str):
+    # The store is SQLite: its calls run in a worker thread, off the event loop
+    store = await asyncio.to_thread(_get_store)
+    if not await asyncio.to_thread(store.claim, job_id, _OWNER):
+        # Another process got to it first
+        _local_jobs.discard(job_id)
+        _publish(job_id, _END)
+        return
+    job = await asyncio.to_thread(store.get, job_id)
+    print(f"--- JOB {job_id}: running analysis of {job.filename} ---")
+    upload = StoredUpload(job.upload_path, job.filename, job.content_type, job.size_bytes)
+    input_dict = {
+        "user_id": job.user_id,
+        "file": upload,
+        "file_size_bytes": job.size_bytes,
+        "qa_question": job.qa_question,
+        "highlight_criteria": job.highlight_criteria,
+    }
+    try:
+        result = None
+        # The job's ID is its doc_id: a job that was retried, or stopped by a
+        # restart, resumes from its last checkpoint
+        async for event, data in stream_progress(input_dict, doc_id=job_id):
+            if event is None and "data" in data:
+                result = data["data"]
+            elif event is None:
+                await asyncio.to_thread(store.update, job_id, progress=data)
+            _publish(job_id, (event, data))
+        await asyncio.to_thread(
+            store.update,
+            job_id, status=COMPLETED, result=result, progress={"percentage": 100, "message": "Analysis complete!"},
+        )
+        _remove_upload(job.upload_path)
+    except asyncio.CancelledError:
+        # Shutting down: run it again on the next start
+        await asyncio.to_thread(store.update, job_id, status=QUEUED, owner=None)
+        raise
+    except Exception as e:
+        logging.error(f"Analysis job {job_id} failed: {e}", exc_info=True)
+        await asyncio.to_thread(store.update, job_id, status=FAILED, error=str(e))
+        _publish(job_id, (None, _final_message(await asyncio.to_thread(store.get, job_id))))
+        # The upload is kept until the job is purged, so it can be retried
+    finally:
+        _local_jobs.discard(job_id)
+        _publish(job_id, _END)
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Job worker error on {job_id}: {e}", exc_info=True)
+        finally:
+            _queue.task_done()
+
+def _enqueue(job_id: str):
+    _local_jobs.add(job_id)
+    _queue.put_nowait(job_id)
+
+# --- FUNCTIONS ---
+
+async def start():
+    """
+    Starts `job_workers` worker tasks on the running event loop and requeues
+    unfinished jobs: queued ones, and running ones whose process is gone.
+    Finished jobs older than `job_retention_seconds` are deleted.
+    """
+    global _queue
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue()
+    store = await asyncio.to_thread(_get_store)
+    for upload_path in await asyncio.to_thread(store.purge, time.time() - config.job_retention_seconds):
+        _remove_upload(upload_path)
+    for job in await asyncio.to_thread(store.unfinished):
+        if job.status == RUNNING:
+            if _process_alive(job.owner):
+                continue
+            await asyncio.to_thread(store.update, job.id, status=QUEUED, owner=None)
+        _enqueue(job.id)
+    for _ in range(config.job_workers):
+        _workers.append(asyncio.create_task(_worker()))
+    print(f"--- Job queue started: {config.job_workers} workers, {_queue.qsize()} jobs recovered. ---")
+
+async def stop():
+    """Cancels the workers. Jobs they were running go back to the queue for the next start."""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _local_jobs.clear()
+    _queue = None
+
+async def submit(user_id: str, upload, qa_question: str, highlight_criteria: str) -> Job:
+    """
+    Queues an analysis and returns its job right away. `upload` is a read
+    ReReadableUploadFile; its content is moved to `job_upload_dir` so the job
+    can run after the request, or after a restart. Raises QueueFullError when
+    `job_queue_max_size` jobs are already waiting.
+    """
+    await start()
+    if _queue.qsize() >= config.job_queue_max_size:
+        raise QueueFullError(f"{_queue.qsize()} analyses are already queued. Try again later.")
+    job_id = str(uuid.uuid4())
+    suffix = os.path.splitext(upload.filename or "")[1]
+    now = time.time()
+    job = Job(
+        id=job_id,
+        user_id=user_id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size_bytes=upload.size_bytes,
+        upload_path=os.path.join(config.job_upload_dir, f"{job_id}{suffix}"),
+        qa_question=qa_question,
+        highlight_criteria=highlight_criteria,
+        progress={"percentage": 0, "message": "Queued..."},
+        created_at=now,
+        updated_at=now,
+    )
+    store = await asyncio.to_thread(_get_store)
+    await asyncio.to_thread(upload.save_to, job.upload_path)
+    await asyncio.to_thread(store.create, job)
+    _enqueue(job_id)
+    return job
+
+async def retry(job_id: str) -> Job:
+    """
+    Queues a failed job again. Raises ValueError when the job is not failed,
+    and QueueFullError when `job_queue_max_size` jobs are already waiting.
+    """
+    await start()
+    store = await asyncio.to_thread(_get_store)
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None or job.status != FAILED:
+        raise ValueError("Only failed jobs can be retried.")
+    if _queue.qsize() >= config.job_queue_max_size:
+        raise QueueFullError(f"{_queue.qsize()} analyses are already queued. Try again later.")
+    await asyncio.to_thread(
+        store.update,
+        job_id, status=QUEUED, owner=None, error=None, progress={"percentage": 0, "message": "Queued for retry..."},
+    )
+    _enqueue(job_id)
+    return await asyncio.to_thread(store.get, job_id)
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _get_store().get(job_id)
+
+async def aget_job(job_id: str) -> Optional[Job]:
+    """Like `get_job`, but reads the store in a worker thread."""
+    return await asyncio.to_thread(get_job, job_id)
+
+async def subscribe(job_id: str) -> AsyncIterator[Tuple[Optional[str], dict]]:
+    """
+    Yields a job's (event, data) pairs, the same ones /analyze-stream sends:
+    the current progress first, then progress messages and partial results
+    as they happen, and finally the result (or an error message). Jobs run
+    by another worker process are followed by polling the store.
+    """
+    job = await aget_job(job_id)
+    if job is None:
+        return
+    if job_id in _local_jobs:
+        queue: asyncio.Queue = asyncio.Queue()
+        _subscribers.setdefault(job_id, []).append(queue)
+        try:
+            if job.progress:
+                yield None, job.progress
+            while (item := await queue.get()) is not _END:
+                yield item
+        finally:
+            _subscribers[job_id].remove(queue)
+            if not _subscribers[job_id]:
+                del _subscribers[job_id]
+        return
+
+    last_progress = None
+    while job is not None and job.status not in _TERMINAL:
+        if job.progress != last_progress:
+            last_progress = job.progress
+            yield None, job.progress
+        await asyncio.sleep(config.job_poll_interval_seconds)
+        job = await aget_job(job_id)
+    if job is not None:
+        yield None, _final_message(job)
+
+def stats() -> dict:
+    return {
+        "workers": len(_workers),
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "local_jobs": len(_local_jobs),
+        "subscribers": sum(len(queues) for queues in _subscribers.values()),
+    }
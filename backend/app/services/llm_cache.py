@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.cache import LRUCache
+from app.core.config import config
+from app.services.chunking_service import estimate_tokens
+
+# In-memory tier
+_memory = LRUCache(max_entries=config.llm_cache_size)
+
+# Disk tier, opened on first use (and again if `llm_cache_path` changes)
+_disk: Optional[sqlite3.Connection] = None
+_disk_path: Optional[str] = None
+_disk_lock = threading.Lock()
+# Bytes of replies on disk; eviction only runs once it passes the budget
+_disk_bytes = 0
+# Hits not yet written to disk as (key -> last used at); written with the next store
+_touched: dict[tuple[str, str, str], float] = {}
+_touched_lock = threading.Lock()
+
+_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "disk_evictions": 0, "saved_tokens": 0}
+_counters_lock = threading.Lock()
+
+# --- HELPERS ---
+
+def _key(model: str, prompt: str, params: dict) -> tuple[str, str, str]:
+    """The model, a hash of the rendered prompt and a hash of the generation parameters."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    params_hash = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return (model, prompt_hash, params_hash)
+
+def _count(name: str, amount: int = 1):
+    with _counters_lock:
+        _counters[name] += amount
+
+def _touch(key: tuple[str, str, str]):
+    with _touched_lock:
+        _touched[key] = time.time()
+
+def _connection() -> Optional[sqlite3.Connection]:
+    global _disk, _disk_path, _disk_bytes
+    if not config.llm_cache_path:
+        return None
+    if _disk is None or _disk_path != config.llm_cache_path:
+        if _disk is not None:
+            _disk.close()
+        directory = os.path.dirname(config.llm_cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _disk = sqlite3.connect(config.llm_cache_path, check_same_thread=False)
+        _disk.execute("PRAGMA journal_mode=WAL")
+        _disk.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " model TEXT NOT NULL, prompt_hash TEXT NOT NULL, params_hash TEXT NOT NULL,"
+            " response TEXT NOT NULL, size INTEGER NOT NULL, last_used_at REAL NOT NULL,"
+            " PRIMARY KEY (model, prompt_hash, params_hash))"
+        )
+        _disk.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used_at)")
+        _disk.commit()
+        _disk_path = config.llm_cache_path
+        _disk_bytes = _disk.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+    return _disk
+
+def _disk_get(key: tuple[str, str, str]) -> Optional[str]:
+    with _disk_lock:
+        conn = _connection()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT response FROM llm_responses WHERE model = ? AND prompt_hash = ? AND params_hash = ?", key
+        ).fetchone()
+    if row is None:
+        return None
+    # Eviction drops the least recently used replies first
+    _touch(key)
+    return row[0]
+
+def _disk_put(key: tuple[str, str, str], response: str):
+    global _disk_bytes
+    with _touched_lock:
+        touched = [(used_at, *touched_key) for touched_key, used_at in _touched.items()]
+        _touched.clear()
+    with _disk_lock:
+        conn = _connection()
+        if conn is None:
+            return
+        conn.executemany(
+            "UPDATE llm_responses SET last_used_at = ? WHERE model = ? AND prompt_hash = ? AND params_hash = ?",
+            touched,
+        )
+        size = len(response.encode("utf-8"))
+        # A replaced reply no longer counts towards the size
+        replaced = conn.execute(
+            "SELECT size FROM llm_responses WHERE model = ? AND prompt_hash = ? AND params_hash = ?", key
+        ).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses"
+            " (model, prompt_hash, params_hash, response, size, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, response, size, time.time()),
+        )
+        _disk_bytes += size - (replaced[0] if replaced is not None else 0)
+        evicted = 0
+        if _disk_bytes > config.llm_cache_disk_max_bytes:
+            # Keep the newest replies that fit in the size budget
+            evicted = conn.execute(
+                "DELETE FROM llm_responses WHERE rowid IN ("
+                " SELECT rowid FROM (SELECT rowid, SUM(size) OVER (ORDER BY last_used_at DESC, rowid DESC) AS total"
+                " FROM llm_responses) WHERE total > ?)",
+                (config.llm_cache_disk_max_bytes,),
+            ).rowcount
+            _disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        conn.commit()
+    if evicted:
+        _count("disk_evictions", evicted)
+
+def _from_memory(key: tuple[str, str, str]) -> Optional[str]:
+    response = _memory.get(key)
+    if response is not None:
+        _count("memory_hits")
+        _touch(key)
+    return response
+
+def _from_disk(key: tuple[str, str, str]) -> Optional[str]:
+    response = _disk_get(key)
+    if response is None:
+        _count("misses")
+        return None
+    _count("disk_hits")
+    _memory.set(key, response)
+    return response
+
+# --- FUNCTIONS ---
+
+def get(model: str, prompt: str, params: dict) -> Optional[str]:
+    """Returns the cached reply to a prompt, checking memory then disk, or None."""
+    if not config.llm_cache_enabled:
+        return None
+    key = _key(model, prompt, params)
+    response = _from_memory(key)
+    if response is None:
+        response = _from_disk(key)
+    if response is not None:
+        _count("saved_tokens", estimate_tokens(prompt) + estimate_tokens(response))
+    return response
+
+async def aget(model: str, prompt: str, params: dict) -> Optional[str]:
+    """Like `get`, but reads the disk tier in a worker thread."""
+    if not config.llm_cache_enabled:
+        return None
+    key = _key(model, prompt, params)
+    response = _from_memory(key)
+    if response is None:
+        response = await asyncio.to_thread(_from_disk, key)
+    if response is not None:
+        _count("saved_tokens", estimate_tokens(prompt) + estimate_tokens(response))
+    return response
+
+def put(model: str, prompt: str, params: dict, response: str):
+    """Caches the reply to a prompt in memory and, when `llm_cache_path` is set, on disk."""
+    if not config.llm_cache_enabled:
+        return
+    key = _key(model, prompt, params)
+    _memory.set(key, response)
+    _disk_put(key, response)
+    _count("stores")
+
+async def aput(model: str, prompt: str, params: dict, response: str):
+    """Like `put`, but writes the disk tier in a worker thread."""
+    if not config.llm_cache_enabled:
+        return
+    key = _key(model, prompt, params)
+    _memory.set(key, response)
+    await asyncio.to_thread(_disk_put, key, response)
+    _count("stores")
+
+def clear():
+    """Empties both tiers and resets the counters."""
+    global _disk_bytes
+    _memory.clear()
+    with _touched_lock:
+        _touched.clear()
+    with _disk_lock:
+        conn = _connection()
+        if conn is not None:
+            conn.execute("DELETE FROM llm_responses")
+            conn.commit()
+            _disk_bytes = 0
+    with _counters_lock:
+        for name in _counters:
+            _counters[name] = 0
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+    hits = counters["memory_hits"] + counters["disk_hits"]
+    with _disk_lock:
+        # Opens the disk tier, which reads its size, if nothing has yet
+        disk_bytes = _disk_bytes if _connection() is not None else 0
+    return {
+        **counters,
+        "entries": len(_memory),
+        "disk_bytes": disk_bytes,
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
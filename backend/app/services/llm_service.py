@@ -1,15 +1,239 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from app.core.config import config
-from app.core.prompts import MAIN_SYSTEM_PROMPT, WORKFLOW_PROMPTS, CLAUSE_EXPLANATION_PROMPT
+from app.core import tracing
+from app.core.tracing import traced
+from app.core.concurrency import ConcurrencyLimiter, run_sync
+from app.core.json_stream import JSONFieldStream
+from app.core.prompts import (
+    MAIN_SYSTEM_PROMPT,
+    WORKFLOW_PROMPTS,
+    CLAUSE_EXPLANATION_PROMPT,
+    CHAT_SUMMARY_PROMPT,
+    SECTION_ANALYSIS_PROMPT,
+    ANALYSIS_REDUCE_PROMPT,
+    FUSED_ANALYSIS_PROMPT,
+    FUSED_WORKFLOW_PROMPT,
+)
+from app.services import llm_cache
+from app.services.chunking_service import chunk_text, estimate_tokens
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+import asyncio
 import json
+import re
+import threading
 
-# Initialize the Language Model
-llm = ChatGoogleGenerativeAI(model=config.model_name, google_api_key=config.google_api_key)
+# The Language Model, built by get_llm() on first use
+llm = None
+_llm_lock = threading.Lock()
 
-def classify_document(text: str) -> str:
+def get_llm():
+    """The shared ChatGoogleGenerativeAI client, created on first use. Thread-safe."""
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                llm = ChatGoogleGenerativeAI(model=config.model_name, google_api_key=config.google_api_key)
+    return llm
+
+# Shared limiter for every LLM call made by this process
+limiter = ConcurrencyLimiter(
+    global_limit=config.llm_max_concurrency,
+    per_key_limit=config.llm_per_model_concurrency,
+    key_limits=config.llm_model_concurrency,
+)
+
+# Called with (path, value) as each analysis field becomes available, e.g.
+# (("summary",), "...") or (("highlights", "governing_law"), "...")
+FieldCallback = Callable[[Tuple[str, ...], Any], None]
+
+# Two risks whose word sets overlap at least this much are treated as the same risk
+_RISK_SIMILARITY_THRESHOLD = 0.6
+
+# --- HELPERS ---
+
+def _parse_json(content: str) -> dict:
+    """Extracts the JSON object from an LLM response."""
+    json_match = re.search(r'\{.*\}', content, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON object found in the LLM's response.")
+    return json.loads(json_match.group(0))
+
+def _is_missing(value) -> bool:
+    """True for empty values and the "Not specified." / "Not Found." placeholders."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().rstrip(".").lower() in ("", "not specified", "not found")
+    return not value
+
+def _words(value) -> set[str]:
+    if isinstance(value, dict):
+        value = " ".join(str(v) for v in value.values())
+    return set(re.findall(r"[a-z0-9]+", str(value).lower()))
+
+def _dedupe_risks(risks: list) -> list:
+    """Drops risks that repeat an earlier one, comparing their word sets."""
+    kept, kept_words = [], []
+    for risk in risks:
+        words = _words(risk)
+        if not words:
+            continue
+        if any(len(words & seen) / len(words | seen) >= _RISK_SIMILARITY_THRESHOLD for seen in kept_words):
+            continue
+        kept.append(risk)
+        kept_words.append(words)
+    return kept
+
+def _section_answers(section: dict) -> dict:
+    """Normalizes a section's answers to {question: answer}, whether the model returned a dict or a list."""
+    answers = section.get("answers") or {}
+    if isinstance(answers, list):
+        return {
+            a.get("question"): a.get("answer")
+            for a in answers
+            if isinstance(a, dict) and a.get("question")
+        }
+    return answers if isinstance(answers, dict) else {}
+
+def report_fields(analysis: dict, on_field: FieldCallback):
+    """Reports every field of a finished analysis, highlights entry by entry."""
+    for field, value in analysis.items():
+        if field == "highlights" and isinstance(value, dict):
+            for key, highlight in value.items():
+                on_field(("highlights", key), highlight)
+        else:
+            on_field((field,), value)
+
+def _merge_sections(sections: list[dict], prompt_template: dict) -> dict:
+    """
+    Combines per-section results: key clauses and risks are unioned and
+    deduplicated, and each question and highlight takes the first section that
+    actually found it.
+    """
+    key_clauses, seen_clauses = [], set()
+    risks = []
+    for section in sections:
+        clauses = section.get("key_clauses") or []
+        for clause in clauses if isinstance(clauses, list) else [clauses]:
+            name = str(clause).strip()
+            if name and name.lower() not in seen_clauses:
+                seen_clauses.add(name.lower())
+                key_clauses.append(name)
+        section_risks = section.get("risks") or []
+        risks.extend(section_risks if isinstance(section_risks, list) else [section_risks])
+
+    section_answers = [_section_answers(section) for section in sections]
+    questions = []
+    for question in prompt_template["questions"]:
+        answer = next(
+            (a[question] for a in section_answers if not _is_missing(a.get(question))),
+            "Not specified.",
+        )
+        questions.append({"question": question, "answer": answer})
+
+    section_highlights = [section.get("highlights") or {} for section in sections]
+    highlights = {}
+    for key in prompt_template["highlights"]:
+        highlights[key] = next(
+            (h[key] for h in section_highlights if not _is_missing(h.get(key))),
+            "Not Found.",
+        )
+
+    return {
+        "key_clause_discussion": key_clauses,
+        "risks": _dedupe_risks(risks),
+        "questions": questions,
+        "highlights": highlights,
+    }
+
+def _record_tokens(prompt: str, reply: str, usage: Optional[dict]):
+    """Counts a call's tokens: as reported by the model, or estimated when it reports none."""
+    if usage:
+        input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    else:
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(reply)
+    tracing.record_tokens(config.model_name, input_tokens, output_tokens)
+
+# The client settings that change what the model replies
+_GENERATION_PARAMS = ("temperature", "top_p", "top_k", "max_output_tokens", "thinking_budget")
+
+def _generation_params() -> dict:
+    client = get_llm()
+    return {name: getattr(client, name, None) for name in _GENERATION_PARAMS}
+
+# --- ASYNC API ---
+
+@traced("llm")
+async def agenerate(prompt: str) -> str:
+    """Sends a prompt to the LLM without blocking the event loop and returns the text."""
+    async with limiter.limit(config.model_name):
+        response = await get_llm().ainvoke(prompt)
+    _record_tokens(prompt, response.content, getattr(response, "usage_metadata", None))
+    return response.content
+
+@traced("llm")
+async def astream_generate(prompt: str) -> AsyncIterator[str]:
+    """Streams the LLM's reply as pieces of text. The limiter slot is held until the reply ends."""
+    parts = []
+    usage = {}
+    async with limiter.limit(config.model_name):
+        async for chunk in get_llm().astream(prompt):
+            parts.append(chunk.content)
+            # Each chunk reports the tokens it added
+            for key, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+                if isinstance(value, int):
+                    usage[key] = usage.get(key, 0) + value
+            yield chunk.content
+    _record_tokens(prompt, "".join(parts), usage)
+
+async def _agenerate_fields(prompt: str, on_field: FieldCallback) -> str:
+    """
+    Streams a JSON reply, passing each field to `on_field` as soon as its value
+    is complete. Returns the full reply text.
+    """
+    parser = JSONFieldStream()
+    parts = []
+    async for text in astream_generate(prompt):
+        parts.append(text)
+        for path, value in parser.feed(text):
+            # Highlights were already reported entry by entry
+            if path != ("highlights",):
+                on_field(path, value)
+    return "".join(parts)
+
+async def _agenerate_cached(
+    prompt: str, cache: bool, parse: Callable[[str], Any] = str, on_field: Optional[FieldCallback] = None
+) -> Any:
+    """
+    Returns parse(reply), serving the reply from the response cache when
+    `cache` is on. Only replies that parse are cached, so a malformed one is
+    asked for again next time. With `on_field` the reply is streamed, or a
+    cached one reported field by field.
+    """
+    params = _generation_params() if cache else {}
+    reply = await llm_cache.aget(config.model_name, prompt, params) if cache else None
+    if reply is not None:
+        current = tracing.current_span()
+        if current is not None:
+            current.add(cache_hits=1)
+        result = parse(reply)
+        if on_field is not None:
+            report_fields(result, on_field)
+        return result
+    if on_field is None:
+        reply = await agenerate(prompt)
+    else:
+        reply = await _agenerate_fields(prompt, on_field)
+    result = parse(reply)
+    if cache:
+        await llm_cache.aput(config.model_name, prompt, params, reply)
+    return result
+
+@traced("llm")
+async def aclassify_document(text: str, cache: bool = True) -> str:
     """Uses the LLM to classify the type of document and validate it."""
     supported_doctypes = list(WORKFLOW_PROMPTS.keys())
-    
+
     prompt = f"""
     Analyze the text below and classify it into one of the following categories:
     {', '.join(supported_doctypes)}
@@ -23,8 +247,7 @@ def classify_document(text: str) -> str:
     ---
     {text[:2000]}
     """
-    response = llm.invoke(prompt)
-    classification = response.content.strip()
+    classification = (await _agenerate_cached(prompt, cache)).strip()
 
     all_valid_classifications = supported_doctypes + ["Unsupported Document Type"]
 
@@ -34,12 +257,24 @@ def classify_document(text: str) -> str:
         # Fallback for unexpected model responses
         return "Unsupported Document Type"
 
-def get_full_analysis(text: str, classification: str) -> dict:
-    """Generates a full analysis of the document based on its classification."""
+@traced("llm")
+async def aget_full_analysis(
+    text: str, classification: str, on_field: Optional[FieldCallback] = None, cache: bool = True
+) -> dict:
+    """
+    Generates a full analysis of the document based on its classification.
+
+    When `on_field` is given the reply is streamed, and each field (summary,
+    risks, risk_score, single highlights...) is reported as soon as the model
+    has finished writing it. Pass cache=False to always ask the model.
+    """
     prompt_template = WORKFLOW_PROMPTS.get(classification)
     if not prompt_template:
         raise ValueError(f"No prompt template found for classification: {classification}")
 
+    if estimate_tokens(text) > config.long_document_token_threshold:
+        return await _aget_sectioned_analysis(text, prompt_template, on_field, cache)
+
     # Construct the full prompt
     full_prompt = f"""
     {MAIN_SYSTEM_PROMPT}
@@ -52,7 +287,7 @@ def get_full_analysis(text: str, classification: str) -> dict:
     ---
 
     Instructions: Generate a JSON response with the following structure: {prompt_template['json_structure']}
-    
+
     1. Summary (summary): {prompt_template['summary_prompt']}
     2. Key Clause Discussion (key_clause_discussion): {prompt_template['key_clause_discussion_prompt']}
     3. Risks (risks): {prompt_template['risks_prompt']}
@@ -62,20 +297,151 @@ def get_full_analysis(text: str, classification: str) -> dict:
     6. Highlights (highlights): Extract the exact, verbatim text for the following. If not found, state "Not Found."
     {json.dumps(prompt_template['highlights'], indent=4)}
     """
-    
-    response = llm.invoke(full_prompt)
-    
-    # Extract the JSON part of the response
-    import re
-    json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
-    if not json_match:
-        raise ValueError("No JSON object found in the LLM's response.")
-    
-    return json.loads(json_match.group(0))
 
+    return await _agenerate_cached(full_prompt, cache, _parse_json, on_field)
 
-def explain_clauses(discussion_text: str) -> str:
+def _parse_fused(content: str) -> dict:
+    """Parses a fused reply, rejecting one whose classification is not a known category."""
+    result = _parse_json(content)
+    if result.get("classification") not in list(WORKFLOW_PROMPTS) + ["Unsupported Document Type"]:
+        raise ValueError(f"Unknown classification in fused reply: {result.get('classification')!r}")
+    return result
+
+@traced("llm")
+async def aclassify_and_analyze(
+    text: str, on_field: Optional[FieldCallback] = None, cache: bool = True
+) -> Tuple[str, Optional[dict]]:
+    """
+    Classifies a document and analyzes it in a single call, with one prompt
+    that carries every workflow. This saves a round trip, at the cost of the
+    other workflows' instructions in the prompt. Returns the classification and the analysis,
+    which is None for unsupported documents or when the model left it out.
+    Raises ValueError when the reply is not valid JSON or names no known
+    category, so the caller can fall back to `aclassify_document`.
+
+    With `on_field` the reply is streamed; the classification is reported
+    first, as ("classification",).
+    """
+    workflows = "".join(
+        FUSED_WORKFLOW_PROMPT.format(
+            classification=classification,
+            summary_prompt=template["summary_prompt"],
+            key_clause_discussion_prompt=template["key_clause_discussion_prompt"],
+            risks_prompt=template["risks_prompt"],
+            questions=json.dumps(template["questions"]),
+            highlights=json.dumps(template["highlights"]),
+        )
+        for classification, template in WORKFLOW_PROMPTS.items()
+    )
+    # Every workflow scores risk the same way, so that is stated once
+    prompt = FUSED_ANALYSIS_PROMPT.format(
+        system_prompt=MAIN_SYSTEM_PROMPT,
+        categories=", ".join(WORKFLOW_PROMPTS),
+        text=text,
+        risk_score_prompt=next(iter(WORKFLOW_PROMPTS.values()))["risk_score_prompt"],
+        workflows=workflows,
+    )
+    result = await _agenerate_cached(prompt, cache, _parse_fused, on_field)
+    classification = result.pop("classification")
+    if classification == "Unsupported Document Type" or "summary" not in result:
+        return classification, None
+    return classification, result
+
+async def _aanalyze_section(
+    section_text: str, index: int, total: int, prompt_template: dict, cache: bool
+) -> dict:
+    """Map step: extracts clauses, risks, answers and highlights from one section."""
+    prompt = SECTION_ANALYSIS_PROMPT.format(
+        system_prompt=MAIN_SYSTEM_PROMPT,
+        instructions=prompt_template["instructions"],
+        index=index,
+        total=total,
+        section_text=section_text,
+        key_clause_discussion_prompt=prompt_template["key_clause_discussion_prompt"],
+        risks_prompt=prompt_template["risks_prompt"],
+        questions=json.dumps(prompt_template["questions"], indent=4),
+        highlights=json.dumps(prompt_template["highlights"], indent=4),
+    )
+    return await _agenerate_cached(prompt, cache, _parse_json)
+
+async def _aget_sectioned_analysis(
+    text: str, prompt_template: dict, on_field: Optional[FieldCallback] = None, cache: bool = True
+) -> dict:
+    """
+    Long-document mode. The text is split into sections along its structure,
+    every section is analyzed concurrently (map), and the results are merged
+    into the usual analysis shape (reduce). A final small call writes the
+    summary and scores the deduplicated risks, so wall-clock time follows the
+    longest section rather than the whole document. With `on_field`, the
+    merged fields are reported before the final call and the summary and
+    score as that call streams.
+    """
+    sections = [
+        chunk.text
+        for chunk in chunk_text(text, target_tokens=config.long_document_section_tokens, overlap_tokens=0)
+    ]
+    results = await asyncio.gather(*(
+        _aanalyze_section(section, i + 1, len(sections), prompt_template, cache)
+        for i, section in enumerate(sections)
+    ))
+    merged = _merge_sections(results, prompt_template)
+    if on_field is not None:
+        report_fields(merged, on_field)
+
+    reduce_prompt = ANALYSIS_REDUCE_PROMPT.format(
+        system_prompt=MAIN_SYSTEM_PROMPT,
+        instructions=prompt_template["instructions"],
+        section_summaries="\n".join(
+            f"{i}. {r.get('section_summary', '')}" for i, r in enumerate(results, start=1)
+        ),
+        risks=json.dumps(merged["risks"], indent=4),
+        summary_prompt=prompt_template["summary_prompt"],
+        risk_score_prompt=prompt_template["risk_score_prompt"],
+    )
+    overall = await _agenerate_cached(reduce_prompt, cache, _parse_json, on_field)
+
+    return {
+        "summary": overall.get("summary", ""),
+        "key_clause_discussion": merged["key_clause_discussion"],
+        "risks": merged["risks"],
+        "risk_score": overall.get("risk_score", 0),
+        "questions": merged["questions"],
+        "highlights": merged["highlights"],
+    }
+
+
+@traced("llm")
+async def aexplain_clauses(discussion_text: str, cache: bool = True) -> str:
     """Uses the LLM to explain the key clause discussion in simple terms."""
     prompt = CLAUSE_EXPLANATION_PROMPT.format(discussion_text=discussion_text)
-    response = llm.invoke(prompt)
-    return response.content
+    return await _agenerate_cached(prompt, cache)
+
+@traced("llm")
+async def asummarize_conversation(previous_summary: str, turns: List[Tuple[str, str]], max_words: int) -> str:
+    """Folds older (question, answer) turns into the running summary of a chat session."""
+    exchanges = "\n".join(f"Human: {q}\nAI: {a}" for q, a in turns)
+    prompt = CHAT_SUMMARY_PROMPT.format(
+        max_words=max_words,
+        previous_summary=previous_summary or "(none)",
+        exchanges=exchanges,
+    )
+    return (await agenerate(prompt)).strip()
+
+# --- SYNC SHIMS ---
+# For scripts and other synchronous callers. Graph nodes await the async API.
+
+def classify_document(text: str, cache: bool = True) -> str:
+    """Synchronous wrapper around `aclassify_document`."""
+    return run_sync(aclassify_document(text, cache=cache))
+
+def get_full_analysis(text: str, classification: str, cache: bool = True) -> dict:
+    """Synchronous wrapper around `aget_full_analysis`."""
+    return run_sync(aget_full_analysis(text, classification, cache=cache))
+
+def explain_clauses(discussion_text: str, cache: bool = True) -> str:
+    """Synchronous wrapper around `aexplain_clauses`."""
+    return run_sync(aexplain_clauses(discussion_text, cache=cache))
+
+def classify_and_analyze(text: str, cache: bool = True) -> Tuple[str, Optional[dict]]:
+    """Synchronous wrapper around `aclassify_and_analyze`."""
+    return run_sync(aclassify_and_analyze(text, cache=cache))
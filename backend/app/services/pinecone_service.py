@@ -1,41 +1,159 @@
-from pinecone import Pinecone
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import config
+from app.core.tracing import traced
+from app.services import embedding_cache
+from app.services.chunking_service import Chunk, chunk_text
+from app.services.vector_store import LocalVectorStore, PineconeVectorStore, VectorStore
 
-pc = Pinecone(api_key=config.pinecone_api_key)
-index = pc.Index(name=config.pinecone_index_name)
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model=config.embedding_model_name,
-    google_api_key=config.google_api_key
-)
+def _create_store() -> VectorStore:
+    """Builds the vector store selected by `vector_store_backend`."""
+    if config.vector_store_backend == "local":
+        return LocalVectorStore(config.local_vector_store_path)
+    if config.vector_store_backend != "pinecone":
+        raise ValueError(f"Unknown vector store backend: {config.vector_store_backend}")
+    if not config.pinecone_api_key or not config.pinecone_index_name:
+        raise ValueError("PINECONE_API_KEY and PINECONE_INDEX_NAME are required for the Pinecone backend.")
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=config.pinecone_api_key)
+    return PineconeVectorStore(pc.Index(name=config.pinecone_index_name))
+
+# The vector store and the embedding model are built on first use
+store = None
+embeddings_model = None
+_store_lock = threading.Lock()
+_embeddings_lock = threading.Lock()
+
+def get_store() -> VectorStore:
+    """The shared vector store, created on first use. Thread-safe."""
+    global store
+    if store is None:
+        with _store_lock:
+            if store is None:
+                store = _create_store()
+    return store
+
+def get_embeddings_model():
+    """The shared GoogleGenerativeAIEmbeddings model, created on first use. Thread-safe."""
+    global embeddings_model
+    if embeddings_model is None:
+        with _embeddings_lock:
+            if embeddings_model is None:
+                from langchain_google_genai import GoogleGenerativeAIEmbeddings
+                embeddings_model = GoogleGenerativeAIEmbeddings(
+                    model=config.embedding_model_name,
+                    google_api_key=config.google_api_key
+                )
+    return embeddings_model
+
+# Rough per-vector JSON overhead (id, keys, metadata field names)
+_VECTOR_OVERHEAD_BYTES = 256
+
+# --- HELPERS ---
+
+def _batched(items: list, size: int) -> list[list]:
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+def _estimated_size(vector: dict) -> int:
+    # Dense float embeddings serialize to ~20 characters each in the JSON body
+    return (
+        len(vector["values"]) * 20
+        + len(vector["metadata"]["text"].encode("utf-8"))
+        + _VECTOR_OVERHEAD_BYTES
+    )
+
+def _upsert_batches(vectors: list[dict]) -> list[list[dict]]:
+    """Splits vectors into batches capped by both count and estimated request size."""
+    batches, batch, batch_bytes = [], [], 0
+    for vector in vectors:
+        size = _estimated_size(vector)
+        if batch and (
+            len(batch) >= config.pinecone_upsert_batch_size
+            or batch_bytes + size > config.pinecone_upsert_max_bytes
+        ):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
 
 # --- FUNCTIONS ---
 
+@traced("embedding")
 def embed_text(text: str) -> list[float]:
     """Generate embedding for text chunk."""
-    return embeddings_model.embed_query(text)
+    return get_embeddings_model().embed_query(text)
+
+def embed_query_cached(query: str) -> list[float]:
+    """Embed a search query, reusing the cached embedding for repeated questions."""
+    emb = embedding_cache.get(query)
+    if emb is None:
+        emb = embed_text(query)
+        embedding_cache.put(query, emb)
+    return emb
 
-def upsert_document(user_id: str, doc_id: str, text: str):
-    """Chunk text, embed, and upsert into Pinecone."""
-    chunks = [text[i:i+500] for i in range(0, len(text), 500)]
+@traced("embedding")
+def embed_batch(chunks: list[str]) -> list[list[float]]:
+    """Generate embeddings for a batch of chunks in a single request."""
+    return get_embeddings_model().embed_documents(chunks, batch_size=len(chunks) or 1)
+
+@traced("vector")
+def upsert_embeddings(user_id: str, doc_id: str, embedded_chunks: list[tuple[Chunk, list[float]]]):
+    """Upsert already-embedded chunks into Pinecone under the given doc_id, in size-capped batches."""
     vectors = []
-    for i, chunk in enumerate(chunks):
-        emb = embed_text(chunk)
+    for chunk, emb in embedded_chunks:
         vectors.append({
-            "id": f"{doc_id}_{i}",
+            "id": f"{doc_id}_{chunk.chunk_id}",
             "values": emb,
-            "metadata": {"user_id": user_id, "doc_id": doc_id, "text": chunk}
+            "metadata": {"user_id": user_id, "doc_id": doc_id, "text": chunk.text, **chunk.metadata()}
         })
-    index.upsert(vectors=vectors, namespace=user_id)
+    for batch in _upsert_batches(vectors):
+        get_store().upsert(user_id, batch)
+
+@traced("vector")
+def upsert_document(
+    user_id: str,
+    doc_id: str,
+    text: str,
+    page_offsets: list[int] | None = None,
+) -> list[tuple[Chunk, list[float]]]:
+    """
+    Chunk text along its structure, embed, and upsert into Pinecone. Returns
+    the embedded chunks.
 
+    Embedding batches run concurrently (up to `embedding_max_concurrent_batches`)
+    and each batch is handed to the upsert pool as soon as it is ready, so
+    upserting batch N overlaps with embedding batch N+1.
+    """
+    chunks = chunk_text(text, page_offsets=page_offsets)
+    batches = _batched(chunks, config.embedding_batch_size)
+    embedded_chunks: list[tuple[Chunk, list[float]]] = []
+
+    with ThreadPoolExecutor(max_workers=config.embedding_max_concurrent_batches) as embed_pool, \
+            ThreadPoolExecutor(max_workers=config.pinecone_upsert_concurrency) as upsert_pool:
+        # Each task runs in a copy of this context, so its trace span nests under this call
+        embed_futures = [
+            embed_pool.submit(contextvars.copy_context().run, embed_batch, [c.text for c in batch])
+            for batch in batches
+        ]
+        upsert_futures = []
+        for batch, future in zip(batches, embed_futures):
+            pairs = list(zip(batch, future.result()))
+            upsert_futures.append(upsert_pool.submit(
+                contextvars.copy_context().run, upsert_embeddings, user_id, doc_id, pairs
+            ))
+            embedded_chunks.extend(pairs)
+        for future in upsert_futures:
+            future.result()
+
+    return embedded_chunks
+
+@traced("vector")
 def query(user_id: str, doc_id: str, query: str):
-    """Search relevant chunks in Pinecone."""
-    emb = embed_text(query)
-    resp = index.query(
-        vector=emb,
-        top_k=5,
-        namespace=user_id,
-        filter={"doc_id": {"$eq": doc_id}} if doc_id else {},
-        include_metadata=True
-    )
-    return [m.metadata for m in resp.matches if m.metadata is not None]
+    """Search relevant chunks in the vector store."""
+    emb = embed_query_cached(query)
+    matches = get_store().query(user_id, doc_id, emb, top_k=config.retrieval_top_k)
+    return [m["metadata"] for m in matches if m["metadata"] is not None]
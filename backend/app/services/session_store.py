@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import config
+from app.services import llm_service
+from app.services.chunking_service import estimate_tokens
+
+# A (question, answer) exchange
+Turn = Tuple[str, str]
+
+
+# --- Session Definition ---
+@dataclass
+class ChatSession:
+    """One user's conversation about one document: a summary of older turns plus the recent ones."""
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+
+
+class SessionStore(ABC):
+    """Where chat sessions live, keyed by (user_id, doc_id)."""
+
+    @abstractmethod
+    def get(self, user_id: str, doc_id: str) -> Optional[ChatSession]:
+        ...
+
+    @abstractmethod
+    def save(self, user_id: str, doc_id: str, session: ChatSession) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: str, doc_id: str) -> None:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a per-process LRU; the least recently used and idle ones are evicted."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: Optional[float] = None):
+        self._cache = LRUCache(max_entries=max_sessions, ttl_seconds=ttl_seconds)
+
+    def get(self, user_id: str, doc_id: str) -> Optional[ChatSession]:
+        session = self._cache.get((user_id, doc_id))
+        # A copy, so callers can change it without touching the stored session
+        return ChatSession(session.summary, list(session.turns)) if session is not None else None
+
+    def save(self, user_id: str, doc_id: str, session: ChatSession) -> None:
+        self._cache.set((user_id, doc_id), ChatSession(session.summary, list(session.turns)))
+
+    def delete(self, user_id: str, doc_id: str) -> None:
+        self._cache.pop((user_id, doc_id))
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file, shared by every worker process on the host and
+    kept across restarts. Idle sessions expire after `ttl_seconds`, and only
+    the `max_sessions` most recently used are kept.
+    """
+
+    def __init__(self, path: str, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets other workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " user_id TEXT NOT NULL, doc_id TEXT NOT NULL, summary TEXT NOT NULL, turns TEXT NOT NULL,"
+            " updated_at REAL NOT NULL, PRIMARY KEY (user_id, doc_id))"
+        )
+        self._conn.commit()
+
+    def get(self, user_id: str, doc_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, turns, updated_at FROM chat_sessions WHERE user_id = ? AND doc_id = ?",
+                (user_id, doc_id),
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.ttl_seconds:
+            return None
+        return ChatSession(summary=row[0], turns=[tuple(turn) for turn in json.loads(row[1])])
+
+    def save(self, user_id: str, doc_id: str, session: ChatSession) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (user_id, doc_id, summary, turns, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (user_id, doc_id, session.summary, json.dumps(session.turns), time.time()),
+            )
+            self._writes += 1
+            # Trim expired and excess sessions every so often rather than on every write
+            if self._writes % 100 == 0:
+                self._conn.execute(
+                    "DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+                )
+                self._conn.execute(
+                    "DELETE FROM chat_sessions WHERE rowid NOT IN ("
+                    " SELECT rowid FROM chat_sessions ORDER BY updated_at DESC LIMIT ?)",
+                    (self.max_sessions,),
+                )
+            self._conn.commit()
+
+    def delete(self, user_id: str, doc_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_sessions WHERE user_id = ? AND doc_id = ?", (user_id, doc_id))
+            self._conn.commit()
+
+
+def _create_store() -> SessionStore:
+    """Builds the session store selected by `chat_session_backend`."""
+    if config.chat_session_backend == "memory":
+        return MemorySessionStore(config.chat_session_max_sessions, config.chat_session_ttl_seconds)
+    if config.chat_session_backend == "sqlite":
+        return SQLiteSessionStore(
+            config.chat_session_path, config.chat_session_max_sessions, config.chat_session_ttl_seconds
+        )
+    raise ValueError(f"Unknown chat session backend: {config.chat_session_backend}")
+
+store = _create_store()
+
+# One lock per session, so concurrent appends to it don't overwrite each other's turns
+_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+# Summaries being written in the background, by session
+_compactions: "dict[Tuple[str, str], asyncio.Task]" = {}
+
+# --- HELPERS ---
+
+def _lock(user_id: str, doc_id: str) -> asyncio.Lock:
+    lock = _locks.get((user_id, doc_id))
+    if lock is None:
+        lock = _locks[(user_id, doc_id)] = asyncio.Lock()
+    return lock
+
+def _turn_tokens(turn: Turn) -> int:
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+def _turns_to_keep(turns: List[Turn]) -> int:
+    """
+    How many of the newest turns to keep once the session is over its caps.
+    Compaction goes down to half the caps, so it does not run again on the
+    very next turn. The newest turn is always kept.
+    """
+    max_turns = max(1, config.chat_history_max_turns // 2)
+    budget = config.chat_history_token_budget // 2
+    keep, used = 0, 0
+    for turn in reversed(turns):
+        tokens = _turn_tokens(turn)
+        if keep and (keep >= max_turns or used + tokens > budget):
+            break
+        keep += 1
+        used += tokens
+    return keep
+
+def _over_caps(session: ChatSession) -> bool:
+    total = sum(_turn_tokens(turn) for turn in session.turns)
+    return len(session.turns) > config.chat_history_max_turns or total > config.chat_history_token_budget
+
+async def _compact(user_id: str, doc_id: str):
+    """
+    Folds the older turns of an over-long session into its summary. The LLM
+    call runs without the session's lock; the result is only saved if those
+    turns are still the oldest ones, and turns appended meanwhile are kept.
+    """
+    session = await aget_session(user_id, doc_id)
+    if not _over_caps(session):
+        return
+    older = session.turns[:-_turns_to_keep(session.turns)]
+    try:
+        summary = await llm_service.asummarize_conversation(session.summary, older, config.chat_summary_max_words)
+    except Exception as e:
+        # The older turns are dropped either way; the previous summary stays
+        logging.warning(f"Could not summarize chat history: {e}")
+        summary = session.summary
+    async with _lock(user_id, doc_id):
+        current = await aget_session(user_id, doc_id)
+        if current.summary != session.summary or current.turns[:len(older)] != older:
+            return
+        current.summary, current.turns = summary, current.turns[len(older):]
+        await asyncio.to_thread(store.save, user_id, doc_id, current)
+
+def _schedule_compaction(user_id: str, doc_id: str):
+    key = (user_id, doc_id)
+    task = _compactions.get(key)
+    if task is not None and not task.done():
+        return
+    task = _compactions[key] = asyncio.create_task(_compact(user_id, doc_id))
+
+    def forget(done: asyncio.Task):
+        if _compactions.get(key) is done:
+            del _compactions[key]
+    task.add_done_callback(forget)
+
+# --- FUNCTIONS ---
+
+def get_session(user_id: str, doc_id: str) -> ChatSession:
+    """Returns the session for this user and document, or an empty one."""
+    return store.get(user_id, doc_id) or ChatSession()
+
+async def aget_session(user_id: str, doc_id: str) -> ChatSession:
+    """Like `get_session`, but reads the store in a worker thread."""
+    return await asyncio.to_thread(get_session, user_id, doc_id)
+
+async def append_turn(user_id: str, doc_id: str, question: str, answer: str) -> ChatSession:
+    """
+    Records an exchange and saves the session. Once the session has more than
+    `chat_history_max_turns` turns or `chat_history_token_budget` tokens, the
+    older turns are folded into the summary, so prompts stay bounded however
+    long the conversation runs. The summary is written in the background; the
+    request does not wait for it.
+    """
+    async with _lock(user_id, doc_id):
+        session = await aget_session(user_id, doc_id)
+        session.turns.append((question, answer))
+        if _over_caps(session) and not config.chat_history_summarize:
+            session.turns = session.turns[-_turns_to_keep(session.turns):]
+        await asyncio.to_thread(store.save, user_id, doc_id, session)
+    if _over_caps(session):
+        _schedule_compaction(user_id, doc_id)
+    return session
+
+async def wait_for_compactions():
+    """Waits for the summaries being written in the background, e.g. before shutting down."""
+    await asyncio.gather(*_compactions.values(), return_exceptions=True)
+
+def clear_session(user_id: str, doc_id: str):
+    store.delete(user_id, doc_id)
@@ -1,23 +1,34 @@
-import fitz # PyMuPDF
 import uuid
+from app.core.config import config
+from app.core.tracing import traced
 from app.core.firebase import get_firebase_storage, get_firestore_client
+from app.services import extraction_service, text_store
 from fastapi import UploadFile
-from io import BytesIO
+import base64
 import datetime
+import json
 import tempfile
 import os
 
 # --- CORE FUNCTIONS ---
 
-def save_document(user_id: str, file: UploadFile) -> str:
-    """Saves a document to Firebase Storage and its metadata to Firestore."""
+@traced("storage")
+def save_document(user_id: str, file: UploadFile, doc_id: str | None = None) -> str:
+    """
+    Saves a document to Firebase Storage and its metadata to Firestore. The
+    file is streamed to Storage in `upload_chunk_bytes` chunks rather than
+    read into memory. Saving again under the same `doc_id` overwrites both,
+    so a retried analysis does not leave a duplicate behind.
+    """
     db = get_firestore_client()
     bucket = get_firebase_storage()
-    doc_id = str(uuid.uuid4())
+    doc_id = doc_id or str(uuid.uuid4())
 
-    # Read content to get size and for upload
-    content = file.file.read()
-    file_size_bytes = len(content)
+    stream = file.file
+    # Get the size without reading the content
+    stream.seek(0, os.SEEK_END)
+    file_size_bytes = stream.tell()
+    stream.seek(0)
     file_size_mb = round(file_size_bytes / (1024 * 1024), 2)  # Convert to MB and round
     
     # 1. Save metadata to Firestore, now including file size in MB
@@ -30,49 +41,45 @@ def save_document(user_id: str, file: UploadFile) -> str:
         "file_size_mb": file_size_mb,
     })
 
-    # 2. Upload file to Storage from the read content
+    # 2. Upload file to Storage, chunk by chunk
     blob = bucket.blob(f"{user_id}/{doc_id}/{file.filename}")
-    blob.upload_from_string(content, content_type=file.content_type)
+    blob.chunk_size = config.upload_chunk_bytes
+    with stream:
+        blob.upload_from_file(stream, size=file_size_bytes, content_type=file.content_type)
     
     return doc_id
 
 
-import docx
-
-def extract_text(file_bytes: bytes, filename: str) -> str:
+@traced("extraction")
+def extract_document(source: bytes | str, filename: str) -> extraction_service.ExtractedText:
     """
-    Extracts text from a file's byte content, normalizing and cleaning it.
+    Extracts normalized text and the page offset table from a file's byte
+    content or a local path. Large PDFs are extracted in parallel by page range.
     """
-    text = ""
     try:
-        if filename.endswith(".pdf"):
-            # Open the PDF from the byte stream
-            with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-                # Iterate through each page and extract text
-                for page in doc:
-                    page_text = page.get_text("text", textpage=None, sort=False)
-                    
-                    # --- FIX: Normalize and clean the text ---
-                    # 1. Normalize to NFKC to handle various unicode characters
-                    # 2. Encode to ASCII, ignoring errors, to remove problematic chars
-                    # 3. Decode back to UTF-8
-                    cleaned_text = page_text.encode('ascii', 'ignore').decode('utf-8')
-                    text += cleaned_text
-        elif filename.endswith(".docx"):
-            doc = docx.Document(BytesIO(file_bytes))
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        elif filename.endswith(".txt"):
-            text = file_bytes.decode('utf-8')
+        return extraction_service.extract_document(source, filename)
     except Exception as e:
         print(f"Error extracting text from {filename}: {e}")
         # Fallback or error handling can be added here
-        return "" # Return empty string on failure
-        
-    return text
+        return extraction_service.ExtractedText(text="", page_offsets=[]) # Empty on failure
 
+def extract_text(file_bytes: bytes, filename: str) -> str:
+    """
+    Extracts text from a file's byte content, normalizing and cleaning it.
+    """
+    return extract_document(file_bytes, filename).text
+
+@traced("storage")
 def get_document_text(user_id: str, doc_id: str) -> str:
-    """Retrieves a document from storage and extracts its text using metadata from Firestore."""
+    """
+    Returns a document's text from its extracted-text artifact. Documents
+    analyzed before artifacts were saved are downloaded and extracted once,
+    and their artifact saved for next time.
+    """
+    artifact = text_store.load(user_id, doc_id)
+    if artifact is not None:
+        return artifact.text
+
     db = get_firestore_client()
     bucket = get_firebase_storage()
 
@@ -91,10 +98,14 @@ def get_document_text(user_id: str, doc_id: str) -> str:
     file_bytes = blob.download_as_bytes()
     
     # 3. Extract text
-    return extract_text(file_bytes)
+    extracted = extract_document(file_bytes, filename)
+    if extracted.text:
+        text_store.save(user_id, doc_id, extracted)
+    return extracted.text
 
 # --- HISTORY FUNCTIONS ---
 
+@traced("storage")
 def save_analysis_to_firestore(user_id: str, doc_id: str, analysis_data: dict):
     """Saves the complete analysis results to Firestore."""
     db = get_firestore_client()
@@ -106,25 +117,85 @@ def save_analysis_to_firestore(user_id: str, doc_id: str, analysis_data: dict):
         **analysis_data
     }, merge=True)
 
-def get_analysis_history(user_id: str) -> list:
-    """Retrieves the analysis history for a given user."""
+def save_analysis_trace(user_id: str, doc_id: str, trace: dict):
+    """Attaches the span tree of the run that produced an analysis to its Firestore document."""
+    db = get_firestore_client()
+    doc_ref = db.collection("users").document(user_id).collection("analyses").document(doc_id)
+    doc_ref.set({"trace": trace}, merge=True)
+
+# Fields the history list shows; everything else comes from get_analysis
+HISTORY_LIST_FIELDS = [
+    "doc_id",
+    "filename",
+    "file_size_mb",
+    "status",
+    "timestamp",
+    "classification",
+    "document_analysis.summary",
+    "document_analysis.risk_score",
+    "document_analysis.classification",
+]
+
+def _serialize_analysis(data: dict) -> dict:
+    # Convert timestamp to ISO 8601 string
+    if 'timestamp' in data and hasattr(data['timestamp'], 'isoformat'):
+        data['timestamp'] = data['timestamp'].isoformat()
+    return data
+
+def _encode_cursor(timestamp: str, doc_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, doc_id]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple[datetime.datetime, str]:
+    """The (timestamp, doc_id) of a history cursor; raises ValueError if it is malformed."""
+    try:
+        timestamp, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except TypeError as e:
+        raise ValueError(str(e)) from e
+    if not isinstance(timestamp, str) or not isinstance(doc_id, str):
+        raise ValueError("cursor must hold a timestamp and a doc_id")
+    return datetime.datetime.fromisoformat(timestamp), doc_id
+
+@traced("storage")
+def get_analysis_history(user_id: str, limit: int, after: str | None = None) -> tuple[list, str | None]:
+    """
+    Retrieves one page of a user's analysis history, most recent first, with
+    only the HISTORY_LIST_FIELDS of each analysis. `after` is the cursor
+    returned with the previous page; it holds the timestamp and doc_id of
+    that page's last entry, so analyses saved in the same instant are
+    neither skipped nor repeated. The returned cursor is None on the last page.
+    """
     db = get_firestore_client()
     history_ref = db.collection("users").document(user_id).collection("analyses")
     
-    # Order by timestamp to get the most recent first
-    query = history_ref.order_by("timestamp", direction="DESCENDING")
-    
-    history = []
-    for doc in query.stream():
-        data = doc.to_dict()
-        # Convert timestamp to ISO 8601 string
-        if 'timestamp' in data and hasattr(data['timestamp'], 'isoformat'):
-            data['timestamp'] = data['timestamp'].isoformat()
-        history.append(data)
-        
-    return history
+    # Order by timestamp to get the most recent first, then by document id to break ties
+    query = (
+        history_ref.order_by("timestamp", direction="DESCENDING")
+        .order_by("__name__", direction="DESCENDING")
+        .select(HISTORY_LIST_FIELDS)
+    )
+    if after:
+        timestamp, doc_id = _decode_cursor(after)
+        query = query.start_after({"timestamp": timestamp, "__name__": history_ref.document(doc_id)})
+    # One extra entry tells whether there is another page
+    query = query.limit(limit + 1)
+
+    snapshots = list(query.stream())
+    history = [_serialize_analysis(doc.to_dict()) for doc in snapshots[:limit]]
+    if len(snapshots) <= limit:
+        return history, None
+    return history, _encode_cursor(history[-1].get("timestamp"), snapshots[limit - 1].id)
+
+@traced("storage")
+def get_analysis(user_id: str, doc_id: str) -> dict | None:
+    """Retrieves one complete analysis, or None if the user has no such document."""
+    db = get_firestore_client()
+    doc_snapshot = db.collection("users").document(user_id).collection("analyses").document(doc_id).get()
+    if not doc_snapshot.exists:
+        return None
+    return _serialize_analysis(doc_snapshot.to_dict())
 
 
+@traced("storage")
 def download_document(user_id: str, doc_id: str) -> tuple[str, str]:
     """Downloads a document from Firebase Storage and returns its local path and filename."""
     db = get_firestore_client()
@@ -147,6 +218,7 @@ def download_document(user_id: str, doc_id: str) -> tuple[str, str]:
     
     return local_path, filename
 
+@traced("storage")
 def upload_highlighted_document(user_id: str, doc_id: str, local_path: str) -> str:
     """Uploads a highlighted document to Firebase Storage and returns its public URL."""
     bucket = get_firebase_storage()
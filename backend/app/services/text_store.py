@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import config
+from app.core.firebase import get_firebase_storage
+from app.core.paths import safe_path_component
+from app.core.tracing import traced
+from app.services.chunking_service import detect_sections
+from app.services.extraction_service import ExtractedText
+
+# Bumped when the artifact layout changes; older artifacts are treated as missing
+_FORMAT_VERSION = 1
+_ARTIFACT_NAME = "extracted_text.json.z"
+
+
+# --- Artifact Definition ---
+@dataclass
+class TextArtifact:
+    """A document's extracted text, where each page starts, and its sections as (offset, heading)."""
+    text: str
+    page_offsets: List[int] = field(default_factory=list)
+    sections: List[Tuple[int, str]] = field(default_factory=list)
+
+    def page_text(self, page: int) -> str:
+        """The text of one page (0-based)."""
+        start = self.page_offsets[page]
+        end = self.page_offsets[page + 1] if page + 1 < len(self.page_offsets) else len(self.text)
+        return self.text[start:end]
+
+
+def _encode(artifact: TextArtifact) -> bytes:
+    payload = {
+        "version": _FORMAT_VERSION,
+        "text": artifact.text,
+        "page_offsets": artifact.page_offsets,
+        "sections": artifact.sections,
+    }
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return zlib.compress(data, config.text_store_compression_level)
+
+def _decode(data: bytes) -> Optional[TextArtifact]:
+    payload = json.loads(zlib.decompress(data).decode("utf-8"))
+    if payload.get("version") != _FORMAT_VERSION:
+        return None
+    return TextArtifact(
+        text=payload["text"],
+        page_offsets=payload["page_offsets"],
+        sections=[tuple(section) for section in payload["sections"]],
+    )
+
+
+class ArtifactStore(ABC):
+    """Where the compressed artifacts live, keyed by (user_id, doc_id)."""
+
+    @abstractmethod
+    def get(self, user_id: str, doc_id: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def put(self, user_id: str, doc_id: str, data: bytes) -> None:
+        ...
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifacts as files under a directory, one per document."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, user_id: str, doc_id: str) -> str:
+        return os.path.join(self.directory, safe_path_component(user_id), safe_path_component(doc_id), _ARTIFACT_NAME)
+
+    def get(self, user_id: str, doc_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(user_id, doc_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, user_id: str, doc_id: str, data: bytes) -> None:
+        path = self._path(user_id, doc_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so a reader never sees half a file
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+class StorageArtifactStore(ArtifactStore):
+    """Artifacts in Firebase Storage, next to the uploaded document."""
+
+    def _blob(self, user_id: str, doc_id: str):
+        return get_firebase_storage().blob(f"{user_id}/{doc_id}/{_ARTIFACT_NAME}")
+
+    def get(self, user_id: str, doc_id: str) -> Optional[bytes]:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self._blob(user_id, doc_id).download_as_bytes()
+        except NotFound:
+            return None
+
+    def put(self, user_id: str, doc_id: str, data: bytes) -> None:
+        self._blob(user_id, doc_id).upload_from_string(data, content_type="application/octet-stream")
+
+
+def _create_store() -> ArtifactStore:
+    """Builds the artifact store selected by `text_store_backend`."""
+    if config.text_store_backend == "local":
+        return LocalArtifactStore(config.text_store_dir)
+    if config.text_store_backend == "storage":
+        return StorageArtifactStore()
+    raise ValueError(f"Unknown text store backend: {config.text_store_backend}")
+
+store = _create_store()
+
+# Recently used artifacts, decompressed
+_memory = LRUCache(max_entries=config.text_store_cache_size)
+
+_counters = {"memory_hits": 0, "store_hits": 0, "misses": 0, "saves": 0, "bytes_saved": 0}
+_counters_lock = threading.Lock()
+
+# --- HELPERS ---
+
+def _count(name: str, amount: int = 1):
+    with _counters_lock:
+        _counters[name] += amount
+
+# --- FUNCTIONS ---
+
+@traced("storage")
+def save(user_id: str, doc_id: str, extracted: ExtractedText) -> TextArtifact:
+    """
+    Saves a document's extracted text, page offsets and detected sections as
+    one compressed artifact, so later steps can load them instead of
+    downloading and re-parsing the original.
+    """
+    artifact = TextArtifact(
+        text=extracted.text,
+        page_offsets=list(extracted.page_offsets),
+        sections=detect_sections(extracted.text),
+    )
+    data = _encode(artifact)
+    store.put(user_id, doc_id, data)
+    _memory.set((user_id, doc_id), artifact)
+    _count("saves")
+    _count("bytes_saved", len(data))
+    return artifact
+
+@traced("storage")
+def load(user_id: str, doc_id: str) -> Optional[TextArtifact]:
+    """Returns a document's artifact from memory or the store, or None if none was saved."""
+    artifact = _memory.get((user_id, doc_id))
+    if artifact is not None:
+        _count("memory_hits")
+        return artifact
+    data = store.get(user_id, doc_id)
+    artifact = _decode(data) if data is not None else None
+    if artifact is None:
+        _count("misses")
+        return None
+    _count("store_hits")
+    _memory.set((user_id, doc_id), artifact)
+    return artifact
+
+def clear_memory():
+    """Empties the in-process cache and resets the counters; saved artifacts stay."""
+    _memory.clear()
+    with _counters_lock:
+        for name in _counters:
+            _counters[name] = 0
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    loads = counters["memory_hits"] + counters["store_hits"] + counters["misses"]
+    return {
+        **counters,
+        "entries": len(_memory),
+        "hit_rate": (counters["memory_hits"] + counters["store_hits"]) / loads if loads else 0.0,
+    }
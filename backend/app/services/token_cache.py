@@ -0,0 +1,66 @@
+import hashlib
+import threading
+import time
+
+from app.core import firebase
+from app.core.cache import LRUCache
+from app.core.config import config
+
+# Decoded claims of verified ID tokens, keyed by the token's hash
+_cache = LRUCache(max_entries=config.auth_token_cache_size)
+
+_counters = {"verifications": 0, "failures": 0}
+_counters_lock = threading.Lock()
+
+# --- HELPERS ---
+
+def _key(token: str) -> str:
+    # Hashed, so the cache never holds usable credentials
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+def _ttl(claims: dict) -> float:
+    """How long the claims can be served from the cache: until shortly before the token expires."""
+    ttl = claims.get("exp", 0) - time.time() - config.auth_token_expiry_margin_seconds
+    if config.auth_check_revoked:
+        # Revocation is only seen when the token is verified again
+        ttl = min(ttl, config.auth_revocation_check_interval_seconds)
+    return ttl
+
+# --- FUNCTIONS ---
+
+def verify_id_token(token: str) -> dict:
+    """
+    Returns the decoded claims of a Firebase ID token. A token is verified
+    once and then served from memory until `exp` minus a safety margin, or
+    for at most `auth_revocation_check_interval_seconds` when revocation
+    checks are on. Invalid tokens raise, exactly as `auth.verify_id_token`
+    does, and are never cached.
+    """
+    key = _key(token)
+    if config.auth_token_cache_enabled:
+        claims = _cache.get(key)
+        if claims is not None:
+            return dict(claims)
+    _count("verifications")
+    try:
+        claims = firebase.get_firebase_auth().verify_id_token(token, check_revoked=config.auth_check_revoked)
+    except Exception:
+        _count("failures")
+        raise
+    ttl = _ttl(claims)
+    if config.auth_token_cache_enabled and ttl > 0:
+        _cache.set(key, dict(claims), ttl_seconds=ttl)
+    return claims
+
+def clear():
+    """Forgets every cached token, e.g. after revoking a user's sessions."""
+    _cache.clear()
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {**_cache.stats(), **counters}
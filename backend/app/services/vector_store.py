@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+from urllib.parse import unquote
+
+import numpy as np
+
+from app.core.paths import safe_path_component
+
+
+class VectorStore(ABC):
+    """
+    The storage side of retrieval. Vectors are dicts with "id", "values" and
+    "metadata" keys (the Pinecone upsert format). Each user is a namespace and
+    every vector's metadata carries its doc_id.
+    """
+
+    @abstractmethod
+    def upsert(self, user_id: str, vectors: List[dict]) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, user_id: str, doc_id: Optional[str], vector: List[float], top_k: int) -> List[dict]:
+        """Returns up to top_k matches as {"id", "score", "metadata"} dicts, best first."""
+        ...
+
+    @abstractmethod
+    def delete_document(self, user_id: str, doc_id: str) -> None:
+        ...
+
+
+class PineconeVectorStore(VectorStore):
+    """Vectors live in a Pinecone index, one namespace per user."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, user_id: str, vectors: List[dict]) -> None:
+        self.index.upsert(vectors=vectors, namespace=user_id)
+
+    def query(self, user_id: str, doc_id: Optional[str], vector: List[float], top_k: int) -> List[dict]:
+        resp = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=user_id,
+            filter={"doc_id": {"$eq": doc_id}} if doc_id else {},
+            include_metadata=True
+        )
+        return [{"id": m.id, "score": m.score, "metadata": m.metadata} for m in resp.matches]
+
+    def delete_document(self, user_id: str, doc_id: str) -> None:
+        self.index.delete(filter={"doc_id": {"$eq": doc_id}}, namespace=user_id)
+
+
+class _Document:
+    """One document's vectors: a row-normalized float32 matrix plus ids and metadata."""
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], metadata: List[dict]):
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata
+
+
+class LocalVectorStore(VectorStore):
+    """
+    An in-process store for single-node deployments and tests.
+
+    Each document is kept on disk under `<root>/<user>/<doc>/` as a
+    contiguous float32 matrix with unit-length rows (`vectors-<version>.npy`)
+    and `items.json`, which holds the ids and metadata and names the matrix
+    they belong to. Matrices are memory-mapped when read, so a top-k query is one
+    matrix-vector product (cosine similarity) over pages the OS already has
+    cached. Recently used documents stay open in a small LRU.
+    """
+
+    def __init__(self, root: str, max_open_documents: int = 256):
+        self.root = root
+        self.max_open_documents = max_open_documents
+        self._open: "OrderedDict[tuple[str, str], _Document]" = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Paths ---
+
+    def _doc_dir(self, user_id: str, doc_id: str) -> str:
+        return os.path.join(self.root, safe_path_component(user_id), safe_path_component(doc_id))
+
+    # --- Loading ---
+
+    def _load(self, user_id: str, doc_id: str) -> Optional[_Document]:
+        key = (user_id, doc_id)
+        with self._lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+            doc_dir = self._doc_dir(user_id, doc_id)
+            items_path = os.path.join(doc_dir, "items.json")
+            if not os.path.exists(items_path):
+                return None
+            # A writer may remove the matrix named by the items.json we read; the new one names the current matrix
+            for attempt in range(2):
+                with open(items_path, encoding="utf-8") as f:
+                    items = json.load(f)
+                try:
+                    matrix = np.load(os.path.join(doc_dir, items.get("vectors", "vectors.npy")), mmap_mode="r")
+                    break
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+            if len(matrix) != len(items["ids"]):
+                raise ValueError(f"Vectors and items of {doc_id!r} do not match")
+            document = _Document(matrix, items["ids"], items["metadata"])
+            self._open[key] = document
+            while len(self._open) > self.max_open_documents:
+                self._open.popitem(last=False)
+            return document
+
+    def _write(self, user_id: str, doc_id: str, document: _Document) -> None:
+        doc_dir = self._doc_dir(user_id, doc_id)
+        os.makedirs(doc_dir, exist_ok=True)
+        # The matrix goes to a new file; replacing items.json, which names it, is the single commit point
+        vectors_name = f"vectors-{uuid.uuid4().hex}.npy"
+        for name, write in (
+            (vectors_name, lambda f: np.save(f, document.matrix)),
+            ("items.json", lambda f: f.write(json.dumps(
+                {"vectors": vectors_name, "ids": document.ids, "metadata": document.metadata}
+            ).encode("utf-8"))),
+        ):
+            fd, tmp_path = tempfile.mkstemp(dir=doc_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(doc_dir, name))
+        # Older matrices, and any left by a write that crashed before its commit
+        for name in os.listdir(doc_dir):
+            if name.startswith("vectors") and name.endswith(".npy") and name != vectors_name:
+                os.remove(os.path.join(doc_dir, name))
+        self._open.pop((user_id, doc_id), None)
+
+    # --- VectorStore API ---
+
+    def upsert(self, user_id: str, vectors: List[dict]) -> None:
+        # Keyed by id, so an id repeated in one batch keeps its last vector, as in Pinecone
+        by_doc: dict[str, dict[str, dict]] = {}
+        for vector in vectors:
+            by_doc.setdefault(vector["metadata"]["doc_id"], {})[vector["id"]] = vector
+
+        with self._lock:
+            for doc_id, doc_vectors_by_id in by_doc.items():
+                doc_vectors = list(doc_vectors_by_id.values())
+                existing = self._load(user_id, doc_id)
+                ids = list(existing.ids) if existing else []
+                metadata = list(existing.metadata) if existing else []
+                rows = [np.asarray(existing.matrix)] if existing else []
+                positions = {vector_id: i for i, vector_id in enumerate(ids)}
+
+                new = np.asarray([v["values"] for v in doc_vectors], dtype=np.float32)
+                norms = np.linalg.norm(new, axis=1, keepdims=True)
+                new /= np.where(norms == 0, 1, norms)
+
+                matrix = np.concatenate(rows) if rows else np.empty((0, new.shape[1]), dtype=np.float32)
+                appended = []
+                for vector, row in zip(doc_vectors, new):
+                    if vector["id"] in positions:
+                        matrix[positions[vector["id"]]] = row
+                        metadata[positions[vector["id"]]] = vector["metadata"]
+                    else:
+                        positions[vector["id"]] = len(ids)
+                        ids.append(vector["id"])
+                        metadata.append(vector["metadata"])
+                        appended.append(row)
+                if appended:
+                    matrix = np.concatenate([matrix, np.asarray(appended)])
+                self._write(user_id, doc_id, _Document(np.ascontiguousarray(matrix), ids, metadata))
+
+    def query(self, user_id: str, doc_id: Optional[str], vector: List[float], top_k: int) -> List[dict]:
+        if doc_id:
+            doc_ids = [doc_id]
+        else:
+            user_dir = os.path.join(self.root, safe_path_component(user_id))
+            doc_ids = [unquote(d) for d in os.listdir(user_dir)] if os.path.isdir(user_dir) else []
+
+        query_vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector /= norm
+
+        candidates = []
+        for candidate_doc in doc_ids:
+            document = self._load(user_id, candidate_doc)
+            if document is None or not document.ids:
+                continue
+            scores = document.matrix @ query_vector
+            k = min(top_k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            candidates.extend(
+                {"id": document.ids[i], "score": float(scores[i]), "metadata": document.metadata[i]}
+                for i in best
+            )
+        candidates.sort(key=lambda m: m["score"], reverse=True)
+        return candidates[:top_k]
+
+    def delete_document(self, user_id: str, doc_id: str) -> None:
+        with self._lock:
+            self._open.pop((user_id, doc_id), None)
+            shutil.rmtree(self._doc_dir(user_id, doc_id), ignore_errors=True)
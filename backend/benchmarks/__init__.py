@@ -0,0 +1,24 @@
+"""
+Benchmarks: run the backend's code paths against local stand-ins for the
+external services so results do not depend on network or API quotas.
+
+Run from the backend directory, e.g. `python -m benchmarks.bench_llm_concurrency`.
+"""
+
+import os
+import tempfile
+
+# The app's settings require these at import time. Benchmarks never talk to the
+# real services, so placeholder values are enough (and shadow any local .env).
+for _name in (
+    "GOOGLE_API_KEY",
+    "PINECONE_API_KEY",
+    "PINECONE_ENVIRONMENT",
+    "PINECONE_INDEX_NAME",
+    "FIREBASE_STORAGE_BUCKET",
+):
+    os.environ.setdefault(_name, "benchmark")
+
+# Keep vectors in a throwaway local store instead of connecting to Pinecone
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", os.path.join(tempfile.gettempdir(), "benchmark_vectors"))
@@ -0,0 +1,111 @@
+"""
+Chunk count and retrieval quality of the structure-aware chunker compared
+with the previous fixed 500-character slicing, on the sample contracts in
+benchmarks/data.
+
+Each question in data/questions.json comes with a verbatim answer span. A
+question counts as answered at k when one of the top-k retrieved chunks
+contains the whole span. Retrieval uses the hashed bag-of-words fake
+embeddings, so absolute numbers are lower than with Gemini embeddings, but
+the comparison between chunkers holds. Every document is also run with its
+lines hard-wrapped at 90 columns, which is how PDF extraction returns text.
+
+    python -m benchmarks.bench_chunking
+"""
+
+import argparse
+import json
+import re
+import textwrap
+from pathlib import Path
+
+from benchmarks.fakes import FakeEmbeddings
+from app.core.config import config
+from app.services.chunking_service import chunk_text, estimate_tokens
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def fixed_chunks(text: str) -> list[str]:
+    """The previous chunker."""
+    return [text[i:i+500] for i in range(0, len(text), 500)]
+
+
+def structured_chunks(text: str) -> list[str]:
+    return [c.text for c in chunk_text(text)]
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def evaluate(chunks: list[str], questions: list[dict], embeddings: FakeEmbeddings, ks: list[int]) -> dict:
+    vectors = [embeddings.vector(c) for c in chunks]
+    normalized = [normalize(c) for c in chunks]
+    hits = {k: 0 for k in ks}
+    for item in questions:
+        query = embeddings.vector(item["question"])
+        ranked = sorted(
+            range(len(chunks)),
+            key=lambda i: sum(a * b for a, b in zip(query, vectors[i])),
+            reverse=True,
+        )
+        answer = normalize(item["answer"])
+        for k in ks:
+            if any(answer in normalized[i] for i in ranked[:k]):
+                hits[k] += 1
+    return {k: hits[k] / len(questions) for k in ks}
+
+
+def wrap(text: str) -> str:
+    return "\n".join(textwrap.fill(line, 90) for line in text.split("\n"))
+
+
+def main(args):
+    questions = json.loads((DATA_DIR / "questions.json").read_text())
+    embeddings = FakeEmbeddings(dim=1024)
+    ks = [1, 3, 5]
+    strategies = (
+        ("fixed 500 chars", fixed_chunks, 5),
+        ("structure-aware", structured_chunks, config.retrieval_top_k),
+    )
+    print(
+        f"structure-aware: target={config.chunk_target_tokens} tokens, "
+        f"overlap={config.chunk_overlap_tokens} tokens, top_k={config.retrieval_top_k}"
+    )
+    header = f"{'document':<34}{'chunker':<18}{'chunks':>7}{'avg tok':>8}" + "".join(f"{'hit@' + str(k):>7}" for k in ks) + f"{'ctx tok':>9}"
+    print(header)
+    totals = {name: {"chunks": 0, "hits": {k: 0.0 for k in ks}, "ctx": 0, "docs": 0} for name, _, _ in strategies}
+    for name in sorted(questions):
+        raw = (DATA_DIR / name).read_text()
+        for label, text in ((name, raw), (name + " (wrapped)", wrap(raw))):
+            for strategy, chunker, top_k in strategies:
+                chunks = chunker(text)
+                scores = evaluate(chunks, questions[name], embeddings, ks)
+                avg_tokens = sum(estimate_tokens(c) for c in chunks) / len(chunks)
+                # Prompt context the QA agent would receive for one question
+                context_tokens = round(avg_tokens * top_k)
+                print(
+                    f"{label:<34}{strategy:<18}{len(chunks):>7}{avg_tokens:>8.0f}"
+                    + "".join(f"{scores[k]:>7.2f}" for k in ks)
+                    + f"{context_tokens:>9}"
+                )
+                total = totals[strategy]
+                total["chunks"] += len(chunks)
+                total["ctx"] += context_tokens
+                total["docs"] += 1
+                for k in ks:
+                    total["hits"][k] += scores[k]
+    print()
+    for strategy, total in totals.items():
+        docs = total["docs"]
+        print(
+            f"{'all documents':<34}{strategy:<18}{total['chunks']:>7}{'':>8}"
+            + "".join(f"{total['hits'][k] / docs:>7.2f}" for k in ks)
+            + f"{total['ctx'] / docs:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    main(parser.parse_args())
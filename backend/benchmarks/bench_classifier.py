@@ -0,0 +1,126 @@
+"""
+Accuracy of the local document classifier against labelled documents, and
+the LLM latency it saves per document. Two sets are reported: the tuning set
+in `data/classification.jsonl`, which the weights were tuned on, and the
+held-out set in `data/classification_holdout.jsonl`, which must not be used
+for tuning. The held-out numbers are the ones to trust.
+
+For each confidence threshold the table shows the share of documents the
+classifier answers on its own (coverage), its accuracy on those, the
+accuracy of the whole pipeline when the rest go to the LLM, and the
+classification latency saved per document: coverage times the LLM latency,
+less the time the classifier itself takes.
+
+By default the LLM is assumed to be always right and to take `--llm-latency`
+seconds. With `--live` every document is also classified by the real model
+(GOOGLE_API_KEY must be set), which measures its accuracy and latency.
+
+    python -m benchmarks.bench_classifier --thresholds 0.8 0.9 0.95 0.99
+    python -m benchmarks.bench_classifier --live
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+from unittest import mock
+
+from app.core.config import config
+from app.services import classification_service, llm_service
+
+DATA = Path(__file__).parent / "data"
+SETS = {"tuning": "classification.jsonl", "held-out": "classification_holdout.jsonl"}
+
+
+def labelled_documents(name: str) -> list[tuple[str, str]]:
+    """(label, text) pairs; rows either carry their text or name a file in `data/`."""
+    rows = []
+    for line in (DATA / name).read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            row = json.loads(line)
+            text = row.get("text") or (DATA / row["file"]).read_text(encoding="utf-8")
+            rows.append((row["label"], text))
+    return rows
+
+
+def classify_locally(documents, repeat: int) -> tuple[list, float]:
+    """The predictions, and the median time (s) to classify one document."""
+    predictions = [classification_service.classify(text) for _, text in documents]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, text in documents:
+            classification_service.classify(text)
+        timings.append((time.perf_counter() - start) / len(documents))
+    return predictions, statistics.median(timings)
+
+
+async def classify_with_llm(documents) -> tuple[list[str], list[float]]:
+    labels, latencies = [], []
+    for _, text in documents:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            labels.append(await llm_service.aclassify_document(text, cache=False))
+        latencies.append(time.perf_counter() - start)
+    return labels, latencies
+
+
+def report(documents, args):
+    truth = [label for label, _ in documents]
+    predictions, local_latency = classify_locally(documents, args.repeat)
+
+    if args.live:
+        llm_labels, llm_latencies = asyncio.run(classify_with_llm(documents))
+        llm_latency = statistics.median(llm_latencies)
+        llm_correct = sum(label == expected for label, expected in zip(llm_labels, truth))
+        print(f"LLM: {llm_correct}/{len(truth)} correct, median latency {llm_latency:.3f}s")
+    else:
+        llm_labels, llm_latency = truth, args.llm_latency
+        print(f"LLM: assumed always correct, {llm_latency:.3f}s per call")
+
+    local_correct = sum(p.label == expected for p, expected in zip(predictions, truth))
+    print(f"local classifier: {local_correct}/{len(truth)} top-1 correct, "
+          f"{local_latency * 1000:.3f}ms per document\n")
+
+    print(f"{'threshold':>9}{'coverage':>10}{'local acc':>11}{'hybrid acc':>12}{'saved/doc (s)':>15}")
+    for threshold in args.thresholds:
+        with mock.patch.object(config, "local_classifier_min_confidence", threshold):
+            covered = [classification_service.confident(p) for p in predictions]
+        hybrid = [p.label if local else llm for p, local, llm in zip(predictions, covered, llm_labels)]
+        local_hits = [p.label == expected for p, local, expected in zip(predictions, covered, truth) if local]
+        coverage = sum(covered) / len(truth)
+        saved = coverage * llm_latency - local_latency
+        print(
+            f"{threshold:>9.2f}{coverage:>10.0%}"
+            f"{(sum(local_hits) / len(local_hits) if local_hits else 0):>11.0%}"
+            f"{sum(h == t for h, t in zip(hybrid, truth)) / len(truth):>12.0%}{saved:>15.3f}"
+        )
+
+    misses = [(expected, p) for p, expected in zip(predictions, truth) if p.label != expected]
+    if misses:
+        print("\nlocal mistakes:")
+        for expected, p in misses:
+            print(f"  {expected} -> {p.label} ({p.confidence:.2f})")
+
+
+def main(args):
+    # Measured with the classifier on, whatever the configured default
+    with mock.patch.object(config, "local_classifier_enabled", True):
+        for name, path in SETS.items():
+            documents = labelled_documents(path)
+            print(f"=== {name} set: {len(documents)} documents ===")
+            report(documents, args)
+            print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="assumed LLM latency without --live")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="also classify every document with the real LLM")
+    main(parser.parse_args())
@@ -0,0 +1,144 @@
+"""
+Latency of document_agent with its stages run one after the other versus
+overlapped: the upload alongside extraction and classification, and the
+embedding alongside the full analysis.
+
+Each stage is given a fixed fake latency (Storage upload, classification
+call, analysis call, embedding + upsert); text extraction is the real one,
+on a small generated PDF. The sequential row rebuilds the old graph from
+the same step functions.
+
+    python -m benchmarks.bench_document_agent --save 0.5 --classify 0.4 --analysis 1.5 --embed 1.0
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+
+import fitz
+from langgraph.graph import END, StateGraph
+
+from app.agents.document_agent import (
+    DocumentState,
+    decide_to_continue,
+    document_agent,
+    embed_and_store,
+    extract_text_and_classify,
+    get_full_analysis,
+    save_file,
+)
+from benchmarks.fakes import CANNED_ANALYSIS
+from app.services import analysis_cache, llm_service, pinecone_service, storage_service, text_store
+
+
+def build_pdf(pages: int = 5) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{i + 1}. The Tenant shall pay rent monthly in advance.")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+class Upload:
+    filename = "lease.pdf"
+
+    def __init__(self, content: bytes):
+        self.source = content
+
+    @property
+    def file(self):
+        return io.BytesIO(self.source)
+
+
+def sequential_agent():
+    """The graph as it was: save -> classify -> get_full_analysis -> embed."""
+    graph = StateGraph(DocumentState)
+    graph.add_node("save", save_file)
+    graph.add_node("classify", extract_text_and_classify)
+    graph.add_node("get_full_analysis", get_full_analysis)
+    graph.add_node("embed", embed_and_store)
+    graph.set_entry_point("save")
+    graph.add_edge("save", "classify")
+    graph.add_conditional_edges(
+        "classify",
+        lambda state: "end" if decide_to_continue(state) == "end" else "continue",
+        {"continue": "get_full_analysis", "end": END},
+    )
+    graph.add_edge("get_full_analysis", "embed")
+    graph.add_edge("embed", END)
+    return graph.compile()
+
+
+def fake_services(args, workdir: str):
+    def save_document(user_id, file, doc_id=None):
+        time.sleep(args.save)
+        return doc_id or "doc-1"
+
+    async def aclassify_document(text):
+        await asyncio.sleep(args.classify)
+        return "Lease Agreement"
+
+    async def aget_full_analysis(text, classification, on_field=None):
+        await asyncio.sleep(args.analysis)
+        return dict(CANNED_ANALYSIS)
+
+    def upsert_document(user_id, doc_id, text, page_offsets=None):
+        time.sleep(args.embed)
+        return []
+
+    return [
+        mock.patch.object(storage_service, "save_document", side_effect=save_document),
+        mock.patch.object(llm_service, "aclassify_document", side_effect=aclassify_document),
+        mock.patch.object(llm_service, "aget_full_analysis", side_effect=aget_full_analysis),
+        mock.patch.object(pinecone_service, "upsert_document", side_effect=upsert_document),
+        # Every run must pay for every stage
+        mock.patch.object(analysis_cache, "lookup", return_value=None),
+        mock.patch.object(analysis_cache, "store"),
+        # Artifacts go to a temporary directory, not the working tree
+        mock.patch.object(text_store, "store", text_store.LocalArtifactStore(os.path.join(workdir, "text_store"))),
+    ]
+
+
+async def measure(agent, upload, runs: int) -> float:
+    start = time.perf_counter()
+    for i in range(runs):
+        await agent.ainvoke(DocumentState(user_id="user", file=upload, doc_id=f"doc-{i}"))
+    return (time.perf_counter() - start) / runs
+
+
+def main(args):
+    upload = Upload(build_pdf())
+    workdir = tempfile.TemporaryDirectory()
+    patches = fake_services(args, workdir.name)
+    for patch in patches:
+        patch.start()
+    try:
+        stages = {"save": args.save, "classify": args.classify, "analysis": args.analysis, "embed": args.embed}
+        print("fake stage latencies: " + "  ".join(f"{name}={value}s" for name, value in stages.items()))
+        print(f"sum of stages: {sum(stages.values()):.2f}s  "
+              f"critical path: {max(args.save, args.classify) + max(args.analysis, args.embed):.2f}s")
+        print(f"{'graph':<14}{'latency (s)':>12}{'speedup':>10}")
+        baseline = None
+        for name, agent in (("sequential", sequential_agent()), ("overlapped", document_agent)):
+            latency = asyncio.run(measure(agent, upload, args.runs))
+            baseline = baseline or latency
+            print(f"{name:<14}{latency:>12.2f}{baseline / latency:>9.2f}x")
+    finally:
+        for patch in patches:
+            patch.stop()
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--save", type=float, default=0.5)
+    parser.add_argument("--classify", type=float, default=0.4)
+    parser.add_argument("--analysis", type=float, default=1.5)
+    parser.add_argument("--embed", type=float, default=1.0)
+    parser.add_argument("--runs", type=int, default=3)
+    main(parser.parse_args())
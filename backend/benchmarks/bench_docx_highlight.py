@@ -0,0 +1,101 @@
+"""
+DOCX highlighting throughput: concurrent `highlight_service.highlight_text`
+jobs on .docx files, which highlight the matched runs and render the PDF
+in-process, versus the old path (whole-paragraph highlighting, save, then
+one `pandoc` subprocess per job).
+
+The documents are built from the sample agreements, with every paragraph
+split into several runs so matches cross run boundaries. The old path is
+only timed when pandoc is installed.
+
+    python -m benchmarks.bench_docx_highlight --jobs 16 --concurrency 1 4 8
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from docx import Document
+
+from benchmarks.bench_highlight import sample_highlights
+from app.services import highlight_service
+
+DATA = Path(__file__).parent / "data"
+
+
+def legacy_highlight_docx(input_path: str, output_path: str, highlights: list[str]) -> str:
+    """`highlight_service.highlight_text` for DOCX files before in-process rendering."""
+    doc = Document(input_path)
+    for para in doc.paragraphs:
+        for text_block in highlights:
+            clean_text_block = re.sub(r'\s+', ' ', text_block).strip()
+            sentences = re.split(r'(?<=[.?!])\s+', clean_text_block)
+            for sentence in sentences:
+                sentence = sentence.strip()
+                if len(sentence) > 2 and sentence.lower() in para.text.lower():
+                    for run in para.runs:
+                        run.font.highlight_color = 7
+    doc.save(output_path)
+    pdf_output_path = output_path.replace(".docx", ".pdf")
+    subprocess.run(["pandoc", output_path, "-o", pdf_output_path], check=True, timeout=60)
+    return pdf_output_path
+
+
+def build_docx(path: str):
+    """The sample agreements, one paragraph per block, each split into runs of a few words."""
+    text = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(DATA.glob("*.txt")))
+    doc = Document()
+    for block in re.split(r"\n\s*\n", text):
+        words = re.sub(r"\s+", " ", block).strip().split(" ")
+        para = doc.add_paragraph()
+        for i in range(0, len(words), 6):
+            run = para.add_run(" ".join(words[i:i + 6]) + " ")
+            run.bold = (i // 6) % 3 == 0
+    doc.save(path)
+
+
+def throughput(fn, source: str, tmp: str, highlights: list[str], jobs: int, concurrency: int) -> float:
+    """Jobs per second for `jobs` highlighting jobs run `concurrency` at a time."""
+    def job(i: int):
+        output = os.path.join(tmp, f"highlighted_{concurrency}_{i}.docx")
+        os.remove(fn(source, output, highlights))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(job, range(jobs)))
+    return jobs / (time.perf_counter() - start)
+
+
+def main(args):
+    highlights = sample_highlights(args.highlights)
+    pandoc = shutil.which("pandoc")
+    print(f"jobs={args.jobs}  highlights={len(highlights)}  cpus={os.cpu_count()}")
+    if not pandoc:
+        print("pandoc is not installed: the old path fails with RuntimeError, so only the new path is timed")
+    print(f"{'concurrency':>12}{'legacy (jobs/s)':>17}{'in-process (jobs/s)':>21}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "agreements.docx")
+        build_docx(source)
+        # Warm up imports and MuPDF's font loading
+        os.remove(highlight_service.highlight_text(source, os.path.join(tmp, "warm.docx"), highlights))
+        for concurrency in args.concurrency:
+            new = throughput(highlight_service.highlight_text, source, tmp, highlights, args.jobs, concurrency)
+            if pandoc:
+                legacy = throughput(legacy_highlight_docx, source, tmp, highlights, args.jobs, concurrency)
+                print(f"{concurrency:>12}{legacy:>17.2f}{new:>21.2f}{new / legacy:>8.1f}x")
+            else:
+                print(f"{concurrency:>12}{'-':>17}{new:>21.2f}{'-':>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--highlights", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+"""
+Embedding and upsert time for `pinecone_service.upsert_document` against a
+local stand-in index, compared with the previous one-request-per-chunk path.
+
+    python -m benchmarks.bench_embedding_upsert --pages 10 60 200
+"""
+
+import argparse
+import time
+
+from benchmarks.fakes import FakeEmbeddings, FakeIndex
+from app.core.config import config
+from app.services import pinecone_service
+from app.services.vector_store import PineconeVectorStore
+
+CHARS_PER_PAGE = 3000
+PARAGRAPH = (
+    "The Receiving Party shall hold all Confidential Information in strict confidence "
+    "and shall not disclose it to any third party without prior written consent. "
+)
+
+
+def serial_upsert(user_id: str, doc_id: str, text: str):
+    """The previous implementation: one embed_query per chunk, one upsert request."""
+    chunks = [text[i:i+500] for i in range(0, len(text), 500)]
+    vectors = []
+    for i, chunk in enumerate(chunks):
+        vectors.append({
+            "id": f"{doc_id}_{i}",
+            "values": pinecone_service.embeddings_model.embed_query(chunk),
+            "metadata": {"user_id": user_id, "doc_id": doc_id, "text": chunk},
+        })
+    pinecone_service.store.index.upsert(vectors=vectors, namespace=user_id)
+
+
+def run(name: str, upsert, text: str, args) -> float:
+    embeddings = FakeEmbeddings(dim=args.dim, latency=args.embed_latency, per_text_latency=args.per_text_latency)
+    index = FakeIndex(latency=args.upsert_latency, per_vector_latency=args.per_vector_latency)
+    pinecone_service.embeddings_model = embeddings
+    pinecone_service.store = PineconeVectorStore(index)
+
+    start = time.perf_counter()
+    upsert("bench-user", "bench-doc", text)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<22}{elapsed:>9.2f}s{embeddings.requests:>10}{index.upsert_requests:>9}"
+        f"{index.max_request_bytes / 1e6:>12.2f}{index.vector_count():>9}"
+    )
+    return elapsed
+
+
+def main(args):
+    print(
+        f"embed latency={args.embed_latency}s/request + {args.per_text_latency}s/text, "
+        f"upsert latency={args.upsert_latency}s/request + {args.per_vector_latency}s/vector, dim={args.dim}"
+    )
+    print(
+        f"batch size={config.embedding_batch_size}, concurrent batches={config.embedding_max_concurrent_batches}, "
+        f"upsert batch={config.pinecone_upsert_batch_size} vectors / {config.pinecone_upsert_max_bytes / 1e6:.1f} MB"
+    )
+    for pages in args.pages:
+        text = (PARAGRAPH * (pages * CHARS_PER_PAGE // len(PARAGRAPH) + 1))[: pages * CHARS_PER_PAGE]
+        print(f"\n{pages} pages ({len(text):,} chars)")
+        print(f"{'path':<22}{'time':>10}{'embed req':>10}{'upserts':>9}{'max req MB':>12}{'vectors':>9}")
+        before = run("serial (previous)", serial_upsert, text, args)
+        after = run("batched + pipelined", pinecone_service.upsert_document, text, args)
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 60, 200])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--per-text-latency", type=float, default=0.0005)
+    parser.add_argument("--upsert-latency", type=float, default=0.03)
+    parser.add_argument("--per-vector-latency", type=float, default=0.0002)
+    main(parser.parse_args())
@@ -0,0 +1,300 @@
+"""
+End-to-end latency, throughput and memory of the real `/analyze-stream` and
+`/ask` code paths, against in-process stand-ins for Gemini, the embedding
+model, Pinecone, Firestore and Storage.
+
+Requests go through the FastAPI app (routes, main_agent and every sub-agent,
+checkpointing, extraction, highlighting, chunking and retrieval); only the
+external calls are faked, each with a fixed latency. The sample contracts in
+`data/` are uploaded as TXT, PDF and DOCX. For each workload and concurrency
+level the table shows p50/p95 request latency, throughput and the peak
+Python heap (tracemalloc) while the level ran.
+
+Nothing is random, so with the same settings the numbers are comparable
+between commits: save a run with `--save` and pass it to `--compare` later.
+
+    python -m benchmarks.bench_end_to_end --levels 1 4 16 --save before.json
+    python -m benchmarks.bench_end_to_end --levels 1 4 16 --compare before.json
+
+`--no-local-classifier` sends every upload's classification to the LLM, and
+`--fused` then classifies and analyzes in one call.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import docx
+import fitz
+import httpx
+
+from benchmarks.fakes import FakeBucket, FakeEmbeddings, FakeFirestore, FakeIndex, FakeLLM
+from app.agents import main_agent as main_agent_module
+from app.api.v1.dependencies import get_current_user
+from app.core.checkpoint import SQLiteSaver
+from app.core.config import config
+from app.main import app
+from app.services import llm_service, pinecone_service, storage_service, text_store
+from app.services.vector_store import PineconeVectorStore
+
+DATA = Path(__file__).parent / "data"
+USER_ID = "benchmark-user"
+FORMATS = ("txt", "pdf", "docx")
+CONTENT_TYPES = {
+    "txt": "text/plain",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+# --- Sample Documents ---
+
+def _pdf(text: str) -> bytes:
+    doc = fitz.open()
+    lines = text.splitlines()
+    for start in range(0, len(lines), 40):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), "\n".join(lines[start:start + 40]), fontsize=9)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+def _docx(text: str) -> bytes:
+    document = docx.Document()
+    for paragraph in text.split("\n\n"):
+        document.add_paragraph(paragraph.strip())
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def sample_documents() -> dict[str, list[tuple[str, bytes]]]:
+    """The sample contracts as (name, content) pairs, per format."""
+    documents = {fmt: [] for fmt in FORMATS}
+    for path in sorted(DATA.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        documents["txt"].append((path.stem, text.encode("utf-8")))
+        documents["pdf"].append((path.stem, _pdf(text)))
+        documents["docx"].append((path.stem, _docx(text)))
+    return documents
+
+
+# --- Fake Services ---
+
+def fake_services(args, workdir: str):
+    """Patches that swap every external service for its in-process fake."""
+    db = FakeFirestore()
+    bucket = FakeBucket(keep_data=True)
+    # The compiled graph holds its own reference to the checkpointer
+    saver = SQLiteSaver(os.path.join(workdir, "checkpoints.db"))
+    return [
+        mock.patch.object(llm_service, "llm", FakeLLM(args.llm_latency, args.llm_per_token_latency)),
+        mock.patch.object(pinecone_service, "embeddings_model", FakeEmbeddings(
+            latency=args.embedding_latency, per_text_latency=args.embedding_per_text_latency,
+        )),
+        mock.patch.object(pinecone_service, "store", PineconeVectorStore(FakeIndex(latency=args.vector_latency))),
+        mock.patch.object(storage_service, "get_firestore_client", return_value=db),
+        mock.patch.object(storage_service, "get_firebase_storage", return_value=bucket),
+        # Every upload must pay for the whole pipeline
+        mock.patch.object(config, "analysis_cache_enabled", False),
+        mock.patch.object(config, "llm_cache_enabled", False),
+        mock.patch.object(config, "tracing_save_traces", False),
+        mock.patch.object(config, "local_classifier_enabled", not args.no_local_classifier),
+        mock.patch.object(config, "fused_analysis_enabled", args.fused),
+        mock.patch.object(config, "checkpoint_upload_dir", os.path.join(workdir, "uploads")),
+        mock.patch.object(text_store, "store", text_store.LocalArtifactStore(os.path.join(workdir, "text_store"))),
+        mock.patch.object(main_agent_module, "checkpointer", saver),
+        mock.patch.object(main_agent_module.main_agent, "checkpointer", saver),
+        mock.patch.dict(app.dependency_overrides, {get_current_user: lambda: {"uid": USER_ID}}),
+    ]
+
+# Each request gets its own filename: highlighting downloads the original
+# to the temp dir under its filename, as separate users' uploads would be
+_uploads = 0
+
+async def analyze(client: httpx.AsyncClient, fmt: str, name: str, content: bytes) -> str:
+    """Uploads a document to /analyze-stream and returns its doc_id."""
+    global _uploads
+    _uploads += 1
+    files = {"file": (f"{name}-{_uploads}.{fmt}", content, CONTENT_TYPES[fmt])}
+    response = await client.post("/api/v1/analyze-stream", files=files)
+    response.raise_for_status()
+    final = json.loads(response.text.strip().split("data: ")[-1])
+    if final.get("percentage") != 100:
+        raise RuntimeError(final.get("message"))
+    return final["data"]["doc_id"]
+
+async def ask(client: httpx.AsyncClient, doc_id: str, question: str):
+    response = await client.post("/api/v1/ask", data={"doc_id": doc_id, "question": question})
+    response.raise_for_status()
+
+
+# --- Measurement ---
+
+async def measure(jobs: list, concurrency: int) -> dict:
+    """Runs the jobs (coroutine functions) on `concurrency` workers and summarizes them."""
+    latencies, errors = [], 0
+    pending = iter(jobs)
+
+    async def worker():
+        nonlocal errors
+        for job in pending:
+            start = time.perf_counter()
+            try:
+                await job()
+            except Exception as e:
+                errors += 1
+                print(f"request failed: {e}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(jobs),
+        "errors": errors,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        "throughput": len(latencies) / elapsed,
+        "peak_mb": tracemalloc.get_traced_memory()[1] / 2**20,
+    }
+
+async def run(args, documents: dict) -> list[dict]:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for fmt in args.formats:
+            for concurrency in args.levels:
+                count = max(concurrency * args.requests_per_worker, len(documents[fmt]))
+                jobs = [
+                    (lambda d=documents[fmt][i % len(documents[fmt])]: analyze(client, fmt, *d))
+                    for i in range(count)
+                ]
+                results.append({"workload": f"analyze-stream {fmt}", "concurrency": concurrency,
+                                **await measure(jobs, concurrency)})
+                print_row(results[-1])
+
+        # One analyzed copy of each contract to ask about
+        questions = json.loads((DATA / "questions.json").read_text(encoding="utf-8"))
+        targets = []
+        for name, content in documents["txt"]:
+            doc_id = await analyze(client, "txt", name, content)
+            targets.extend((doc_id, item["question"]) for item in questions.get(f"{name}.txt", []))
+        for concurrency in args.levels:
+            count = max(concurrency * args.requests_per_worker, len(targets))
+            jobs = [(lambda t=targets[i % len(targets)]: ask(client, *t)) for i in range(count)]
+            results.append({"workload": "ask", "concurrency": concurrency, **await measure(jobs, concurrency)})
+            print_row(results[-1])
+    return results
+
+
+# --- Reporting ---
+
+HEADER = f"{'workload':<22}{'conc':>5}{'reqs':>6}{'errs':>5}{'p50 (s)':>9}{'p95 (s)':>9}{'req/s':>8}{'peak MB':>9}"
+
+def _seconds(value) -> str:
+    return f"{value:.3f}" if value is not None else "-"
+
+# Rows are printed as they complete, while stdout is redirected
+_report = sys.stdout
+
+def print_row(row: dict, baseline: dict | None = None):
+    line = (
+        f"{row['workload']:<22}{row['concurrency']:>5}{row['requests']:>6}{row['errors']:>5}"
+        f"{_seconds(row['p50']):>9}{_seconds(row['p95']):>9}{row['throughput']:>8.2f}{row['peak_mb']:>9.1f}"
+    )
+    if baseline:
+        changes = []
+        for key in ("p50", "p95", "throughput", "peak_mb"):
+            if row.get(key) and baseline.get(key):
+                changes.append(f"{key} {(row[key] / baseline[key] - 1) * 100:+.0f}%")
+        line += "   vs baseline: " + ", ".join(changes)
+    print(line, file=_report, flush=True)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(args, results: list[dict], path: str):
+    saved = json.loads(Path(path).read_text(encoding="utf-8"))
+    print(f"\nchange against {path} (commit {saved['commit']}):")
+    if saved["settings"] != settings_of(args):
+        print("warning: the saved run used different settings; the numbers are not comparable")
+    baseline = {(row["workload"], row["concurrency"]): row for row in saved["results"]}
+    print(HEADER)
+    for row in results:
+        print_row(row, baseline.get((row["workload"], row["concurrency"])))
+
+def settings_of(args) -> dict:
+    """The settings that change the numbers; rows are matched by workload and level."""
+    return {key: value for key, value in vars(args).items() if key not in ("save", "compare", "formats", "levels")}
+
+
+def main(args):
+    documents = sample_documents()
+    print(
+        f"fake latencies: llm={args.llm_latency}s + {args.llm_per_token_latency * 1000:.3f}ms/token"
+        f"  embedding={args.embedding_latency}s + {args.embedding_per_text_latency * 1000:.1f}ms/text"
+        f"  vector={args.vector_latency}s"
+    )
+    print(HEADER)
+    # One log line per request would bury the table
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as workdir:
+        patches = fake_services(args, workdir)
+        for patch in patches:
+            patch.start()
+        tracemalloc.start()
+        try:
+            # The agents print every step; only the table goes to the terminal
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(run(args, documents))
+        finally:
+            tracemalloc.stop()
+            for patch in reversed(patches):
+                patch.stop()
+    print(f"max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(
+            {"commit": git_commit(), "settings": settings_of(args), "results": results}, indent=2
+        ), encoding="utf-8")
+        print(f"saved to {args.save}")
+    if args.compare:
+        compare(args, results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-per-token-latency", type=float, default=0.00002)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--embedding-per-text-latency", type=float, default=0.001)
+    parser.add_argument("--vector-latency", type=float, default=0.02)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-worker", type=int, default=2)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--no-local-classifier", action="store_true", help="classify every upload with the LLM")
+    parser.add_argument("--fused", action="store_true", help="classify and analyze in one LLM call")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="a JSON file written by --save to compare against")
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+PDF text extraction: the old single-threaded `text +=` loop with ASCII
+stripping versus `extraction_service.extract_pdf`, sequential and with the
+process pool.
+
+Test PDFs are built from the sample agreements, with a few non-ASCII
+characters (section signs, euro amounts, accented names) on every page. The
+pool is warmed up before timing, as it would be in a running server.
+
+    python -m benchmarks.bench_extraction --pages 10 100 500 --workers 4
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import fitz
+
+from app.core.config import config
+from app.services import extraction_service
+
+DATA = Path(__file__).parent / "data"
+EXTRA = "\n§ 4.2 Fees of €1 250 are payable to Zoë Müller-Françoise within 30 days."
+
+
+def legacy_extract_text(file_bytes: bytes) -> str:
+    """`storage_service.extract_text` for PDFs before the extraction service."""
+    text = ""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        for page in doc:
+            page_text = page.get_text("text", textpage=None, sort=False)
+            cleaned_text = page_text.encode('ascii', 'ignore').decode('utf-8')
+            text += cleaned_text
+    return text
+
+
+def build_pdf(pages: int) -> bytes:
+    lines = "\n".join(p.read_text(encoding="utf-8") for p in sorted(DATA.glob("*.txt"))).splitlines()
+    doc = fitz.open()
+    per_page = 45
+    for i in range(pages):
+        start = (i * per_page) % max(1, len(lines) - per_page)
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(50, 50, 560, 800),
+            "\n".join(lines[start:start + per_page]) + EXTRA,
+            fontsize=8,
+            fontname="helv",
+        )
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def best_of(repeats: int, fn, *args):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(args):
+    config.pdf_extraction_workers = args.workers
+    # Start the worker processes before timing
+    extraction_service.extract_pdf(build_pdf(2), parallel=True)
+    print(f"workers={args.workers}  cpus={os.cpu_count()}  best of {args.repeats}")
+    print(f"{'pages':>6}{'legacy (s)':>12}{'sequential (s)':>16}{'parallel (s)':>14}{'speedup':>9}{'non-ascii kept':>16}")
+    for pages in args.pages:
+        data = build_pdf(pages)
+        legacy, legacy_text = best_of(args.repeats, legacy_extract_text, data)
+        sequential, extracted = best_of(args.repeats, extraction_service.extract_pdf, data, False)
+        parallel, _ = best_of(args.repeats, extraction_service.extract_pdf, data, True)
+        non_ascii = sum(1 for c in extracted.text if ord(c) > 127)
+        print(
+            f"{pages:>6}{legacy:>12.3f}{sequential:>16.3f}{parallel:>14.3f}"
+            f"{legacy / min(sequential, parallel):>8.1f}x{non_ascii:>10} vs {sum(1 for c in legacy_text if ord(c) > 127)}"
+        )
+    extraction_service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+PDF highlighting: the old loop (one `page.search_for` per page, highlight
+and sentence) versus the single-pass engine in `highlight_service`.
+
+The PDFs are built from the sample agreements, and the highlights are
+clauses taken verbatim from them, the way the analysis returns them, plus
+a "Not Found." placeholder.
+
+    python -m benchmarks.bench_highlight --pages 10 100 300
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import fitz
+
+from benchmarks.bench_extraction import build_pdf
+from app.services import highlight_service
+
+DATA = Path(__file__).parent / "data"
+
+
+def legacy_highlight_pdf(input_path: str, output_path: str, highlights: list[str]) -> str:
+    """`highlight_service.highlight_text` for PDFs before the single-pass engine."""
+    doc = fitz.open(input_path)
+    for page in doc:
+        for text_block in highlights:
+            clean_text_block = re.sub(r'\s+', ' ', text_block).strip()
+            sentences = re.split(r'(?<=[.?!])\s+', clean_text_block)
+            for sentence in sentences:
+                sentence = sentence.strip()
+                if len(sentence) > 2:
+                    areas = page.search_for(sentence, flags=1)
+                    for area in areas:
+                        highlight = page.add_highlight_annot(area)
+                        highlight.update()
+    doc.save(output_path, garbage=4, deflate=True, clean=True)
+    return output_path
+
+
+def sample_highlights(count: int) -> list[str]:
+    """Whole paragraphs of the sample agreements, as the analysis would quote them."""
+    text = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(DATA.glob("*.txt")))
+    paragraphs = [p for p in re.split(r"\n\s*\n", text) if len(p) > 80]
+    step = max(1, len(paragraphs) // count)
+    return paragraphs[::step][:count] + ["Not Found."]
+
+
+def annotated(path: str) -> tuple[int, int]:
+    with fitz.open(path) as doc:
+        counts = [len(list(page.annots())) for page in doc]
+    return sum(counts), sum(1 for c in counts if c)
+
+
+def main(args):
+    highlights = sample_highlights(args.highlights)
+    sentences = len(highlight_service._highlight_phrases(highlights))
+    print(f"highlights={len(highlights)}  sentences={sentences}")
+    print(f"{'pages':>6}{'legacy (s)':>12}{'single-pass (s)':>17}{'speedup':>9}{'annots legacy/new':>20}{'pages hit':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            source = os.path.join(tmp, f"doc_{pages}.pdf")
+            with open(source, "wb") as f:
+                f.write(build_pdf(pages))
+            legacy_out, new_out = os.path.join(tmp, "legacy.pdf"), os.path.join(tmp, "new.pdf")
+
+            start = time.perf_counter()
+            legacy_highlight_pdf(source, legacy_out, highlights)
+            legacy = time.perf_counter() - start
+            start = time.perf_counter()
+            highlight_service.highlight_text(source, new_out, highlights)
+            single = time.perf_counter() - start
+
+            (legacy_annots, legacy_pages), (new_annots, new_pages) = annotated(legacy_out), annotated(new_out)
+            print(
+                f"{pages:>6}{legacy:>12.2f}{single:>17.2f}{legacy / single:>8.1f}x"
+                f"{f'{legacy_annots}/{new_annots}':>20}{f'{legacy_pages}/{new_pages}':>12}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--highlights", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""
+Time to import `app.main` in a fresh interpreter, which every uvicorn worker
+and every pytest session pays, and which of the external service SDKs the
+import loads. The clients are created on first use, so none should be.
+
+Each run is a new Python process. The second row also creates the LLM and
+embedding clients and the vector store after the import, as the warm-up
+hook does; the Firebase clients need real credentials and are left out.
+
+    python -m benchmarks.bench_import --runs 5 --top 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SDKS = ("firebase_admin", "google.cloud.firestore", "langchain_google_genai", "google.genai", "pinecone")
+
+SCRIPT = """
+import json, sys, time
+import benchmarks
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter() - start
+if {warm_up}:
+    from app.services import llm_service, pinecone_service
+    llm_service.get_llm()
+    pinecone_service.get_embeddings_model()
+    pinecone_service.get_store()
+print(json.dumps({{
+    "import": imported,
+    "total": time.perf_counter() - start,
+    "sdks": [name for name in {sdks!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_once(warm_up: bool) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", SCRIPT.format(warm_up=warm_up, sdks=SDKS)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_packages(top: int) -> list[tuple[int, str]]:
+    """The packages that take longest to import, by cumulative time (us) of their first import."""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import benchmarks, app.main"],
+        capture_output=True, text=True, check=True,
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if cumulative.strip().isdigit() and "." not in name and name not in ("app", "benchmarks"):
+            totals[name] = max(totals.get(name, 0), int(cumulative))
+    return sorted(((us, name) for name, us in totals.items()), reverse=True)[:top]
+
+
+def main(args):
+    print(f"{'':<28}{'median (s)':>11}{'min (s)':>9}   SDKs loaded")
+    for label, warm_up in (("import app.main", False), ("import + create clients", True)):
+        runs = [run_once(warm_up) for _ in range(args.runs)]
+        key = "total" if warm_up else "import"
+        times = [run[key] for run in runs]
+        print(
+            f"{label:<28}{statistics.median(times):>11.3f}{min(times):>9.3f}   "
+            f"{', '.join(runs[-1]['sdks']) or '-'}"
+        )
+    print("\nslowest packages to import:")
+    for us, name in slowest_packages(args.top):
+        print(f"  {us / 1e6:>7.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    main(parser.parse_args())
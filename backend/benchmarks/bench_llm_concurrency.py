@@ -0,0 +1,86 @@
+"""
+Throughput of the LLM layer against a fake model with fixed latency.
+
+Each "analysis" makes the three sequential calls a document upload makes
+(classify, full analysis, clause explanation); each "ask" makes one call.
+The blocking row calls the model synchronously on the event loop, which is
+what the routes did before the async layer.
+
+    python -m benchmarks.bench_llm_concurrency --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeLLM
+from app.core.concurrency import ConcurrencyLimiter
+from app.core.config import config
+from app.services import llm_service
+
+TEXT = "This Non-Disclosure Agreement is entered into by Acme Corp and Globex LLC. " * 40
+
+
+async def run_analysis():
+    classification = await llm_service.aclassify_document(TEXT)
+    analysis = await llm_service.aget_full_analysis(TEXT, classification)
+    await llm_service.aexplain_clauses(analysis["key_clause_discussion"])
+
+
+async def run_ask():
+    await llm_service.agenerate("Question: What is the governing law?")
+
+
+async def run_blocking_analysis():
+    # The pre-async behaviour: sync invoke straight from the event loop
+    for _ in range(3):
+        llm_service.llm.invoke(TEXT)
+
+
+async def measure(job, concurrency: int, jobs: int) -> float:
+    queue = iter(range(jobs))
+
+    async def worker():
+        for _ in queue:
+            await job()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return jobs / (time.perf_counter() - start)
+
+
+async def main(args):
+    # Every job must reach the LLM, not the reply cache
+    config.llm_cache_enabled = False
+    llm_service.llm = FakeLLM(latency=args.latency)
+    llm_service.limiter = ConcurrencyLimiter(
+        global_limit=args.global_limit, per_key_limit=args.model_limit
+    )
+    print(
+        f"fake latency={args.latency}s  global limit={args.global_limit}"
+        f"  per-model limit={args.model_limit}"
+    )
+    print(f"{'workload':<22}{'concurrency':>12}{'jobs/s':>10}{'speedup':>10}")
+    for name, job in (
+        ("analysis (blocking)", run_blocking_analysis),
+        ("analysis (async)", run_analysis),
+        ("ask (async)", run_ask),
+    ):
+        baseline = None
+        for concurrency in args.levels:
+            jobs = max(concurrency * 2, 4)
+            if name.endswith("(blocking)"):
+                jobs = min(jobs, 8)
+            throughput = await measure(job, concurrency, jobs)
+            baseline = baseline or throughput
+            print(f"{name:<22}{concurrency:>12}{throughput:>10.2f}{throughput / baseline:>9.1f}x")
+    print(f"peak in-flight LLM calls: {llm_service.limiter.peak_in_flight}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--global-limit", type=int, default=64)
+    parser.add_argument("--model-limit", type=int, default=32)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    asyncio.run(main(parser.parse_args()))
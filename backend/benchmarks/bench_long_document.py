@@ -0,0 +1,66 @@
+"""
+Wall-clock time of `aget_full_analysis` on long documents, single-pass versus
+map-reduce, against a fake model whose latency grows with prompt length.
+
+The long documents are the sample agreements repeated until they reach the
+requested size. The single-pass row raises the long-document threshold so the
+whole text goes into one prompt, which is what the service did before.
+
+    python -m benchmarks.bench_long_document --sizes 20000 60000 120000
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from benchmarks.fakes import FakeLLM
+from app.core.config import config
+from app.services import llm_service
+from app.services.chunking_service import estimate_tokens
+
+DATA = Path(__file__).parent / "data"
+CLASSIFICATION = "Non-Disclosure Agreements (NDAs)"
+
+
+def long_document(tokens: int) -> str:
+    samples = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(DATA.glob("*.txt")))
+    repeats = tokens // estimate_tokens(samples) + 1
+    return "\n\n".join([samples] * repeats)
+
+
+async def timed(text: str, threshold: int) -> tuple[float, int]:
+    config.long_document_token_threshold = threshold
+    llm_service.llm.calls = 0
+    start = time.perf_counter()
+    await llm_service.aget_full_analysis(text, CLASSIFICATION)
+    return time.perf_counter() - start, llm_service.llm.calls
+
+
+async def main(args):
+    # Every call must reach the LLM, not the reply cache
+    config.llm_cache_enabled = False
+    llm_service.llm = FakeLLM(latency=args.latency, per_token_latency=args.per_token_latency)
+    config.long_document_section_tokens = args.section_tokens
+    print(
+        f"fake latency={args.latency}s + {args.per_token_latency * 1000:.3f}ms/token"
+        f"  section size={args.section_tokens} tokens"
+    )
+    print(f"{'tokens':>8}{'single (s)':>12}{'map-reduce (s)':>16}{'calls':>7}{'speedup':>9}")
+    for size in args.sizes:
+        text = long_document(size)
+        single, _ = await timed(text, threshold=10**9)
+        sectioned, calls = await timed(text, threshold=args.section_tokens)
+        print(
+            f"{estimate_tokens(text):>8}{single:>12.2f}{sectioned:>16.2f}"
+            f"{calls:>7}{single / sectioned:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-token-latency", type=float, default=0.00002)
+    parser.add_argument("--section-tokens", type=int, default=8000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 60000, 120000])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+"""
+What the extracted-text artifact saves: loading a document's text from the
+artifact (from disk, and from the in-process cache) against extracting it
+again from the original PDF, and highlighting a PDF with and without the
+artifact's page texts to skip the pages that hold no highlight.
+
+The document is the sample contracts repeated into a PDF of `--pages`
+pages or more; the highlights sit on the last page.
+
+    python -m benchmarks.bench_text_store --pages 50 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_end_to_end import DATA, _pdf
+from app.services import extraction_service, highlight_service, text_store
+
+
+def timed(fn, repeat: int) -> float:
+    """Median seconds per call."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(args):
+    text = "\n\n".join(path.read_text(encoding="utf-8") for path in sorted(DATA.glob("*.txt")))
+    content = _pdf(text)
+    while extraction_service.extract_document(content, "contract.pdf").page_count < args.pages:
+        text += "\n\n" + text
+        content = _pdf(text)
+    extracted = extraction_service.extract_document(content, "contract.pdf")
+    last_page = extracted.text[extracted.page_offsets[-1]:]
+    highlights = [line.strip() for line in last_page.splitlines() if len(line.split()) >= 6][:3]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        text_store.store = text_store.LocalArtifactStore(os.path.join(workdir, "text_store"))
+        text_store.save("user", "doc", extracted)
+        size = os.path.getsize(text_store.store._path("user", "doc"))
+
+        def load_from_disk():
+            text_store.clear_memory()
+            text_store.load("user", "doc")
+
+        source = Path(workdir) / "contract.pdf"
+        source.write_bytes(content)
+        output = str(Path(workdir) / "highlighted.pdf")
+        artifact = text_store.load("user", "doc")
+        page_texts = [artifact.page_text(i) for i in range(len(artifact.page_offsets))]
+
+        print(f"{extracted.page_count} pages, {len(extracted.text):,} chars of text, "
+              f"{len(content):,} byte PDF, {size:,} byte artifact\n")
+        rows = [
+            ("extract from the PDF", timed(
+                lambda: extraction_service.extract_document(content, "contract.pdf"), args.repeat
+            )),
+            ("load artifact from disk", timed(load_from_disk, args.repeat)),
+            ("load artifact from memory", timed(lambda: text_store.load("user", "doc"), args.repeat)),
+            ("highlight every page", timed(
+                lambda: highlight_service.highlight_text(str(source), output, highlights), args.repeat
+            )),
+            ("highlight with page texts", timed(
+                lambda: highlight_service.highlight_text(str(source), output, highlights, page_texts), args.repeat
+            )),
+        ]
+    for label, seconds in rows:
+        print(f"{label:<28}{seconds * 1000:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
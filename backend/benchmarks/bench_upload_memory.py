@@ -0,0 +1,151 @@
+"""
+Peak memory of ingesting large uploads: the old whole-bytes path versus the
+spooled one.
+
+Each run ingests `--uploads` copies of a large "scanned" PDF (pages of
+incompressible images) concurrently: read the upload, save it to (fake)
+Storage, hash it and extract its text. The old path held the upload as
+bytes, copied it again for the Storage upload and again for extraction;
+the new path spools to a temp file, streams the Storage upload in chunks,
+hashes in chunks and opens the PDF by path. Every mode runs in a fresh
+process with the app already imported, and RSS is sampled from /proc
+(Linux only) while the uploads are processed.
+
+    python -m benchmarks.bench_upload_memory --size-mb 50 --uploads 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import fitz
+
+from benchmarks.bench_extraction import legacy_extract_text
+from benchmarks.fakes import FakeBucket, FakeFirestore
+from app.api.v1.routes import ReReadableUploadFile
+from app.services import analysis_cache, storage_service
+
+
+def build_scanned_pdf(path: str, size_mb: int):
+    doc = fitz.open()
+    image_bytes = 0
+    while image_bytes < size_mb * 1024 * 1024:
+        # Noise barely compresses, so each page carries a JPEG of a few MB
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 1200, 1200), False)
+        pixmap.samples_mv[:] = os.urandom(1200 * 1200 * 3)
+        jpeg = pixmap.tobytes("jpeg", jpg_quality=95)
+        image_bytes += len(jpeg)
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=jpeg)
+        page.insert_text((72, 72), "1. Scanned agreement page.")
+    doc.save(path)
+    doc.close()
+
+
+def make_upload(path: str):
+    from starlette.datastructures import UploadFile
+
+    # What Starlette hands the endpoint: a spooled temp file
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    with open(path, "rb") as f:
+        shutil.copyfileobj(f, spooled)
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename="scan.pdf", headers={"content-type": "application/pdf"})
+
+
+async def legacy_ingest(upload, bucket):
+    content = await upload.read()  # ReReadableUploadFile.read_content
+    saved = io.BytesIO(content).read()  # save_document
+    bucket.blob("user/doc/scan.pdf").upload_from_string(saved, content_type="application/pdf")
+    raw = io.BytesIO(content).read()  # extract_text_and_classify
+    hashlib.sha256(raw).hexdigest()
+    await asyncio.to_thread(legacy_extract_text, raw)
+
+
+async def spooled_ingest(upload, bucket):
+    readable = ReReadableUploadFile(upload)
+    await readable.read_content(upload)
+    try:
+        await asyncio.to_thread(storage_service.save_document, "user", readable)
+        with readable.file as stream:
+            analysis_cache.content_hash_file(stream)
+        await asyncio.to_thread(storage_service.extract_document, readable.source, readable.filename)
+    finally:
+        readable.close()
+
+
+class RSSSampler:
+    """Samples the process's resident set size (Linux /proc) in a background thread."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def run(mode: str, path: str, uploads: int) -> tuple[float, float]:
+    bucket = FakeBucket()
+    ingest = legacy_ingest if mode == "legacy" else spooled_ingest
+    with mock.patch.object(storage_service, "get_firebase_storage", return_value=bucket), \
+            mock.patch.object(storage_service, "get_firestore_client", return_value=FakeFirestore()):
+        files = [make_upload(path) for _ in range(uploads)]
+
+        async def main():
+            await asyncio.gather(*(ingest(f, bucket) for f in files))
+
+        before = RSSSampler.current()
+        start = time.perf_counter()
+        with RSSSampler() as sampler:
+            asyncio.run(main())
+        elapsed = time.perf_counter() - start
+    return (sampler.peak - before) / (1024 * 1024), elapsed
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scan.pdf")
+        build_scanned_pdf(path, args.size_mb)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"upload size={size_mb:.1f} MB  concurrent uploads={args.uploads}")
+        print(f"{'path':<10}{'peak RSS growth (MB)':>22}{'per upload (MB)':>17}{'time (s)':>10}")
+        context = multiprocessing.get_context("spawn")
+        for mode in ("legacy", "spooled"):
+            with context.Pool(1) as pool:
+                growth, elapsed = pool.apply(run, (mode, path, args.uploads))
+            print(f"{mode:<10}{growth:>22.1f}{growth / args.uploads:>17.1f}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--uploads", type=int, default=4)
+    main(parser.parse_args())
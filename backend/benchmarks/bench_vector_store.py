@@ -0,0 +1,51 @@
+"""
+Query latency of the local NumPy vector store for one document's vectors.
+
+    python -m benchmarks.bench_vector_store --vectors 100 300 1000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim}, top_k={args.top_k}, {args.queries} queries per size")
+    print(f"{'vectors':>8}{'p50 us':>10}{'p95 us':>10}{'upsert ms':>11}")
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalVectorStore(root)
+        for count in args.vectors:
+            doc_id = f"doc-{count}"
+            vectors = [
+                {"id": f"{doc_id}_{i}", "values": rng.standard_normal(args.dim).tolist(), "metadata": {"doc_id": doc_id, "text": "chunk"}}
+                for i in range(count)
+            ]
+            start = time.perf_counter()
+            store.upsert("bench-user", vectors)
+            upsert_ms = (time.perf_counter() - start) * 1000
+
+            queries = rng.standard_normal((args.queries, args.dim)).tolist()
+            store.query("bench-user", doc_id, queries[0], args.top_k)  # open the memory map
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                store.query("bench-user", doc_id, query, args.top_k)
+                timings.append((time.perf_counter() - start) * 1e6)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{count:>8}{statistics.median(timings):>10.0f}{p95:>10.0f}{upsert_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    main(parser.parse_args())
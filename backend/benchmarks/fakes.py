@@ -0,0 +1,282 @@
+"""In-process stand-ins for the external services used by the backend."""
+
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+CANNED_ANALYSIS = {
+    "summary": "A mutual non-disclosure agreement between Acme Corp and Globex LLC.",
+    "key_clause_discussion": "Definition of Confidential Information; Obligations; Term",
+    "risks": [
+        "Definition of Confidential Information: the definition is broad and may cover public information.",
+        "Term: the confidentiality obligation survives indefinitely.",
+    ],
+    "risk_score": 72,
+    "questions": [
+        {"question": "Who are the parties?", "answer": "Acme Corp and Globex LLC."},
+    ],
+    "highlights": {
+        "governing_law": "the laws of the State of Delaware",
+    },
+}
+
+CANNED_EXPLANATION = json.dumps({
+    "clauses": [
+        {"clause": "Term", "explanation": "How long you must keep the information secret."},
+    ]
+})
+
+
+@dataclass
+class FakeMessage:
+    content: str
+
+    def text(self) -> str:
+        return self.content
+
+
+class FakeLLM:
+    """
+    Mimics the parts of `ChatGoogleGenerativeAI` the services use. Every call
+    takes `latency` seconds plus `per_token_latency` per prompt token, and the
+    reply is picked from the prompt's contents.
+    """
+
+    def __init__(self, latency: float = 0.1, per_token_latency: float = 0.0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.calls = 0
+
+    def _latency(self, prompt: str) -> float:
+        if not self.per_token_latency:
+            return self.latency
+        return self.latency + self.per_token_latency * len(re.findall(r"\w+|[^\w\s]", prompt))
+
+    def _respond(self, prompt: str) -> FakeMessage:
+        self.calls += 1
+        if "writing the classification first" in prompt:
+            return FakeMessage(json.dumps({"classification": "General Legal Document", **CANNED_ANALYSIS}))
+        if "classify it into one of the following categories" in prompt:
+            return FakeMessage("General Legal Document")
+        if "Generate a JSON response" in prompt:
+            return FakeMessage(json.dumps(CANNED_ANALYSIS))
+        if "explain each key clause" in prompt:
+            return FakeMessage(CANNED_EXPLANATION)
+        return FakeMessage("The agreement is governed by the laws of the State of Delaware.")
+
+    def invoke(self, prompt: str) -> FakeMessage:
+        time.sleep(self._latency(prompt))
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> FakeMessage:
+        await asyncio.sleep(self._latency(prompt))
+        return self._respond(prompt)
+
+    async def astream(self, prompt: str, pieces: int = 20):
+        """Streams the same reply as `ainvoke`, spread evenly over the call's latency."""
+        reply = self._respond(prompt).content
+        size = max(1, -(-len(reply) // pieces))
+        for i in range(0, len(reply), size):
+            await asyncio.sleep(self._latency(prompt) / pieces)
+            yield FakeMessage(reply[i:i + size])
+
+
+class FakeEmbeddings:
+    """
+    Mimics `GoogleGenerativeAIEmbeddings`. Vectors are hashed bag-of-words, so
+    texts sharing words score as similar, which is enough for retrieval tests.
+    Each request costs `latency` seconds plus `per_text_latency` per text.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0, per_text_latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def vector(self, text: str) -> list[float]:
+        values = [0.0] * self.dim
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            values[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def _record(self, count: int):
+        with self._lock:
+            self.requests += 1
+            self.texts += count
+        time.sleep(self.latency + self.per_text_latency * count)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._record(1)
+        return self.vector(text)
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        self._record(len(texts))
+        return [self.vector(t) for t in texts]
+
+
+@dataclass
+class FakeMatch:
+    id: str
+    score: float
+    metadata: Optional[dict]
+
+
+@dataclass
+class FakeQueryResponse:
+    matches: list = field(default_factory=list)
+
+
+class FakeIndex:
+    """
+    An in-memory stand-in for a Pinecone index handle. Supports `upsert` and
+    `query` with `$eq` metadata filters, and records request sizes.
+    """
+
+    def __init__(self, latency: float = 0.0, per_vector_latency: float = 0.0):
+        self.latency = latency
+        self.per_vector_latency = per_vector_latency
+        self.namespaces: dict[str, dict[str, dict]] = {}
+        self.upsert_requests = 0
+        self.max_request_bytes = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: list[dict], namespace: str = ""):
+        time.sleep(self.latency + self.per_vector_latency * len(vectors))
+        request_bytes = len(json.dumps(vectors))
+        with self._lock:
+            self.upsert_requests += 1
+            self.max_request_bytes = max(self.max_request_bytes, request_bytes)
+            store = self.namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                store[vector["id"]] = vector
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, namespace="", filter=None, include_metadata=False, **kwargs):
+        time.sleep(self.latency)
+        conditions = {k: v["$eq"] for k, v in (filter or {}).items()}
+        scored = []
+        for item in self.namespaces.get(namespace, {}).values():
+            metadata = item["metadata"]
+            if any(metadata.get(k) != v for k, v in conditions.items()):
+                continue
+            score = sum(a * b for a, b in zip(vector, item["values"]))
+            scored.append(FakeMatch(item["id"], score, metadata if include_metadata else None))
+        scored.sort(key=lambda m: m.score, reverse=True)
+        return FakeQueryResponse(matches=scored[:top_k])
+
+    def vector_count(self) -> int:
+        return sum(len(store) for store in self.namespaces.values())
+
+
+class FakeBlob:
+    """
+    Mimics a Cloud Storage blob. Uploads are read chunk by chunk when
+    `chunk_size` is set, and discarded unless `keep_data` is on, in which
+    case they can be downloaded again.
+    """
+
+    def __init__(self, name: str, keep_data: bool = False):
+        self.name = name
+        self.keep_data = keep_data
+        self.chunk_size = None
+        self.size = 0
+        self.data = b""
+        self.public_url = f"https://storage.example/{name}"
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.size = len(data)
+        if self.keep_data:
+            self.data = bytes(data)
+
+    def upload_from_file(self, stream, size=None, content_type=None):
+        read_size = self.chunk_size or -1
+        kept = []
+        self.size = 0
+        while chunk := stream.read(read_size):
+            self.size += len(chunk)
+            if self.keep_data:
+                kept.append(chunk)
+            if read_size == -1:
+                break
+        self.data = b"".join(kept)
+
+    def upload_from_filename(self, filename, content_type=None):
+        with open(filename, "rb") as f:
+            self.upload_from_file(f)
+
+    def download_as_bytes(self) -> bytes:
+        return self.data
+
+    def download_to_filename(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.data)
+
+    def make_public(self):
+        pass
+
+
+class FakeBucket:
+    def __init__(self, keep_data: bool = False):
+        self.keep_data = keep_data
+        self.blobs: dict[str, FakeBlob] = {}
+        self._lock = threading.Lock()
+
+    def blob(self, name: str) -> FakeBlob:
+        with self._lock:
+            return self.blobs.setdefault(name, FakeBlob(name, self.keep_data))
+
+
+@dataclass
+class FakeSnapshot:
+    data: Optional[dict]
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return dict(self.data) if self.data is not None else None
+
+
+class FakeFirestore:
+    """Accepts any collection/document chain and keeps what is `set` in a dict."""
+
+    def __init__(self):
+        self.documents: dict[str, dict] = {}
+
+    def collection(self, name: str) -> "_FakeRef":
+        return _FakeRef(self, name)
+
+
+class _FakeRef:
+    def __init__(self, db: FakeFirestore, path: str):
+        self.db = db
+        self.path = path
+
+    def collection(self, name: str) -> "_FakeRef":
+        return _FakeRef(self.db, f"{self.path}/{name}")
+
+    def document(self, name: str) -> "_FakeRef":
+        return _FakeRef(self.db, f"{self.path}/{name}")
+
+    def set(self, data: dict, merge: bool = False):
+        if merge:
+            self.db.documents.setdefault(self.path, {}).update(data)
+        else:
+            self.db.documents[self.path] = dict(data)
+
+    def get(self) -> FakeSnapshot:
+        return FakeSnapshot(self.db.documents.get(self.path))
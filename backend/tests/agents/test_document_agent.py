@@ -0,0 +1,114 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from app.agents.document_agent import DocumentState, document_agent
+from app.core.config import config
+from app.services import analysis_cache, llm_service, pinecone_service, storage_service
+from app.services.extraction_service import ExtractedText
+
+
+class _Upload:
+    filename = "lease.pdf"
+    source = b"%PDF"
+
+    @property
+    def file(self):
+        return io.BytesIO(self.source)
+
+
+@pytest.fixture
+def services(mocker):
+    """Fake services that record which stages were running at the same time."""
+    started = {name: threading.Event() for name in ("save", "classify", "analysis", "embed")}
+    overlaps = {}
+
+    def save_document(user_id, file, doc_id=None):
+        started["save"].set()
+        overlaps["save_with_classify"] = started["classify"].wait(timeout=2)
+        return doc_id
+
+    async def aclassify_document(text):
+        started["classify"].set()
+        return "Lease Agreement"
+
+    async def aget_full_analysis(text, classification, on_field=None):
+        started["analysis"].set()
+        for _ in range(200):
+            if started["embed"].is_set():
+                break
+            await asyncio.sleep(0.01)
+        return {"summary": "A lease.", "risks": []}
+
+    def upsert_document(user_id, doc_id, text, page_offsets=None):
+        started["embed"].set()
+        overlaps["embed_with_analysis"] = started["analysis"].wait(timeout=2)
+        overlaps["embedded_doc_id"] = doc_id
+        return []
+
+    mocker.patch.object(storage_service, "save_document", side_effect=save_document)
+    mocker.patch.object(storage_service, "extract_document", return_value=ExtractedText("Lease text", [0]))
+    mocker.patch.object(llm_service, "aclassify_document", side_effect=aclassify_document)
+    mocker.patch.object(llm_service, "aget_full_analysis", side_effect=aget_full_analysis)
+    mocker.patch.object(analysis_cache, "lookup", return_value=None)
+    mocker.patch.object(analysis_cache, "store")
+    upsert = mocker.patch.object(pinecone_service, "upsert_document", side_effect=upsert_document)
+    return {"overlaps": overlaps, "upsert": upsert}
+
+
+def test_independent_stages_run_side_by_side(services):
+    state = DocumentState(user_id="user", file=_Upload(), doc_id="doc-1")
+
+    result = asyncio.run(document_agent.ainvoke(state))
+
+    assert services["overlaps"] == {
+        "save_with_classify": True,
+        "embed_with_analysis": True,
+        "embedded_doc_id": "doc-1",
+    }
+    assert result["summary"] == "A lease."
+    assert result["classification"] == "Lease Agreement"
+    assert result["text"] == "Lease text"
+
+
+def test_unsupported_documents_are_not_embedded(services, mocker):
+    mocker.patch.object(llm_service, "aclassify_document", return_value="Unsupported Document Type")
+    mocker.patch.object(storage_service, "save_document", return_value="doc-1")
+
+    result = asyncio.run(document_agent.ainvoke(DocumentState(user_id="user", file=_Upload())))
+
+    assert result["doc_id"] == "doc-1"
+    assert "summary" not in result
+    services["upsert"].assert_not_called()
+
+
+def test_fused_mode_analyzes_in_the_classification_call(services, mocker, monkeypatch):
+    monkeypatch.setattr(config, "fused_analysis_enabled", True)
+    fused = mocker.patch.object(
+        llm_service, "aclassify_and_analyze", return_value=("Lease Agreement", {"summary": "A lease.", "risks": []})
+    )
+    classify = mocker.patch.object(llm_service, "aclassify_document")
+    analyze = mocker.patch.object(llm_service, "aget_full_analysis")
+    mocker.patch.object(storage_service, "save_document", return_value="doc-1")
+
+    result = asyncio.run(document_agent.ainvoke(DocumentState(user_id="user", file=_Upload())))
+
+    fused.assert_awaited_once()
+    classify.assert_not_called()
+    analyze.assert_not_called()
+    assert result["classification"] == "Lease Agreement"
+    assert result["summary"] == "A lease."
+    services["upsert"].assert_called_once()
+
+
+def test_fused_mode_falls_back_to_two_calls(services, mocker, monkeypatch):
+    monkeypatch.setattr(config, "fused_analysis_enabled", True)
+    mocker.patch.object(llm_service, "aclassify_and_analyze", side_effect=ValueError("no JSON"))
+    mocker.patch.object(storage_service, "save_document", return_value="doc-1")
+
+    result = asyncio.run(document_agent.ainvoke(DocumentState(user_id="user", file=_Upload())))
+
+    assert result["classification"] == "Lease Agreement"
+    assert result["summary"] == "A lease."
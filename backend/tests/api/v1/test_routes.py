@@ -1,5 +1,14 @@
+import asyncio
+import io
+import json
+import os
+
+from fastapi import UploadFile
 from fastapi.testclient import TestClient
 
+from app.api.v1.routes import ReReadableUploadFile
+from app.core.config import config
+
 
 def test_analyze_document(client: TestClient, mock_agents, mock_storage):
     """Tests the /analyze endpoint which uploads and runs a full analysis."""
@@ -36,3 +45,128 @@ def test_get_history(client: TestClient, mock_storage):
     json_response = response.json()
     assert "history" in json_response
     assert isinstance(json_response["history"], list)
+
+
+def test_history_is_paginated(client: TestClient, mock_storage, mocker):
+    """Tests that /history passes the page size and cursor through and returns the next cursor."""
+    mock_storage["history"].return_value = ([{"doc_id": "doc-2"}], "2025-01-01T00:00:00+00:00")
+
+    response = client.get("/api/v1/history", params={"limit": 1, "after": "2025-02-01T00:00:00+00:00"})
+
+    assert response.status_code == 200
+    assert response.json() == {"history": [{"doc_id": "doc-2"}], "next_cursor": "2025-01-01T00:00:00+00:00"}
+    mock_storage["history"].assert_called_once_with(
+        "test-user-123", limit=1, after="2025-02-01T00:00:00+00:00"
+    )
+    assert client.get("/api/v1/history", params={"limit": 0}).status_code == 422
+
+
+def test_history_item_returns_full_analysis_or_404(client: TestClient, mocker):
+    """Tests the /history/{doc_id} endpoint."""
+    get_analysis = mocker.patch("app.services.storage_service.get_analysis")
+    get_analysis.return_value = {"doc_id": "doc-1", "risks": ["Auto-renewal"]}
+
+    response = client.get("/api/v1/history/doc-1")
+    assert response.status_code == 200
+    assert response.json()["risks"] == ["Auto-renewal"]
+    get_analysis.assert_called_once_with("test-user-123", "doc-1")
+
+    get_analysis.return_value = None
+    assert client.get("/api/v1/history/missing").status_code == 404
+
+
+def test_analyze_stream_sends_fields_before_result(client: TestClient, mocker):
+    """Tests that /analyze-stream forwards partial analysis fields as typed events."""
+    async def fake_astream(input_dict, **kwargs):
+        yield (("process_document:1",), "updates", {"save": {"doc_id": "doc-1"}})
+        yield (("process_document:1",), "custom", {"type": "analysis_field", "field": "summary", "value": "An NDA."})
+        yield ((), "updates", {"process_document": {"doc_id": "doc-1", "document_analysis": {"summary": "An NDA."}}})
+        yield ((), "updates", {"save_to_firestore": None})
+
+    mocker.patch("app.agents.main_agent.main_agent.astream", side_effect=fake_astream)
+    files = {"file": ("test.pdf", b"This is a dummy pdf file.", "application/pdf")}
+
+    response = client.post("/api/v1/analyze-stream", files=files)
+    assert response.status_code == 200
+    messages = response.text.strip().split("\n\n")
+
+    assert json.loads(messages[0][len("data: "):])["message"] == "Saving file..."
+    assert messages[1].startswith("event: analysis_field\ndata: ")
+    assert json.loads(messages[1].split("data: ", 1)[1])["value"] == "An NDA."
+    final = json.loads(messages[-1][len("data: "):])
+    assert final["percentage"] == 100
+    assert final["data"]["doc_id"] == "doc-1"
+
+
+def test_upload_over_limit_is_rejected(client: TestClient, mock_agents, monkeypatch):
+    """Tests that /analyze stops reading an upload once it exceeds the size limit."""
+    monkeypatch.setattr(config, "max_upload_bytes", 1024)
+    monkeypatch.setattr(config, "upload_chunk_bytes", 256)
+    files = {"file": ("big.pdf", b"x" * 4096, "application/pdf")}
+
+    response = client.post("/api/v1/analyze", files=files)
+    assert response.status_code == 413
+    mock_agents["main"].assert_not_called()
+
+
+def test_large_upload_is_spooled_to_disk(monkeypatch):
+    """Tests that uploads over the spool threshold are kept in a temp file, not in memory."""
+    monkeypatch.setattr(config, "upload_spool_threshold_bytes", 1000)
+    monkeypatch.setattr(config, "upload_chunk_bytes", 256)
+    content = bytes(range(256)) * 20
+    upload = UploadFile(file=io.BytesIO(content), filename="scan.pdf")
+
+    readable = ReReadableUploadFile(upload)
+    asyncio.run(readable.read_content(upload))
+
+    assert readable.size_bytes == len(content)
+    assert os.path.exists(readable.source)
+    with readable.file as first, readable.file as second:
+        assert first.read() == second.read() == content
+    readable.close()
+    assert readable.file is None
+
+
+def test_submit_job_returns_immediately(client: TestClient, mocker):
+    """Tests that /jobs queues the upload and answers with the job ID."""
+    job = mocker.Mock(id="job-1", status="queued")
+    submit = mocker.patch("app.services.job_queue.submit", return_value=job)
+    files = {"file": ("test.pdf", b"This is a dummy pdf file.", "application/pdf")}
+
+    response = client.post("/api/v1/jobs", files=files)
+
+    assert response.status_code == 202
+    assert response.json() == {"job_id": "job-1", "status": "queued"}
+    assert submit.call_args.args[0] == "test-user-123"
+
+
+def test_other_users_jobs_are_not_found(client: TestClient, mocker):
+    """Tests that /jobs/{job_id} only reports the caller's own jobs."""
+    mocker.patch("app.services.job_queue.get_job", return_value=mocker.Mock(user_id="someone-else"))
+
+    assert client.get("/api/v1/jobs/job-1").status_code == 404
+    assert client.get("/api/v1/jobs/job-1/events").status_code == 404
+
+
+def test_retry_resumes_only_the_callers_failed_analyses(client: TestClient, mocker):
+    """Tests that /analyses/{doc_id}/retry resumes from the checkpoint, and refuses other runs."""
+    mocker.patch("app.services.job_queue.get_job", return_value=None)
+    unfinished = mocker.patch("app.api.v1.routes.get_unfinished_run", return_value={"user_id": "test-user-123"})
+    run = mocker.patch("app.api.v1.routes.run_analysis", return_value={"doc_id": "doc-1", "risks": ["Auto-renewal"]})
+
+    response = client.post("/api/v1/analyses/doc-1/retry")
+    assert response.status_code == 200
+    assert response.json()["risks"] == ["Auto-renewal"]
+    run.assert_called_once_with(None, "doc-1")
+
+    unfinished.return_value = {"user_id": "someone-else"}
+    assert client.post("/api/v1/analyses/doc-1/retry").status_code == 404
+    unfinished.return_value = None
+    assert client.post("/api/v1/analyses/doc-1/retry").status_code == 404
+
+
+def test_metrics_endpoint(client: TestClient):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "legalmind_span_duration_seconds" in response.text
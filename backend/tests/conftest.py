@@ -2,6 +2,10 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.api.v1.dependencies import get_current_user
+from app.agents import main_agent as main_agent_module
+from app.core.checkpoint import SQLiteSaver
+from app.core.config import config
+from app.services import llm_cache, text_store
 
 
 def override_get_current_user():
@@ -12,6 +16,34 @@ def override_get_current_user():
     }
 
 
+@pytest.fixture(autouse=True)
+def checkpoints(tmp_path, monkeypatch):
+    """Keeps main_agent's checkpoints, and the uploads kept for retries, in a temp dir."""
+    saver = SQLiteSaver(str(tmp_path / "checkpoints.db"))
+    monkeypatch.setattr(main_agent_module, "checkpointer", saver)
+    monkeypatch.setattr(main_agent_module.main_agent, "checkpointer", saver)
+    monkeypatch.setattr(config, "checkpoint_upload_dir", str(tmp_path / "checkpoint_uploads"))
+    return saver
+
+
+@pytest.fixture(autouse=True)
+def llm_responses(tmp_path, monkeypatch):
+    """Starts every test with an empty LLM response cache, kept in a temp dir."""
+    monkeypatch.setattr(config, "llm_cache_path", str(tmp_path / "llm_cache.db"))
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def text_artifacts(tmp_path, monkeypatch):
+    """Keeps extracted-text artifacts in a temp dir, with an empty in-process cache."""
+    monkeypatch.setattr(text_store, "store", text_store.LocalArtifactStore(str(tmp_path / "text_store")))
+    text_store.clear_memory()
+    yield
+    text_store.clear_memory()
+
+
 @pytest.fixture
 def client():
     """
@@ -34,20 +66,20 @@ def mock_agents(mocker):
     Mocks all the LangGraph agents to prevent them from running during tests.
     """
     # Patch sub-agents (kept for compatibility if used elsewhere)
-    mock_doc = mocker.patch("app.agents.document_agent.document_agent.invoke")
+    mock_doc = mocker.patch("app.agents.document_agent.document_agent.ainvoke")
     mock_doc.return_value = {"doc_id": "mock-doc-id-456"}
 
-    mock_qa = mocker.patch("app.agents.qa_agent.qa_agent.invoke")
+    mock_qa = mocker.patch("app.agents.qa_agent.qa_agent.ainvoke")
     mock_qa.return_value = {"answer": "This is a mock answer.", "sources": []}
 
-    mock_risk = mocker.patch("app.agents.risk_analysis_agent.risk_analysis_agent.invoke")
+    mock_risk = mocker.patch("app.agents.risk_analysis_agent.risk_analysis_agent.ainvoke")
     mock_risk.return_value = {"risks": ["mock risk 1", "mock risk 2"]}
 
-    mock_highlight = mocker.patch("app.agents.highlighting_agent.highlighting_agent.invoke")
+    mock_highlight = mocker.patch("app.agents.highlighting_agent.highlighting_agent.ainvoke")
     mock_highlight.return_value = {"highlighted_sections": ["section 1", "section 2"]}
 
     # Patch the main agent used by the /analyze endpoint to return a full analysis
-    mock_main = mocker.patch("app.agents.main_agent.main_agent.invoke")
+    mock_main = mocker.patch("app.agents.main_agent.main_agent.ainvoke")
     mock_main.return_value = {
         "doc_id": "mock-doc-id-456",
         "document_analysis": {"summary": "mock summary"},
@@ -72,16 +104,17 @@ def mock_storage(mocker):
     """
     Mocks Firebase storage.
     """
-    mock_bucket = mocker.patch("app.core.firebase.storage.bucket")
+    mock_bucket = mocker.patch("app.services.storage_service.get_firebase_storage")
     mock_blob = mock_bucket.return_value.blob.return_value
     mock_blob.upload_from_string.return_value = None
     mock_blob.public_url = "https://mock-url.com/file.pdf"
     
     # Also mock storage_service.get_analysis_history to return a predictable history
     mock_history = mocker.patch("app.services.storage_service.get_analysis_history")
-    mock_history.return_value = [
-        {"doc_id": "mock-doc-id-456", "filename": "test.pdf", "timestamp": "2025-01-01T00:00:00"}
-    ]
+    mock_history.return_value = (
+        [{"doc_id": "mock-doc-id-456", "filename": "test.pdf", "timestamp": "2025-01-01T00:00:00"}],
+        None,
+    )
 
     return {
         "bucket": mock_bucket,
@@ -0,0 +1,34 @@
+import time
+
+from app.core.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    cache.set("short", "value", ttl_seconds=0.01)
+    cache.set("long", "value")
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_peek_leaves_recency_and_counters_alone():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1 and cache.peek("missing") is None
+    cache.set("c", 3)
+    assert "a" not in cache
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 0
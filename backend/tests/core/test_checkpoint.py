@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import TypedDict
+
+from langgraph.graph import END, StateGraph
+
+from app.core.checkpoint import SQLiteSaver
+from app.services.job_queue import StoredUpload
+
+
+class _State(TypedDict, total=False):
+    file: StoredUpload
+    text: str
+    analysis: str
+    saved: bool
+
+
+def _build_graph(saver, calls, failures):
+    def step(name, update):
+        def node(state):
+            calls.append(name)
+            if failures.get(name):
+                failures[name] -= 1
+                raise RuntimeError(f"{name} failed")
+            return update
+        return node
+
+    # A sub-graph run inside a node, like document_agent in main_agent
+    inner = StateGraph(_State)
+    inner.add_node("classify", step("classify", {"text": "Lease text"}))
+    inner.add_node("analyze", step("analyze", {"analysis": "A lease."}))
+    inner.set_entry_point("classify")
+    inner.add_edge("classify", "analyze")
+    inner.add_edge("analyze", END)
+    document = inner.compile()
+
+    async def process(state):
+        calls.append("process")
+        return await document.ainvoke(state)
+
+    outer = StateGraph(_State)
+    outer.add_node("process", process)
+    outer.add_node("save", step("save", {"saved": True}))
+    outer.set_entry_point("process")
+    outer.add_edge("process", "save")
+    outer.add_edge("save", END)
+    return outer.compile(checkpointer=saver)
+
+
+def test_failed_run_resumes_from_last_completed_node(tmp_path):
+    calls, failures = [], {"analyze": 1, "save": 1}
+    upload = StoredUpload(str(tmp_path / "lease.pdf"), "lease.pdf", "application/pdf", 4)
+    run_config = {"configurable": {"thread_id": "doc-1"}}
+
+    async def scenario():
+        results = []
+        for input_dict in ({"file": upload}, None, None):
+            # A fresh saver and graph each time, as after a restart
+            graph = _build_graph(SQLiteSaver(str(tmp_path / "checkpoints.db")), calls, failures)
+            try:
+                results.append(await graph.ainvoke(input_dict, config=run_config))
+            except RuntimeError as e:
+                results.append(str(e))
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results[:2] == ["analyze failed", "save failed"]
+    assert results[2] == {"file": upload, "text": "Lease text", "analysis": "A lease.", "saved": True}
+    # "classify" ran once: the retries only ran what had failed
+    assert calls == ["process", "classify", "analyze", "process", "analyze", "save", "save"]
+
+
+def test_delete_and_purge_threads(tmp_path):
+    saver = SQLiteSaver(str(tmp_path / "checkpoints.db"))
+    graph = _build_graph(saver, [], {})
+
+    async def scenario():
+        for doc_id in ("doc-1", "doc-2"):
+            await graph.ainvoke({"text": ""}, config={"configurable": {"thread_id": doc_id}})
+
+    asyncio.run(scenario())
+    assert {item.config["configurable"]["thread_id"] for item in saver.list(None)} == {"doc-1", "doc-2"}
+
+    saver.delete_thread("doc-1")
+    assert saver.get_tuple({"configurable": {"thread_id": "doc-1"}}) is None
+    assert saver.purge(time.time() - 60) == 0
+    assert saver.purge(time.time() + 1) == 1
+    assert list(saver.list(None)) == []
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.core.concurrency import ConcurrencyLimiter, run_sync
+
+
+def _peak_concurrency(limiter: ConcurrencyLimiter, keys: list[str]) -> dict:
+    """Runs one short task per key and records the peak in-flight count per key."""
+    active: dict = {}
+    peaks: dict = {}
+
+    async def task(key: str):
+        async with limiter.limit(key):
+            active[key] = active.get(key, 0) + 1
+            peaks[key] = max(peaks.get(key, 0), active[key])
+            await asyncio.sleep(0.01)
+            active[key] -= 1
+
+    async def main():
+        await asyncio.gather(*(task(k) for k in keys))
+
+    asyncio.run(main())
+    return peaks
+
+
+def test_limiter_caps_per_key_and_global():
+    limiter = ConcurrencyLimiter(global_limit=3, per_key_limit=2, key_limits={"slow-model": 1})
+    peaks = _peak_concurrency(limiter, ["fast-model"] * 6 + ["slow-model"] * 4)
+    assert peaks["fast-model"] == 2
+    assert peaks["slow-model"] == 1
+    assert limiter.peak_in_flight == 3
+    assert limiter.in_flight == 0
+
+
+def test_run_sync_inside_running_loop():
+    async def answer():
+        return 42
+
+    async def caller():
+        # A sync shim called from async code must not deadlock the loop
+        return run_sync(answer())
+
+    assert run_sync(answer()) == 42
+    assert asyncio.run(caller()) == 42
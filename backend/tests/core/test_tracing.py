@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.core import tracing
+from app.core.tracing import traced
+
+
+@traced("storage", name="test.save")
+def _save(content: bytes) -> str:
+    return "doc-1"
+
+@traced("llm", name="test.generate")
+async def _generate(prompt: str) -> str:
+    tracing.record_tokens("test-model", 10, 4)
+    _save(b"x" * 100)
+    return "reply"
+
+@traced("llm", name="test.stream")
+async def _stream(prompt: str):
+    for piece in ("Hello, ", "world"):
+        tracing.record_tokens("test-model", 1, 1)
+        yield piece
+
+@traced("node", name="test.fail")
+async def _fail(prompt: str):
+    raise RuntimeError("quota")
+
+
+def test_spans_nest_and_record_sizes_tokens_and_errors():
+    async def scenario():
+        with tracing.span("run", "analysis") as root:
+            await _generate("p" * 50)
+            with pytest.raises(RuntimeError):
+                await _fail("")
+        return root
+
+    trace = asyncio.run(scenario()).to_dict()
+
+    generate, fail = trace["children"]
+    assert (generate["name"], generate["input_bytes"], generate["output_bytes"]) == ("test.generate", 50, 5)
+    assert (generate["input_tokens"], generate["output_tokens"]) == (10, 4)
+    assert generate["children"][0]["name"] == "test.save"
+    assert generate["children"][0]["input_bytes"] == 100
+    assert fail["error"] == "RuntimeError"
+    assert trace["duration"] >= generate["duration"]
+
+
+def test_async_generator_spans_exclude_the_consumers_work():
+    async def scenario():
+        with tracing.span("run", "analysis") as root:
+            async for _ in _stream("p" * 10):
+                # Done by the consumer, between items
+                with tracing.span("consumer", "node"):
+                    await asyncio.sleep(0.05)
+        return root
+
+    trace = asyncio.run(scenario()).to_dict()
+
+    assert [child["name"] for child in trace["children"]] == ["test.stream", "consumer", "consumer"]
+    stream = trace["children"][0]
+    assert (stream["output_bytes"], stream["input_tokens"]) == (12, 2)
+    assert "children" not in stream
+    assert stream["duration"] < 0.05
+
+
+def test_metrics_are_rendered_in_prometheus_format():
+    tracing.register_stats("test_source", lambda: {"queued": 3, "label": "ignored"})
+    asyncio.run(_generate(""))
+    with pytest.raises(RuntimeError):
+        asyncio.run(_fail(""))
+
+    text = tracing.render_metrics()
+
+    assert '# TYPE legalmind_span_duration_seconds histogram' in text
+    assert 'legalmind_span_duration_seconds_bucket{kind="storage",name="test.save",le="+Inf"}' in text
+    assert 'legalmind_span_errors_total{kind="node",name="test.fail",error="RuntimeError"}' in text
+    assert 'legalmind_llm_tokens_total{model="test-model",direction="input"}' in text
+    assert "legalmind_test_source_queued 3" in text
+    assert "legalmind_test_source_label" not in text
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core import prompts
+from app.services import analysis_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    analysis_cache.invalidate(stale_only=False)
+    yield
+    analysis_cache.invalidate(stale_only=False)
+
+
+def test_store_merges_fields_and_returns_copies():
+    digest = analysis_cache.content_hash(b"same NDA template")
+    before = analysis_cache.stats()
+    assert analysis_cache.lookup(digest) is None
+
+    analysis_cache.store(digest, classification="General Legal Document")
+    analysis_cache.store(digest, analysis={"summary": "An NDA.", "risks": []})
+
+    cached = analysis_cache.lookup(digest)
+    assert cached.classification == "General Legal Document"
+    assert cached.analysis["summary"] == "An NDA."
+    assert cached.embeddings is None
+
+    # Mutating a lookup result must not leak into the cache
+    cached.analysis["risks"].append("changed")
+    assert analysis_cache.lookup(digest).analysis["risks"] == []
+
+    # Only the three lookups count, not the stores
+    after = analysis_cache.stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (2, 1)
+
+
+def test_prompt_change_invalidates_entries(monkeypatch):
+    digest = analysis_cache.content_hash(b"same NDA template")
+    analysis_cache.store(digest, classification="General Legal Document")
+
+    # Restored afterwards, as invalidate() re-hashes the changed prompts
+    monkeypatch.setattr(analysis_cache, "_PROMPT_VERSION", analysis_cache._PROMPT_VERSION)
+    monkeypatch.setitem(prompts.WORKFLOW_PROMPTS, "New Template", {"instructions": "..."})
+
+    assert analysis_cache.invalidate() == 1
+    assert analysis_cache.lookup(digest) is None
+    assert analysis_cache.stats()["entries"] == 0
+
+
+def test_parallel_stores_keep_each_others_fields(monkeypatch):
+    digest = analysis_cache.content_hash(b"same NDA template")
+    peek = analysis_cache._cache.peek
+
+    def slow_peek(key):
+        # Every store reads the entry before any of them writes it back, unless they take turns
+        entry = peek(key)
+        time.sleep(0.05)
+        return entry
+
+    monkeypatch.setattr(analysis_cache._cache, "peek", slow_peek)
+    fields = [{"classification": "General Legal Document"}, {"analysis": {"summary": "An NDA."}},
+              {"clause_explanation": "Clause 1 is standard."}]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda values: analysis_cache.store(digest, **values), fields))
+
+    cached = analysis_cache.lookup(digest)
+    assert cached.classification and cached.analysis and cached.clause_explanation
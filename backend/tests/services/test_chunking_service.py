@@ -0,0 +1,46 @@
+from app.services.chunking_service import chunk_text, estimate_tokens
+
+CONTRACT = """SERVICES AGREEMENT
+
+1. Definitions
+1.1 "Services" means the consulting services described in Schedule A.
+1.2 "Fees" means the amounts payable under Section 3.
+
+2. Term
+This Agreement begins on the Effective Date and continues for two (2) years.
+
+3. Fees
+The Client shall pay the Fees within thirty (30) days of invoice.
+"""
+
+
+def test_chunks_follow_clause_structure():
+    chunks = chunk_text(CONTRACT, target_tokens=30, overlap_tokens=0)
+
+    # No chunk cuts a clause in the middle
+    for chunk in chunks:
+        assert chunk.text == CONTRACT[chunk.char_start:chunk.char_end]
+        assert not chunk.text.endswith(("shall", "the", "within"))
+    assert any(c.text.startswith("2. Term") for c in chunks)
+    assert [c.section for c in chunks if c.text.startswith("3. Fees")] == ["3. Fees"]
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+
+
+def test_long_block_split_by_sentence_with_overlap_and_pages():
+    sentence = "The Supplier shall deliver the goods to the Buyer's warehouse. "
+    text = sentence * 40
+    page_offsets = [0, len(text) // 2]
+
+    chunks = chunk_text(text, page_offsets=page_offsets, target_tokens=60, overlap_tokens=15)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c.text) <= 60 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        # Each chunk repeats the last sentence of the one before it
+        assert current.char_start < previous.char_end
+    assert chunks[0].page_start == 1 and chunks[-1].page_end == 2
+    # Ids are stable across runs and unique within a document
+    assert [c.chunk_id for c in chunks] == [c.chunk_id for c in chunk_text(
+        text, page_offsets=page_offsets, target_tokens=60, overlap_tokens=15
+    )]
+    assert len({c.chunk_id for c in chunks}) == len(chunks)
@@ -0,0 +1,77 @@
+import asyncio
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from app.agents.document_agent import extract_text_and_classify
+from app.core.config import config
+from app.services import analysis_cache, classification_service, llm_service, storage_service
+from app.services.extraction_service import ExtractedText
+
+DATA = Path(__file__).resolve().parents[2] / "benchmarks" / "data"
+
+
+@pytest.fixture(autouse=True)
+def local_classifier(monkeypatch):
+    monkeypatch.setattr(config, "local_classifier_enabled", True)
+
+
+def _labelled(name: str):
+    for line in (DATA / name).read_text(encoding="utf-8").splitlines():
+        row = json.loads(line)
+        text = row.get("text") or (DATA / row["file"]).read_text(encoding="utf-8")
+        yield row["label"], text
+
+
+# The held-out set is not used for tuning, so it covers fewer documents
+@pytest.mark.parametrize("name, min_confident", [("classification.jsonl", 30), ("classification_holdout.jsonl", 12)])
+def test_confident_predictions_on_the_labelled_sets_are_correct(name, min_confident):
+    confident = [
+        (label, prediction) for label, prediction in
+        ((label, classification_service.classify(text)) for label, text in _labelled(name))
+        if classification_service.confident(prediction)
+    ]
+
+    assert len(confident) >= min_confident
+    assert all(prediction.label == label for label, prediction in confident)
+
+
+def test_short_or_non_legal_text_is_left_to_the_llm():
+    short = classification_service.classify("This Residential Lease is between the Landlord and the Tenant.")
+    recipe = classification_service.classify(
+        "Preheat the oven to 180 degrees. Whisk the eggs with the sugar until pale, then fold in the flour "
+        "and the melted butter. Pour the batter into a lined tin and bake for thirty minutes, until a "
+        "skewer comes out clean. Leave the cake to cool before you rent a table at the market and sell it. "
+        "Dust with icing sugar and serve with fresh berries and cream."
+    )
+
+    assert not classification_service.confident(short)
+    assert not classification_service.confident(recipe)
+
+
+class _Upload:
+    filename = "nda.txt"
+    source = b"nda"
+
+    @property
+    def file(self):
+        return io.BytesIO(self.source)
+
+
+def test_agent_only_calls_the_llm_below_the_threshold(mocker, monkeypatch):
+    nda = (DATA / "mutual_nda.txt").read_text(encoding="utf-8")
+    mocker.patch.object(storage_service, "extract_document", return_value=ExtractedText(nda, [0]))
+    mocker.patch.object(analysis_cache, "lookup", return_value=None)
+    mocker.patch.object(analysis_cache, "store")
+    classify = mocker.patch.object(llm_service, "aclassify_document", return_value="General Legal Document")
+
+    result = asyncio.run(extract_text_and_classify({"file": _Upload()}))
+    assert result["classification"] == "Non-Disclosure Agreements (NDAs)"
+    classify.assert_not_called()
+
+    monkeypatch.setattr(config, "local_classifier_min_confidence", 1.01)
+    result = asyncio.run(extract_text_and_classify({"file": _Upload()}))
+    assert result["classification"] == "General Legal Document"
+    classify.assert_awaited_once()
@@ -0,0 +1,49 @@
+import fitz
+import pytest
+
+from app.services import extraction_service
+
+
+def _pdf(pages: list[str]) -> bytes:
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_workers():
+    yield
+    extraction_service.shutdown()
+
+
+def test_page_offsets_point_at_each_page():
+    pages = ["1. Parties", "2. Term", "3. Governing Law"]
+
+    extracted = extraction_service.extract_pdf(_pdf(pages), parallel=False)
+
+    assert extracted.page_count == 3
+    for offset, heading in zip(extracted.page_offsets, pages):
+        assert extracted.text[offset:].startswith(heading)
+
+
+def test_parallel_extraction_matches_sequential(monkeypatch):
+    monkeypatch.setattr(extraction_service.config, "pdf_extraction_workers", 2)
+    data = _pdf([f"Clause {i} applies." for i in range(7)])
+
+    sequential = extraction_service.extract_pdf(data, parallel=False)
+    parallel = extraction_service.extract_pdf(data, parallel=True)
+
+    assert parallel == sequential
+
+
+def test_unicode_is_normalized_not_stripped():
+    # Non-breaking space, "fi" ligature, soft hyphen and zero-width space
+    raw = "Le loyer est de 1\u00a0200 \u20ac \u2014 \ufb01n du bail. Caf\u00e9 Zo\u00eb\u00ad\u200b.\n"
+
+    extracted = extraction_service.extract_document(raw.encode("utf-8"), "Bail.TXT")
+
+    assert extracted.text == "Le loyer est de 1 200 \u20ac \u2014 fin du bail. Caf\u00e9 Zo\u00eb.\n"
+    assert extracted.page_offsets == [0]
@@ -0,0 +1,104 @@
+import fitz
+from docx import Document
+
+from app.services import highlight_service
+from app.services.highlight_service import PhraseMatcher
+
+
+def test_phrase_matcher_finds_every_occurrence():
+    matcher = PhraseMatcher(["he", "she", "hers", "his"])
+
+    matches = matcher.find_all("ushers and his")
+
+    found = sorted("ushers and his"[start:end] for start, end in matches)
+    assert found == ["he", "hers", "his", "she"]
+
+
+def test_pdf_highlights_match_across_lines_and_case(tmp_path):
+    source = tmp_path / "lease.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "1. Parties\nThe Landlord is Acme Properties.")
+    doc.new_page().insert_text(
+        (72, 72), "9. Governing Law\nThis Lease is governed by the laws\nof the State of Delaware."
+    )
+    doc.save(source)
+    doc.close()
+
+    output = highlight_service.highlight_text(
+        str(source),
+        str(tmp_path / "highlighted.pdf"),
+        ["governed by the LAWS of the   State of Delaware.", "Not Found.", "xy"],
+    )
+
+    with fitz.open(output) as result:
+        first, second = result[0], result[1]
+        assert list(first.annots()) == []
+        annots = list(second.annots())
+        assert len(annots) == 1
+        # One annotation spanning both lines of the clause
+        assert len(annots[0].vertices) == 8
+        highlighted = second.get_textbox(annots[0].rect)
+        assert "governed by the laws" in highlighted and "Delaware" in highlighted
+
+
+def test_docx_highlights_only_the_matched_text(tmp_path):
+    source = tmp_path / "lease.docx"
+    document = Document()
+    para = document.add_paragraph("The Tenant shall pay ")
+    para.add_run("rent of $1,000").bold = True
+    para.add_run(" monthly. Late fees apply.")
+    document.add_paragraph("Nothing to see here.")
+    cell = document.add_table(rows=1, cols=1).cell(0, 0)
+    cell.paragraphs[0].add_run("Deposit: two months' rent.")
+    document.save(source)
+
+    output = highlight_service.highlight_text(
+        str(source), str(tmp_path / "highlighted_lease.docx"), ["pay RENT of $1,000 monthly.", "two months"]
+    )
+
+    with fitz.open(output) as result:
+        text = result[0].get_text()
+    assert "Late fees apply." in text and "Deposit: two months' rent." in text
+
+
+def test_docx_runs_are_split_at_match_boundaries():
+    document = Document()
+    para = document.add_paragraph("The Tenant shall pay ")
+    para.add_run("rent of $1,000").bold = True
+    para.add_run(" monthly. Late fees apply.")
+
+    highlight_service._highlight_paragraph(para, PhraseMatcher(["pay rent of $1,000 monthly."]))
+
+    runs = [(run.text, run.bold, run.font.highlight_color is not None) for run in para.runs]
+    assert runs == [
+        ("The Tenant shall ", None, False),
+        ("pay ", None, True),
+        ("rent of $1,000", True, True),
+        (" monthly.", None, True),
+        (" Late fees apply.", None, False),
+    ]
+    assert para.text == "The Tenant shall pay rent of $1,000 monthly. Late fees apply."
+
+
+def test_pdf_pages_without_highlights_are_skipped(tmp_path, mocker):
+    source = tmp_path / "lease.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "1. Parties\nThe Landlord is Acme Properties.")
+    doc.new_page().insert_text((72, 72), "9. Governing Law\nThe laws of the State of Delaware.")
+    doc.save(source)
+    doc.close()
+    page_map = mocker.spy(highlight_service, "_page_text_map")
+
+    output = highlight_service.highlight_text(
+        str(source),
+        str(tmp_path / "highlighted.pdf"),
+        ["the laws of the State of Delaware"],
+        page_texts=[
+            "1. Parties\nThe Landlord is Acme Properties.\n",
+            "9. Governing Law\nThe laws of the\nState of Delaware.\n",
+        ],
+    )
+
+    assert [call.args[0].number for call in page_map.call_args_list] == [1]
+    with fitz.open(output) as result:
+        assert len(list(result[1].annots())) == 1
@@ -0,0 +1,125 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services import job_queue
+
+
+class _Upload:
+    filename = "lease.pdf"
+    content_type = "application/pdf"
+    size_bytes = 4
+
+    def save_to(self, path):
+        with open(path, "wb") as f:
+            f.write(b"%PDF")
+
+
+async def _fake_progress(input_dict, doc_id=None):
+    assert open(input_dict["file"].source, "rb").read() == b"%PDF"
+    yield None, {"percentage": 10, "message": "Saving file..."}
+    await asyncio.sleep(0)
+    yield "analysis_field", {"type": "analysis_field", "field": "summary", "value": "A lease."}
+    yield None, {"percentage": 100, "message": "Analysis complete!", "data": {"doc_id": "doc-1"}}
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue.config, "job_store_path", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_queue.config, "job_upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(job_queue, "_store", None)
+    monkeypatch.setattr(job_queue, "_queue", None)
+    monkeypatch.setattr(job_queue, "stream_progress", _fake_progress)
+    return job_queue
+
+
+def _submit(jobs):
+    return jobs.submit("user", _Upload(), "Q?", "Termination")
+
+
+def test_job_runs_in_background_and_streams_to_subscribers(jobs):
+    async def scenario():
+        job = await _submit(jobs)
+        assert job.status == jobs.QUEUED
+        events = [item async for item in jobs.subscribe(job.id)]
+        await jobs.stop()
+        return job, events
+
+    job, events = asyncio.run(scenario())
+
+    assert events[0] == (None, {"percentage": 0, "message": "Queued..."})
+    assert events[2][0] == "analysis_field"
+    assert events[-1][1]["data"] == {"doc_id": "doc-1"}
+    finished = jobs.get_job(job.id)
+    assert finished.status == jobs.COMPLETED
+    assert finished.to_dict()["result"] == {"doc_id": "doc-1"}
+    assert not os.path.exists(job.upload_path)
+
+
+def test_unfinished_jobs_are_recovered_on_start(jobs, monkeypatch):
+    monkeypatch.setattr(jobs, "_process_alive", lambda owner: False)
+
+    async def scenario():
+        jobs.config.job_workers = 0
+        queued, interrupted = await _submit(jobs), await _submit(jobs)
+        # Simulate a crash: the second job was being run by a process that is gone
+        jobs._get_store().update(interrupted.id, status=jobs.RUNNING, owner="gone-host:1")
+        await jobs.stop()
+
+        jobs.config.job_workers = 1
+        await jobs.start()
+        await jobs._queue.join()
+        await jobs.stop()
+        return queued, interrupted
+
+    monkeypatch.setattr(jobs.config, "job_workers", 0)
+    queued, interrupted = asyncio.run(scenario())
+
+    assert {jobs.get_job(job.id).status for job in (queued, interrupted)} == {jobs.COMPLETED}
+
+
+def test_failed_jobs_can_be_retried(jobs, monkeypatch):
+    runs = []
+
+    async def flaky_progress(input_dict, doc_id=None):
+        runs.append(doc_id)
+        if len(runs) == 1:
+            raise RuntimeError("Highlighting failed")
+        async for item in _fake_progress(input_dict, doc_id):
+            yield item
+
+    monkeypatch.setattr(jobs, "stream_progress", flaky_progress)
+
+    async def scenario():
+        job = await _submit(jobs)
+        await jobs._queue.join()
+        failed = jobs.get_job(job.id)
+        retried = await jobs.retry(job.id)
+        await jobs._queue.join()
+        with pytest.raises(ValueError):
+            await jobs.retry(job.id)
+        await jobs.stop()
+        return failed, retried
+
+    failed, retried = asyncio.run(scenario())
+
+    assert failed.status == jobs.FAILED and failed.error == "Highlighting failed"
+    assert retried.status == jobs.QUEUED
+    # Both runs use the job's ID as the doc_id, so the retry resumes the first run's checkpoints
+    assert runs == [failed.id, failed.id]
+    assert jobs.get_job(failed.id).status == jobs.COMPLETED
+    assert not os.path.exists(failed.upload_path)
+
+
+def test_submit_rejects_jobs_when_the_queue_is_full(jobs, monkeypatch):
+    monkeypatch.setattr(jobs.config, "job_workers", 0)
+    monkeypatch.setattr(jobs.config, "job_queue_max_size", 1)
+
+    async def scenario():
+        await _submit(jobs)
+        with pytest.raises(jobs.QueueFullError):
+            await _submit(jobs)
+        await jobs.stop()
+
+    asyncio.run(scenario())
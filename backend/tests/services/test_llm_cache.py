@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.core.config import config
+from app.services import llm_cache, llm_service
+
+PARAMS = {"temperature": 0.0}
+
+
+def test_replies_persist_on_disk_and_depend_on_model_and_params():
+    llm_cache.put("model-a", "Classify this NDA.", PARAMS, "Non-Disclosure Agreements (NDAs)")
+    llm_cache._memory.clear()
+
+    assert llm_cache.get("model-a", "Classify this NDA.", PARAMS) == "Non-Disclosure Agreements (NDAs)"
+    assert llm_cache.get("model-b", "Classify this NDA.", PARAMS) is None
+    assert llm_cache.get("model-a", "Classify this NDA.", {"temperature": 0.7}) is None
+    stats = llm_cache.stats()
+    assert (stats["disk_hits"], stats["misses"], stats["stores"]) == (1, 2, 1)
+    assert stats["saved_tokens"] > 0
+
+
+def test_disk_keeps_the_most_recently_used_replies_within_budget(monkeypatch):
+    monkeypatch.setattr(config, "llm_cache_disk_max_bytes", 250)
+    for name in ("first", "second"):
+        llm_cache.put("model", name, PARAMS, "x" * 100)
+    # Reading "first" makes "second" the least recently used
+    llm_cache._memory.clear()
+    assert llm_cache.get("model", "first", PARAMS) is not None
+    llm_cache.put("model", "third", PARAMS, "x" * 100)
+    llm_cache._memory.clear()
+
+    assert llm_cache.get("model", "second", PARAMS) is None
+    assert llm_cache.get("model", "first", PARAMS) is not None
+    assert llm_cache.stats()["disk_evictions"] == 1
+    assert llm_cache.stats()["disk_bytes"] == 200
+
+
+def test_replacing_a_reply_does_not_grow_the_disk_size():
+    for _ in range(3):
+        llm_cache.put("model", "prompt", PARAMS, "x" * 100)
+
+    assert llm_cache.stats()["disk_bytes"] == 100
+
+
+def test_memory_hits_keep_the_disk_copy_recent(monkeypatch):
+    monkeypatch.setattr(config, "llm_cache_disk_max_bytes", 250)
+
+    async def scenario():
+        for name in ("first", "second"):
+            await llm_cache.aput("model", name, PARAMS, "x" * 100)
+        # Served from memory; the disk copy's last use is written with the next store
+        assert await llm_cache.aget("model", "first", PARAMS) is not None
+        await llm_cache.aput("model", "third", PARAMS, "x" * 100)
+        llm_cache._memory.clear()
+        return await llm_cache.aget("model", "first", PARAMS), await llm_cache.aget("model", "second", PARAMS)
+
+    first, second = asyncio.run(scenario())
+    assert first is not None and second is None
+    assert llm_cache.stats()["memory_hits"] == 1
+
+
+def test_llm_calls_are_served_from_cache_unless_opted_out(mocker):
+    replies = iter(["not json", '{"summary": "An NDA."}', '{"summary": "Fresh."}'])
+    generate = mocker.patch.object(llm_service, "agenerate", side_effect=lambda prompt: next(replies))
+    nda = "Non-Disclosure Agreements (NDAs)"
+
+    # A malformed reply is not cached, so the next call asks again
+    with pytest.raises(ValueError):
+        asyncio.run(llm_service.aget_full_analysis("A short NDA.", nda))
+    first = asyncio.run(llm_service.aget_full_analysis("A short NDA.", nda))
+    second = asyncio.run(llm_service.aget_full_analysis("A short NDA.", nda))
+    fresh = asyncio.run(llm_service.aget_full_analysis("A short NDA.", nda, cache=False))
+
+    assert first == second == {"summary": "An NDA."}
+    assert fresh == {"summary": "Fresh."}
+    assert generate.call_count == 3
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import config
+from app.core.prompts import WORKFLOW_PROMPTS
+from app.services import llm_service
+
+NDA = "Non-Disclosure Agreements (NDAs)"
+QUESTIONS = WORKFLOW_PROMPTS[NDA]["questions"]
+
+
+def _long_nda() -> str:
+    clauses = [
+        "1. Parties\nThis agreement is between Acme Corp (Disclosing Party) and Beta LLC (Receiving Party).",
+        "2. Confidential Information\nConfidential Information means any information disclosed by Acme Corp.",
+        "3. Term\nThe obligations survive for five (5) years from the date of disclosure.",
+        "4. Governing Law\nThis agreement is governed by the laws of the State of Delaware.",
+    ]
+    return "\n\n".join(clauses * 5)
+
+
+def test_long_document_is_analyzed_by_section(monkeypatch):
+    monkeypatch.setattr(config, "long_document_token_threshold", 100)
+    monkeypatch.setattr(config, "long_document_section_tokens", 60)
+    prompts = []
+
+    async def fake_generate(prompt):
+        prompts.append(prompt)
+        if "section_summary" not in prompt:
+            return json.dumps({"summary": "An NDA between Acme and Beta.", "risk_score": 70})
+        section = {
+            "section_summary": "Part of the NDA.",
+            "key_clauses": ["Term", "term"],
+            "risks": ["Term: The confidentiality term of five years is long."],
+            "answers": {q: "Not specified." for q in QUESTIONS},
+            "highlights": {"governing_law": "Not Found."},
+        }
+        if "Delaware" in prompt.split("Section Text:")[1]:
+            section["answers"][QUESTIONS[4]] = "Delaware"
+            section["highlights"]["governing_law"] = "the laws of the State of Delaware"
+            section["risks"].append("Term: The five year confidentiality term is long!")
+        return json.dumps(section)
+
+    monkeypatch.setattr(llm_service, "agenerate", fake_generate)
+
+    analysis = asyncio.run(llm_service.aget_full_analysis(_long_nda(), NDA))
+
+    # Several map calls plus one reduce call
+    assert len(prompts) > 3
+    assert analysis["summary"] == "An NDA between Acme and Beta."
+    assert analysis["risk_score"] == 70
+    assert analysis["key_clause_discussion"] == ["Term"]
+    assert analysis["risks"] == ["Term: The confidentiality term of five years is long."]
+    assert {"question": QUESTIONS[4], "answer": "Delaware"} in analysis["questions"]
+    assert {"question": QUESTIONS[0], "answer": "Not specified."} in analysis["questions"]
+    assert analysis["highlights"]["governing_law"] == "the laws of the State of Delaware"
+    assert analysis["highlights"]["disclosing_party"] == "Not Found."
+
+
+def test_short_document_uses_a_single_call(monkeypatch):
+    prompts = []
+
+    async def fake_generate(prompt):
+        prompts.append(prompt)
+        return 'Here you go: {"summary": "An NDA.", "risks": [], "risk_score": 85}'
+
+    monkeypatch.setattr(llm_service, "agenerate", fake_generate)
+
+    analysis = asyncio.run(llm_service.aget_full_analysis("A short NDA.", NDA))
+
+    assert len(prompts) == 1
+    assert analysis["risk_score"] == 85
+
+
+def test_fields_are_reported_while_streaming(monkeypatch):
+    reply = json.dumps({
+        "summary": "An NDA.",
+        "risks": ["Term: long."],
+        "risk_score": 80,
+        "highlights": {"governing_law": "Delaware", "disclosing_party": "Acme Corp"},
+    })
+    seen_at = []
+
+    class FakeChunk:
+        # Like AIMessageChunk: `content` holds the text, `text` is a method
+        def __init__(self, content):
+            self.content = content
+
+        def text(self):
+            return self.content
+
+    class FakeStreamingLLM:
+        async def astream(self, prompt):
+            for i in range(0, len(reply), 7):
+                seen_at.append(i)
+                yield FakeChunk(reply[i:i + 7])
+
+    monkeypatch.setattr(llm_service, "llm", FakeStreamingLLM())
+    fields = []
+
+    def on_field(path, value):
+        fields.append((path, value, seen_at[-1]))
+
+    analysis = asyncio.run(llm_service.aget_full_analysis("A short NDA.", NDA, on_field=on_field))
+
+    assert [f[0] for f in fields] == [
+        ("summary",), ("risks",), ("risk_score",),
+        ("highlights", "governing_law"), ("highlights", "disclosing_party"),
+    ]
+    # The summary is reported long before the reply is complete
+    assert fields[0][2] < len(reply) / 2
+    assert analysis["highlights"]["disclosing_party"] == "Acme Corp"
+
+
+def test_fused_call_classifies_and_analyzes_at_once(monkeypatch):
+    prompts = []
+    replies = iter([
+        json.dumps({"classification": NDA, "summary": "An NDA.", "risks": [], "risk_score": 85}),
+        json.dumps({"classification": "Unsupported Document Type"}),
+        json.dumps({"classification": "Recipe", "summary": "A cake."}),
+    ])
+
+    async def fake_generate(prompt):
+        prompts.append(prompt)
+        return next(replies)
+
+    monkeypatch.setattr(llm_service, "agenerate", fake_generate)
+
+    classification, analysis = asyncio.run(llm_service.aclassify_and_analyze("A short NDA.", cache=False))
+    assert classification == NDA
+    assert analysis == {"summary": "An NDA.", "risks": [], "risk_score": 85}
+    # One prompt carries every workflow's questions
+    assert all(json.dumps(t["questions"]) in prompts[0] for t in WORKFLOW_PROMPTS.values())
+
+    assert asyncio.run(llm_service.aclassify_and_analyze("A recipe.", cache=False)) == (
+        "Unsupported Document Type", None
+    )
+    with pytest.raises(ValueError):
+        asyncio.run(llm_service.aclassify_and_analyze("A recipe.", cache=False))
@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import pinecone_service
+
+
+def test_upsert_document_batches_embeddings_and_upserts(mocker):
+    mocker.patch.object(pinecone_service.config, "embedding_batch_size", 3)
+    mocker.patch.object(pinecone_service.config, "pinecone_upsert_batch_size", 2)
+    embeddings_model = mocker.patch.object(pinecone_service, "embeddings_model")
+    embed = embeddings_model.embed_documents
+    embed.side_effect = lambda texts, **kwargs: [[float(len(t))] for t in texts]
+    store = mocker.patch.object(pinecone_service, "store")
+
+    text = "\n\n".join(
+        f"{n}. Clause {n}\n" + "The Receiving Party shall keep the information confidential. " * 30
+        for n in range(1, 5)
+    )
+    embedded = pinecone_service.upsert_document("user-1", "doc-1", text)
+
+    assert len(embedded) == 8
+    assert embed.call_count == 3  # 8 chunks in batches of 3
+    upserted = [v for call in store.upsert.call_args_list for v in call.args[1]]
+    assert all(len(call.args[1]) <= 2 for call in store.upsert.call_args_list)
+    assert {call.args[0] for call in store.upsert.call_args_list} == {"user-1"}
+    assert sorted(v["id"] for v in upserted) == sorted(f"doc-1_{c.chunk_id}" for c, _ in embedded)
+    assert {v["metadata"]["doc_id"] for v in upserted} == {"doc-1"}
+    assert sorted(v["metadata"]["chunk_index"] for v in upserted) == list(range(8))
+
+
+def test_upsert_batches_respect_size_cap(mocker):
+    mocker.patch.object(pinecone_service.config, "pinecone_upsert_max_bytes", 50_000)
+    vectors = [
+        {"id": str(i), "values": [0.1] * 1000, "metadata": {"text": "clause"}} for i in range(10)
+    ]
+    batches = pinecone_service._upsert_batches(vectors)
+    assert sum(len(b) for b in batches) == 10
+    assert all(sum(pinecone_service._estimated_size(v) for v in b) <= 50_000 for b in batches)
+
+
+def test_query_reuses_cached_embedding(mocker, tmp_path):
+    from app.services import embedding_cache
+
+    mocker.patch.object(pinecone_service.config, "query_embedding_cache_path", str(tmp_path / "q.sqlite"))
+    mocker.patch.object(embedding_cache, "_disk", None)
+    embedding_cache.clear()
+    embeddings_model = mocker.patch.object(pinecone_service, "embeddings_model")
+    embeddings_model.embed_query.return_value = [0.25, 0.5]
+    store = mocker.patch.object(pinecone_service, "store")
+    store.query.return_value = []
+
+    pinecone_service.query("user-1", "doc-1", "What is the governing law?")
+    pinecone_service.query("user-1", "doc-1", "  what is the GOVERNING law ")
+    assert embeddings_model.embed_query.call_count == 1
+
+    # A restart empties memory; the disk tier still answers
+    embedding_cache._memory.clear()
+    pinecone_service.query("user-1", "doc-1", "What is the governing law?")
+    assert embeddings_model.embed_query.call_count == 1
+    assert store.query.call_args.args[2] == [0.25, 0.5]
+
+    stats = embedding_cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    embedding_cache.clear()
+    embedding_cache._disk.close()
+
+
+def test_store_is_created_once_on_first_use(mocker, monkeypatch):
+    monkeypatch.setattr(pinecone_service, "store", None)
+    create = mocker.patch.object(pinecone_service, "_create_store", side_effect=lambda: time.sleep(0.05) or object())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        stores = list(pool.map(lambda _: pinecone_service.get_store(), range(8)))
+
+    create.assert_called_once()
+    assert all(store is stores[0] for store in stores)
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services import session_store
+from app.services.session_store import ChatSession, MemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    store = MemorySessionStore(max_sessions=2)
+    monkeypatch.setattr(session_store, "store", store)
+    return store
+
+
+def test_sqlite_sessions_survive_reopening(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path, max_sessions=10, ttl_seconds=60).save(
+        "user", "doc", ChatSession(summary="Asked about rent.", turns=[("When is rent due?", "On the 1st.")])
+    )
+
+    reopened = SQLiteSessionStore(path, max_sessions=10, ttl_seconds=60)
+
+    assert reopened.get("user", "doc") == ChatSession("Asked about rent.", [("When is rent due?", "On the 1st.")])
+    assert reopened.get("user", "other-doc") is None
+
+
+def test_memory_store_evicts_least_recently_used(memory_store):
+    for doc_id in ("a", "b", "c"):
+        asyncio.run(session_store.append_turn("user", doc_id, "Q?", "A."))
+
+    assert memory_store.get("user", "a") is None
+    assert session_store.get_session("user", "c").turns == [("Q?", "A.")]
+
+
+def test_long_sessions_are_summarized_within_caps(memory_store, monkeypatch, mocker):
+    monkeypatch.setattr(session_store.config, "chat_history_max_turns", 4)
+    monkeypatch.setattr(session_store.config, "chat_history_token_budget", 1_000)
+    summarize = mocker.patch.object(
+        session_store.llm_service, "asummarize_conversation", return_value="Earlier questions about rent."
+    )
+
+    async def conversation():
+        for i in range(5):
+            session = await session_store.append_turn("user", "doc", f"Question {i}?", f"Answer {i}.")
+        # The reply does not wait for the summary
+        assert len(session.turns) == 5
+        await session_store.wait_for_compactions()
+        return session_store.get_session("user", "doc")
+
+    session = asyncio.run(conversation())
+
+    # The fifth turn goes over the cap: the oldest three are folded into the summary
+    summarize.assert_awaited_once()
+    assert [q for q, _ in summarize.call_args.args[1]] == ["Question 0?", "Question 1?", "Question 2?"]
+    assert session.summary == "Earlier questions about rent."
+    assert session.turns == [("Question 3?", "Answer 3."), ("Question 4?", "Answer 4.")]
+
+
+def test_concurrent_turns_are_all_kept(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=10, ttl_seconds=60)
+    monkeypatch.setattr(session_store, "store", store)
+
+    async def ask_at_once():
+        await asyncio.gather(*(session_store.append_turn("user", "doc", f"Q{i}?", f"A{i}.") for i in range(5)))
+
+    asyncio.run(ask_at_once())
+
+    assert sorted(q for q, _ in store.get("user", "doc").turns) == ["Q0?", "Q1?", "Q2?", "Q3?", "Q4?"]
@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+from app.services import storage_service
+
+
+class _Snapshot:
+    def __init__(self, data):
+        self._data = data
+        self.id = data["doc_id"]
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Query:
+    """Records the calls a Firestore query receives and serves a fixed list of documents."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return call
+
+    def stream(self):
+        limit = next(args[0] for name, args, _ in self.calls if name == "limit")
+        return [_Snapshot(doc) for doc in self.docs[:limit]]
+
+
+def test_history_pages_are_projected_and_cursored(mocker):
+    # doc-1 and doc-2 were saved in the same instant
+    stamps = [datetime.datetime(2025, 1, day, tzinfo=datetime.timezone.utc) for day in (3, 2, 2)]
+    query = _Query([{"doc_id": f"doc-{i}", "timestamp": stamp} for i, stamp in enumerate(stamps)])
+    db = mocker.patch.object(storage_service, "get_firestore_client").return_value
+    history_ref = db.collection.return_value.document.return_value.collection.return_value
+    history_ref.order_by.return_value = query
+
+    history, cursor = storage_service.get_analysis_history("user", limit=2)
+
+    assert [h["doc_id"] for h in history] == ["doc-0", "doc-1"]
+    assert history[-1]["timestamp"] == "2025-01-02T00:00:00+00:00"
+    calls = {name: args for name, args, _ in query.calls}
+    assert calls["select"] == (storage_service.HISTORY_LIST_FIELDS,)
+    assert calls["order_by"] == ("__name__",)
+    assert calls["limit"] == (3,)
+    assert "start_after" not in calls
+
+    # The next page starts after both the timestamp and the document id of the last entry
+    query.calls.clear()
+    _, cursor = storage_service.get_analysis_history("user", limit=5, after=cursor)
+    assert cursor is None
+    calls = {name: args for name, args, _ in query.calls}
+    assert calls["start_after"] == ({"timestamp": stamps[1], "__name__": history_ref.document.return_value},)
+    history_ref.document.assert_called_with("doc-1")
+
+
+def test_malformed_history_cursor_is_a_value_error(mocker):
+    mocker.patch.object(storage_service, "get_firestore_client")
+    for cursor in ("2025-01-04T00:00:00+00:00", "WzFd", "bnVsbA=="):
+        with pytest.raises(ValueError):
+            storage_service.get_analysis_history("user", limit=2, after=cursor)
@@ -0,0 +1,59 @@
+import pytest
+
+from app.services import storage_service, text_store
+from app.services.extraction_service import ExtractedText
+
+TEXT = (
+    "MUTUAL NON-DISCLOSURE AGREEMENT\n\nThis Agreement is between Acme Corp and Globex LLC.\n\n"
+    "1. Term\nThe obligations last five years.\n\n"
+    "2. Governing Law\nThis Agreement is governed by the laws of Delaware.\n"
+)
+
+
+def test_artifact_round_trips_through_the_store():
+    saved = text_store.save("user", "doc-1", ExtractedText(TEXT, [0, 83]))
+    text_store.clear_memory()
+
+    loaded = text_store.load("user", "doc-1")
+
+    assert loaded == saved
+    assert loaded.page_text(1) == TEXT[83:]
+    assert [heading for _, heading in loaded.sections] == [
+        "MUTUAL NON-DISCLOSURE AGREEMENT", "1. Term", "2. Governing Law",
+    ]
+    assert text_store.load("user", "doc-2") is None
+    stats = text_store.stats()
+    assert (stats["store_hits"], stats["misses"]) == (1, 1)
+    assert text_store.load("user", "doc-1") is loaded
+
+
+def test_local_store_keeps_ids_inside_its_directory(tmp_path):
+    store = text_store.LocalArtifactStore(str(tmp_path / "text_store"))
+    store.put("../user", "doc/../../x", b"data")
+
+    assert store.get("../user", "doc/../../x") == b"data"
+    assert [p.parent.parent.parent for p in tmp_path.rglob(text_store._ARTIFACT_NAME)] == [tmp_path / "text_store"]
+    with pytest.raises(ValueError):
+        store.get("..", "doc-1")
+
+
+def test_document_text_comes_from_the_artifact(mocker):
+    firestore = mocker.patch.object(storage_service, "get_firestore_client")
+    text_store.save("user", "doc-1", ExtractedText(TEXT, [0]))
+
+    assert storage_service.get_document_text("user", "doc-1") == TEXT
+    firestore.assert_not_called()
+
+
+def test_documents_without_an_artifact_are_extracted_once(mocker):
+    db = mocker.patch.object(storage_service, "get_firestore_client").return_value
+    snapshot = db.collection.return_value.document.return_value.collection.return_value.document.return_value.get()
+    snapshot.exists = True
+    snapshot.to_dict.return_value = {"filename": "nda.txt"}
+    bucket = mocker.patch.object(storage_service, "get_firebase_storage").return_value
+    bucket.blob.return_value.download_as_bytes.return_value = TEXT.encode("utf-8")
+
+    assert storage_service.get_document_text("user", "doc-1").startswith("MUTUAL NON-DISCLOSURE")
+    text_store.clear_memory()
+    assert storage_service.get_document_text("user", "doc-1").startswith("MUTUAL NON-DISCLOSURE")
+    bucket.blob.return_value.download_as_bytes.assert_called_once()
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from app.services import token_cache
+
+
+@pytest.fixture
+def verify(mocker):
+    token_cache.clear()
+    claims = {"uid": "user-1", "exp": time.time() + 3600}
+    auth = mocker.patch.object(token_cache.firebase, "get_firebase_auth").return_value
+    auth.verify_id_token.return_value = claims
+    yield auth.verify_id_token
+    token_cache.clear()
+
+
+def test_verified_tokens_are_served_from_cache(verify):
+    first = token_cache.verify_id_token("token-a")
+    second = token_cache.verify_id_token("token-a")
+
+    assert first == second == verify.return_value
+    verify.assert_called_once_with("token-a", check_revoked=False)
+    assert token_cache.stats()["hits"] >= 1
+
+
+def test_tokens_close_to_expiry_and_invalid_tokens_are_not_cached(verify, monkeypatch):
+    monkeypatch.setattr(token_cache.config, "auth_token_expiry_margin_seconds", 60)
+    verify.return_value = {"uid": "user-1", "exp": time.time() + 30}
+    token_cache.verify_id_token("expiring")
+    token_cache.verify_id_token("expiring")
+    assert verify.call_count == 2
+
+    verify.side_effect = ValueError("Token revoked")
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            token_cache.verify_id_token("revoked")
+    assert verify.call_count == 4
+
+
+def test_revocation_checks_bound_the_cache_lifetime(verify, monkeypatch):
+    monkeypatch.setattr(token_cache.config, "auth_check_revoked", True)
+    monkeypatch.setattr(token_cache.config, "auth_revocation_check_interval_seconds", 0)
+
+    token_cache.verify_id_token("token-a")
+    token_cache.verify_id_token("token-a")
+
+    assert verify.call_count == 2
+    verify.assert_called_with("token-a", check_revoked=True)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import LocalVectorStore
+
+
+def _vector(doc_id: str, n: int, values: list[float]) -> dict:
+    return {"id": f"{doc_id}_{n}", "values": values, "metadata": {"doc_id": doc_id, "text": f"{doc_id} chunk {n}"}}
+
+
+def test_local_store_upsert_query_and_persist(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert("user-1", [_vector("doc-a", 0, [1, 0, 0]), _vector("doc-a", 1, [0, 1, 0])])
+    store.upsert("user-1", [_vector("doc-a", 2, [0.7, 0.7, 0]), _vector("doc-b", 0, [1, 0, 0])])
+
+    matches = store.query("user-1", "doc-a", [1, 0.1, 0], top_k=2)
+    assert [m["id"] for m in matches] == ["doc-a_0", "doc-a_2"]
+    assert matches[0]["metadata"]["text"] == "doc-a chunk 0"
+    assert matches[0]["score"] == pytest.approx(1 / np.sqrt(1.01), rel=1e-5)
+
+    # Without a doc_id every document in the user's namespace is searched
+    assert {m["metadata"]["doc_id"] for m in store.query("user-1", None, [1, 0, 0], top_k=2)} == {"doc-a", "doc-b"}
+    assert store.query("user-2", None, [1, 0, 0], top_k=2) == []
+
+    # Re-upserting an id replaces it, and a new instance reads the same files
+    store.upsert("user-1", [_vector("doc-a", 1, [0, 0, 1])])
+    reopened = LocalVectorStore(str(tmp_path))
+    assert reopened.query("user-1", "doc-a", [0, 0, 1], top_k=1)[0]["id"] == "doc-a_1"
+    assert len(reopened.query("user-1", "doc-a", [0, 0, 1], top_k=10)) == 3
+
+
+def test_local_store_keeps_the_last_of_a_repeated_id(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert("user-1", [_vector("doc-a", 0, [1, 0]), _vector("doc-a", 1, [1, 0]), _vector("doc-a", 0, [0, 1])])
+
+    matches = store.query("user-1", "doc-a", [0, 1], top_k=10)
+    assert len(matches) == 2
+    assert matches[0]["id"] == "doc-a_0"
+    assert matches[0]["score"] == pytest.approx(1.0)
+
+
+def test_local_store_reads_the_matrix_its_items_name(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert("user-1", [_vector("doc-a", 0, [1, 0])])
+    store.upsert("user-1", [_vector("doc-a", 1, [0, 1])])
+    doc_dir = tmp_path / "user-1" / "doc-a"
+    assert len(list(doc_dir.glob("vectors*.npy"))) == 1
+
+    # A write that crashed before replacing items.json leaves only an unreferenced matrix
+    np.save(doc_dir / "vectors-crashed.npy", np.zeros((5, 2), dtype=np.float32))
+    reopened = LocalVectorStore(str(tmp_path))
+    assert [m["id"] for m in reopened.query("user-1", "doc-a", [0, 1], top_k=10)] == ["doc-a_1", "doc-a_0"]
+
+
+def test_local_store_delete_and_rejects_unsafe_ids(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert("user-1", [_vector("doc-a", 0, [1, 0])])
+    store.delete_document("user-1", "doc-a")
+    assert store.query("user-1", "doc-a", [1, 0], top_k=1) == []
+
+    with pytest.raises(ValueError):
+        store.upsert("..", [_vector("doc-a", 0, [1, 0])])
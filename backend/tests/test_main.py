@@ -0,0 +1,37 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+from app import main
+
+
+def test_importing_the_app_does_not_load_the_service_sdks():
+    script = (
+        "import sys, app.main; print(json.dumps([m for m in "
+        "('firebase_admin', 'langchain_google_genai', 'pinecone') if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", "import json; " + script], capture_output=True, text=True, check=True
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_warm_up_creates_every_client_and_survives_failures(mocker):
+    created = []
+    for module, name in (
+        (main.firebase, "get_firestore_client"),
+        (main.firebase, "get_firebase_storage"),
+        (main.llm_service, "get_llm"),
+        (main.pinecone_service, "get_embeddings_model"),
+    ):
+        mocker.patch.object(module, name, new=lambda name=name: created.append(name))
+
+    def get_store():
+        raise ConnectionError("unreachable")
+
+    mocker.patch.object(main.pinecone_service, "get_store", new=get_store)
+
+    asyncio.run(main.warm_up_clients())
+
+    assert sorted(created) == ["get_embeddings_model", "get_firebase_storage", "get_firestore_client", "get_llm"]
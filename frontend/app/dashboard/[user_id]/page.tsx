@@ -35,6 +35,9 @@ type HistoryItem = {
   clause_explanation?: string
 }
 
+// How many analyses the "Recent Analyses" grid shows
+const RECENT_ANALYSES = 12
+
 const BACKEND_URL = process.env.NEXT_PUBLIC_API_BASE ? `${process.env.NEXT_PUBLIC_API_BASE}/api/v1` : "http://localhost:8000/api/v1"
 
 const sections = ["Dashboard", "Insights", "Quick View", "Timeline", "Ask AI"]
@@ -125,7 +128,8 @@ export default function UserDashboardPage() {
   const fetchHistory = async () => {
     try {
       const headers = await authHeaders()
-      const res = await fetch(`${BACKEND_URL}/history`, { headers })
+      // Most recent analyses only, with list fields; the full analysis is fetched when one is opened
+      const res = await fetch(`${BACKEND_URL}/history?limit=${RECENT_ANALYSES}`, { headers })
       if (!res.ok) throw new Error("Failed to fetch history")
       const data = await res.json()
       const list: HistoryItem[] = data.history || []
@@ -135,21 +139,35 @@ export default function UserDashboardPage() {
     }
   }
 
+  const openHistoryDoc = async (docId: string) => {
+    try {
+      const headers = await authHeaders()
+      const res = await fetch(`${BACKEND_URL}/history/${encodeURIComponent(docId)}`, { headers })
+      if (!res.ok) throw new Error("Failed to fetch analysis")
+      const doc: HistoryItem = await res.json()
+      setSelectedDoc(doc)
+      return true
+    } catch (e) {
+      console.error(e)
+      return false
+    }
+  }
+
   useEffect(() => {
     if (user) fetchHistory()
   }, [user])
 
   useEffect(() => {
     const docId = localStorage.getItem("selectedDocId")
-    if (docId && history.length > 0) {
-      const doc = history.find((h) => h.doc_id === docId)
-      if (doc) {
-        setSelectedDoc(doc)
-        setCurrentSection("Insights") // Switch to insights view
-        localStorage.removeItem("selectedDocId") // Clean up
-      }
+    if (user && docId) {
+      openHistoryDoc(docId).then((opened) => {
+        if (opened) {
+          setCurrentSection("Insights") // Switch to insights view
+          localStorage.removeItem("selectedDocId") // Clean up
+        }
+      })
     }
-  }, [history])
+  }, [user])
 
   useEffect(() => {
     const fetchTimelineData = async () => {
@@ -494,7 +512,7 @@ export default function UserDashboardPage() {
                   {history.map((h) => (
                     <button
                       key={h.doc_id}
-                      onClick={() => setSelectedDoc(h)}
+                      onClick={() => openHistoryDoc(h.doc_id)}
                       className="rounded-xl bg-black/25 p-4 text-left text-white/90 transition hover:bg-white/20 backdrop-blur-xl ring-1 ring-white/10"
                     >
                       <div className="truncate text-sm text-white/70">{h.document_analysis?.classification || "Document"}</div>
@@ -12,6 +12,65 @@ import Link from "next/link"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Sheet, SheetContent, SheetHeader, SheetTitle, SheetTrigger } from "@/components/ui/sheet"
 
+const HISTORY_PAGE_SIZE = 50
+
+function parseClauses(clauseExplanation?: string): string[] {
+  try {
+    const explanation = JSON.parse((clauseExplanation || "").replace(/```json\n|\n```/g, ""))
+    if (Array.isArray(explanation.clauses)) {
+      return explanation.clauses.map((c: any) => c.clause)
+    }
+  } catch (e) {
+    // ignore parsing errors
+  }
+  return []
+}
+
+function toDocument(h: any) {
+  const ts = h.timestamp ? new Date(h.timestamp) : null
+  const uploadedAt = ts ? ts.toLocaleString() : "—"
+  const uploadTimestamp = ts ? ts.toISOString() : ""
+  const analysis = h.document_analysis || {}
+  const summary = analysis.summary || ""
+  const type = analysis.classification || h.classification || undefined
+  const riskScore = analysis.risk_score ? parseInt(analysis.risk_score, 10) : 0
+  return {
+    id: h.doc_id || h.id || "",
+    name: h.filename || "Untitled",
+    sizeMb: h.file_size_mb || 0,
+    uploadedAt,
+    uploadTimestamp,
+    summary,
+    riskScore,
+    // Only in the full analysis, fetched when the document is selected
+    clauses: undefined as string[] | undefined,
+    type,
+    lastAnalyzedAt: uploadedAt,
+    lastOpenedAt: undefined,
+  }
+}
+
+async function fetchHistoryPage(after: string | null): Promise<{ history: any[]; nextCursor: string | null }> {
+  const token = await auth.currentUser!.getIdToken()
+  const base = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000"
+  const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) })
+  if (after) params.set("after", after)
+  const res = await fetch(`${base}/api/v1/history?${params}`, {
+    method: "GET",
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+  })
+  if (!res.ok) {
+    throw new Error(`Failed to fetch history: ${res.status}`)
+  }
+  const data = await res.json()
+  return {
+    history: Array.isArray(data?.history) ? data.history : [],
+    nextCursor: data?.next_cursor ?? null,
+  }
+}
+
 export default function HistoryPage() {
   const [user, setUser] = useState<User | null>(null)
   const [isLoaded, setIsLoaded] = useState(false)
@@ -36,6 +95,8 @@ export default function HistoryPage() {
   const [sortKey, setSortKey] = useState<"newest" | "name" | "size">("newest")
   const [isLoadingDocs, setIsLoadingDocs] = useState(true)
   const [docTypes, setDocTypes] = useState<string[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
 
   useEffect(() => {
     const checkShaderReady = () => {
@@ -85,52 +146,11 @@ export default function HistoryPage() {
           setIsLoadingDocs(false)
           return
         }
-        const token = await auth.currentUser.getIdToken()
-        const base = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000"
-        const res = await fetch(`${base}/api/v1/history`, {
-          method: "GET",
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        })
-        if (!res.ok) {
-          throw new Error(`Failed to fetch history: ${res.status}`)
-        }
-        const data = await res.json()
-        const history: any[] = Array.isArray(data?.history) ? data.history : []
-        const mapped = history.map((h) => {
-          const ts = h.timestamp ? new Date(h.timestamp) : null
-          const uploadedAt = ts ? ts.toLocaleString() : "—"
-          const uploadTimestamp = ts ? ts.toISOString() : ""
-          const analysis = h.document_analysis || {}
-          const summary = analysis.summary || ""
-          const type = analysis.classification || h.classification || undefined
-          const riskScore = analysis.risk_score ? parseInt(analysis.risk_score, 10) : 0
-          let clauses = []
-          try {
-            const explanation = JSON.parse(h.clause_explanation.replace(/```json\n|\n```/g, ''));
-            if (Array.isArray(explanation.clauses)) {
-              clauses = explanation.clauses.map((c: any) => c.clause);
-            }
-          } catch (e) {
-            // ignore parsing errors
-          }
-          return {
-            id: h.doc_id || h.id || "",
-            name: h.filename || "Untitled",
-            sizeMb: h.file_size_mb || 0,
-            uploadedAt,
-            uploadTimestamp,
-            summary,
-            riskScore,
-            clauses,
-            type,
-            lastAnalyzedAt: uploadedAt,
-            lastOpenedAt: undefined,
-          }
-        })
+        const { history, nextCursor } = await fetchHistoryPage(null)
+        const mapped = history.map(toDocument)
         if (!cancelled) {
           setDocuments(mapped)
+          setNextCursor(nextCursor)
           setSelectedDocId(mapped[0]?.id ?? null)
           const types = [...new Set(mapped.map((d) => d.type).filter(Boolean) as string[])]
           setDocTypes(types)
@@ -151,6 +171,50 @@ export default function HistoryPage() {
     }
   }, [user])
 
+  const loadMore = async () => {
+    if (!nextCursor || !auth.currentUser) return
+    setIsLoadingMore(true)
+    try {
+      const page = await fetchHistoryPage(nextCursor)
+      const mapped = page.history.map(toDocument)
+      setDocuments((prev) => [...prev, ...mapped])
+      setNextCursor(page.nextCursor)
+      setDocTypes((prev) => [...new Set([...prev, ...(mapped.map((d) => d.type).filter(Boolean) as string[])])])
+    } catch (e) {
+      console.error(e)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
+  // The list only has summary fields; fetch the selected document's clauses on demand
+  useEffect(() => {
+    const doc = documents.find((d) => d.id === selectedDocId)
+    if (!selectedDocId || !doc || doc.clauses !== undefined || !auth.currentUser) return
+    let cancelled = false
+    async function loadDetails(docId: string) {
+      try {
+        const token = await auth.currentUser!.getIdToken()
+        const base = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000"
+        const res = await fetch(`${base}/api/v1/history/${encodeURIComponent(docId)}`, {
+          headers: { Authorization: `Bearer ${token}` },
+        })
+        if (!res.ok) throw new Error(`Failed to fetch analysis: ${res.status}`)
+        const full = await res.json()
+        const clauses = parseClauses(full.clause_explanation)
+        if (!cancelled) {
+          setDocuments((prev) => prev.map((d) => (d.id === docId ? { ...d, clauses } : d)))
+        }
+      } catch (e) {
+        console.error(e)
+      }
+    }
+    loadDetails(selectedDocId)
+    return () => {
+      cancelled = true
+    }
+  }, [selectedDocId, documents])
+
   const toggleFilter = (tag: string) => {
     setActiveFilters((prev) =>
       prev.includes(tag) ? prev.filter((t) => t !== tag) : [...prev, tag]
@@ -327,6 +391,15 @@ export default function HistoryPage() {
             {!isLoadingDocs && filteredAndSortedDocs.length === 0 && (
               <div className="rounded-xl bg-white/5 p-4 text-center text-sm text-white/70">No matches. Try clearing filters.</div>
             )}
+            {!isLoadingDocs && nextCursor && (
+              <button
+                onClick={loadMore}
+                disabled={isLoadingMore}
+                className="mt-2 w-full rounded-xl bg-white/5 px-3 py-2 text-sm text-white/80 transition-all hover:bg-white/10 disabled:opacity-50"
+              >
+                {isLoadingMore ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
           <div className="pt-3">
             <MagneticButton variant="secondary" onClick={() => router.back()} className="w-full">
@@ -415,6 +488,15 @@ export default function HistoryPage() {
                     {filteredAndSortedDocs.length === 0 && (
                       <div className="rounded-xl bg-white/5 p-4 text-center text-sm text-white/70">No matches. Try clearing filters.</div>
                     )}
+                    {nextCursor && (
+                      <button
+                        onClick={loadMore}
+                        disabled={isLoadingMore}
+                        className="mt-2 w-full rounded-xl bg-white/5 px-3 py-2 text-sm text-white/80 transition-all hover:bg-white/10 disabled:opacity-50"
+                      >
+                        {isLoadingMore ? "Loading..." : "Load more"}
+                      </button>
+                    )}
                   </div>
                 </div>
               </SheetContent>